@@ -0,0 +1,226 @@
+import ast
+import os
+from project_analysis import count_findings, run_tool
+from tools.findings_compactor import collect_findings, compact_findings
+
+# Largest input that gets the full pipeline (every agent plans its analysis with the model)
+ADMISSION_FULL_MAX_CHARS = int(os.getenv("ADMISSION_FULL_MAX_CHARS", "12000"))
+ADMISSION_FULL_MAX_NODES = int(os.getenv("ADMISSION_FULL_MAX_NODES", "3000"))
+# Largest input that still gets model reports, without the plan-generation prompts; larger input gets the tools only
+ADMISSION_REPORT_MAX_CHARS = int(os.getenv("ADMISSION_REPORT_MAX_CHARS", "80000"))
+ADMISSION_REPORT_MAX_NODES = int(os.getenv("ADMISSION_REPORT_MAX_NODES", "20000"))
+# Code with more deeply nested blocks (if/for/while/with/try/def/class bodies) goes to the tools-only mode
+# whatever its size, and so does code with deeper expressions (which the tools walk recursively)
+ADMISSION_MAX_DEPTH = int(os.getenv("ADMISSION_MAX_DEPTH", "30"))
+ADMISSION_MAX_EXPRESSION_DEPTH = int(os.getenv("ADMISSION_MAX_EXPRESSION_DEPTH", "300"))
+# Lines per part of the file in the tools-only report
+ADMISSION_CHUNK_LINES = int(os.getenv("ADMISSION_CHUNK_LINES", "200"))
+
+# Stands in for the generated plan when plan generation is skipped
+SKIPPED_PLAN = "No plan was generated for this large input. Report the issues the tool found, most important first."
+
+
+# Statements whose bodies are one level of block nesting deeper
+BLOCK_STATEMENTS = (ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+                    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef) + ((ast.Match,) if hasattr(ast, "Match") else ())
+
+
+def _is_elif(node, parent):
+    """An elif is an If alone in the orelse of an If, starting in the same column."""
+    return (isinstance(node, ast.If) and isinstance(parent, ast.If) and parent.orelse == [node]
+            and node.col_offset == parent.col_offset)
+
+
+def measure_tree(tree):
+    """
+    Counts the nodes of a syntax tree, its block nesting depth (an elif chain is one level) and its raw
+    depth, without recursion (the tree may be very deep). Long expressions such as a chain of 100 string
+    concatenations make the raw depth large but are not nested code.
+
+    Returns:
+        tuple: (node count, block depth, raw depth)
+    """
+    nodes, deepest_block, deepest = 0, 0, 0
+    stack = [(tree, None, 0, 1)]
+    while stack:
+        node, parent, blocks, depth = stack.pop()
+        nodes += 1
+        deepest = max(deepest, depth)
+        if isinstance(node, BLOCK_STATEMENTS) and not _is_elif(node, parent):
+            blocks += 1
+            deepest_block = max(deepest_block, blocks)
+        stack.extend((child, node, blocks, depth + 1) for child in ast.iter_child_nodes(node))
+    return nodes, deepest_block, deepest
+
+
+class Admission:
+    """How much of the pipeline a submission gets, and the measurements that decided it."""
+
+    def __init__(self, mode, chars, lines, nodes=None, depth=None, reason=""):
+        self.mode = mode
+        self.chars = chars
+        self.lines = lines
+        self.nodes = nodes
+        self.depth = depth
+        self.reason = reason
+
+    def describe(self):
+        size = f"{self.lines} lines, {self.chars} characters"
+        if self.nodes is not None:
+            size += f", {self.nodes} syntax nodes, block nesting depth {self.depth}"
+        if self.mode == "full":
+            return f"Full analysis ({size})."
+        if self.mode == "no_plan":
+            return f"Large input ({size}): {self.reason}. The agents skip planning and report directly."
+        return f"Very large input ({size}): {self.reason}. Only the analysis tools run, their findings are reported per part of the file."
+
+
+def admit(code):
+    """
+    Measures a submission before any work is done and picks the mode it is analyzed in:
+    - "full": the whole pipeline
+    - "no_plan": no plan-generation prompts (orchestrator and agents), the agents report directly
+    - "fast": the analysis tools only, with their findings reported per part of the file and no model calls
+
+    Returns:
+        Admission: The mode and the measurements.
+    """
+    chars, lines = len(code), code.count("\n") + 1
+    if chars > ADMISSION_REPORT_MAX_CHARS:
+        # Parsing alone would take too long
+        return Admission("fast", chars, lines, reason=f"more than {ADMISSION_REPORT_MAX_CHARS} characters")
+
+    try:
+        nodes, depth, expression_depth = measure_tree(ast.parse(code))
+    except SyntaxError:
+        nodes = depth = expression_depth = None  # The syntax agent reports it, the size decides the mode
+    except (RecursionError, MemoryError, ValueError):
+        return Admission("fast", chars, lines, reason="too deeply nested to parse")
+
+    if depth is not None and depth > ADMISSION_MAX_DEPTH:
+        return Admission("fast", chars, lines, nodes, depth, f"blocks nested deeper than {ADMISSION_MAX_DEPTH} levels")
+    if expression_depth is not None and expression_depth > ADMISSION_MAX_EXPRESSION_DEPTH:
+        return Admission("fast", chars, lines, nodes, depth,
+                         f"syntax tree deeper than {ADMISSION_MAX_EXPRESSION_DEPTH} levels")
+    if nodes is not None and nodes > ADMISSION_REPORT_MAX_NODES:
+        return Admission("fast", chars, lines, nodes, depth, f"more than {ADMISSION_REPORT_MAX_NODES} syntax nodes")
+    if chars > ADMISSION_FULL_MAX_CHARS:
+        return Admission("no_plan", chars, lines, nodes, depth, f"more than {ADMISSION_FULL_MAX_CHARS} characters")
+    if nodes is not None and nodes > ADMISSION_FULL_MAX_NODES:
+        return Admission("no_plan", chars, lines, nodes, depth, f"more than {ADMISSION_FULL_MAX_NODES} syntax nodes")
+    return Admission("full", chars, lines, nodes, depth)
+
+
+def default_plan(agents, admission):
+    """The plan shown instead of a generated one when plan generation is skipped."""
+    steps = "\n".join(f"{index}. {agent.name}" for index, agent in enumerate(agents, start=1))
+    return f"{admission.describe()}\n\nAll agents run in their default order:\n{steps}"
+
+
+def code_chunks(code, max_lines=ADMISSION_CHUNK_LINES):
+    """
+    Splits code into line ranges of about max_lines, at the start of top-level statements where the code parses.
+
+    Returns:
+        list: (start, end) line ranges, 1-based and inclusive.
+    """
+    total = code.count("\n") + 1
+    try:
+        starts = [node.lineno for node in ast.parse(code).body] if len(code) <= ADMISSION_REPORT_MAX_CHARS else []
+    except (SyntaxError, RecursionError, MemoryError, ValueError):
+        starts = []
+    # Statements longer than a chunk (and unparsable code) are split at fixed sizes
+    boundaries = sorted(set([1] + starts + list(range(1, total + 1, max_lines))))
+
+    chunks, start, previous = [], 1, 1
+    for boundary in boundaries[1:] + [total + 1]:
+        # Cut at the last boundary that keeps the chunk within max_lines
+        if boundary - start > max_lines and previous > start:
+            chunks.append((start, previous - 1))
+            start = previous
+        previous = boundary
+    chunks.append((start, total))
+    return chunks
+
+
+def chunked_report(agent_name, code, tool_output, admission):
+    """
+    Reports the findings of a tool per part of the file, without the model.
+
+    Returns:
+        str: A Markdown report with one section per part of the file that has findings.
+    """
+    chunks = {chunk: [] for chunk in code_chunks(code)}
+    whole_file = []
+    for source, severity, location, message in collect_findings(tool_output):
+        finding = {"severity": severity, "message": f"{source}: {message}" if source else message}
+        start = location.split("-")[0] if location else ""
+        if not start.isdigit():
+            whole_file.append(finding)
+            continue
+        finding["line"] = location
+        for chunk_start, chunk_end in chunks:
+            if chunk_start <= int(start) <= chunk_end:
+                chunks[(chunk_start, chunk_end)].append(finding)
+                break
+
+    sections = [f"## {agent_name} (tools only)", admission.describe()]
+    if whole_file:
+        sections += ["### Whole file", compact_findings(whole_file)]
+    for (start, end), findings in chunks.items():
+        if findings:
+            sections += [f"### Lines {start}-{end}", compact_findings(findings)]
+    if len(sections) == 2:
+        sections.append("No findings.")
+    return "\n\n".join(sections)
+
+
+class AdmittedAgent:
+    """An agent run in a degraded mode of its admission: without plan-generation prompts, or tools only."""
+
+    # The mode would be lost if the agent was dispatched to a worker by name
+    runs_locally = True
+
+    def __init__(self, agent, admission):
+        self.agent = agent
+        self.admission = admission
+        self.name = agent.name
+        self.tool = agent.tool
+        self.verdict_criterion = agent.verdict_criterion
+        # Tools-only runs decide from the findings, never with the model
+        self.local_verdict = admission.mode == "fast"
+
+    def analyze(self, code, progress=None, cancel_token=None):
+        """Returns (report, tool_analysis) like the agent's own analysis."""
+        if self.admission.mode == "no_plan":
+            return self.agent.analyze(code, progress=progress, cancel_token=cancel_token, plan=SKIPPED_PLAN)
+        progress = progress or (lambda stage: None)
+        progress("tool")
+        tool_analysis = run_tool(self.tool, code, cancel_token)
+        progress("report")
+        return chunked_report(self.name, code, tool_analysis, self.admission), tool_analysis
+
+    def check(self, report, tool_analysis, cancel_token=None):
+        """Returns True if the analysis found no issues (low-severity notes do not count in tools-only runs)."""
+        if self.local_verdict:
+            return count_findings(tool_analysis, min_severity="medium") == 0
+        return self.agent.check(report, tool_analysis, cancel_token=cancel_token)
+
+    def verdict_evidence(self, report, tool_analysis):
+        return self.agent.verdict_evidence(report, tool_analysis)
+
+    def run(self, code, progress=None, cancel_token=None):
+        progress = progress or (lambda stage: None)
+        try:
+            report, tool_analysis = self.analyze(code, progress=progress, cancel_token=cancel_token)
+            progress("verdict")
+            return report, self.check(report, tool_analysis, cancel_token=cancel_token)
+        except Exception as e:
+            return f"Error during {self.name} analysis: {str(e)}", False
+
+
+def admitted(agent, admission):
+    """The agent as run under the admission: itself for the full pipeline (or no admission), wrapped otherwise."""
+    if admission is None or admission.mode == "full":
+        return agent
+    return AdmittedAgent(agent, admission)
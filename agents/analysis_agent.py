@@ -0,0 +1,53 @@
+class AnalysisAgent:
+    """
+    The plan -> tool -> report -> verdict workflow shared by the analysis agents.
+    A subclass sets `subject`, provides create_plan, generate_report and check_report,
+    and overrides the methods below where its analysis differs.
+    """
+    subject = "code"  # Names the analysis in error messages
+
+    def run_tool(self, code, cancel_token=None):
+        """Run the agent's tool and return its output."""
+        try:
+            return self.tool.func(code, cancel_token=cancel_token)
+        except Exception as e:
+            return f"Error running {self.subject} analysis: {str(e)}"
+
+    def measure(self, code, cancel_token=None):
+        """Further analyses passed to generate_report as keyword arguments besides the tool output."""
+        return {}
+
+    def analyze(self, code, progress=None, cancel_token=None, plan=None):
+        """
+        Plans the analysis, runs the tool and writes the report. Returns (report, tool_analysis).
+        A given plan replaces the plan-generation prompt.
+        """
+        progress = progress or (lambda stage: None)  # Reports the current stage to a background job
+        if plan is None:
+            progress("plan")
+            plan = self.create_plan(code, cancel_token=cancel_token)
+        progress("tool")
+        tool_analysis = self.run_tool(code, cancel_token=cancel_token)
+        measured = self.measure(code, cancel_token=cancel_token)
+        progress("report")
+        report = self.generate_report(plan, tool_analysis, code, cancel_token=cancel_token, **measured)
+        return report, tool_analysis
+
+    def check(self, report, tool_analysis, cancel_token=None):
+        """Returns True if the analysis found no issues."""
+        return self.check_report(report, cancel_token=cancel_token)
+
+    def verdict_evidence(self, report, tool_analysis):
+        """The verdict is based on the report."""
+        return f"Report: {report}"
+
+    def run(self, code, progress=None, cancel_token=None):
+        """Execute the analysis workflow. Returns (report, is_valid)."""
+        progress = progress or (lambda stage: None)  # Reports the current stage to a background job
+        try:
+            report, tool_analysis = self.analyze(code, progress=progress, cancel_token=cancel_token)
+            progress("verdict")
+            is_valid = self.check(report, tool_analysis, cancel_token=cancel_token)
+            return report, is_valid
+        except Exception as e:
+            return f"Error during {self.subject} analysis workflow: {str(e)}", False
@@ -1,11 +1,19 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
+from tools.best_practices_tool import find_magic_numbers
+from sandbox import run_sandboxed
+
+class BestPracticesAgent(AnalysisAgent):
+    subject = "best practices"
 
-class BestPracticesAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "BestPracticesAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code still contains ANY best practices violations"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing best practices in the code."""
         plan_prompt = f"""
         You are an expert in software engineering best practices. Create a simple step-by-step plan of max 5 steps to analyze
@@ -25,44 +33,27 @@ class BestPracticesAgent:
         {code}
         """
         try:
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating best practices analysis plan: {str(e)}"
 
-    def analyze_best_practices(self, code):
-        """Runs the best practices analysis tool and gets all issues."""
-        try:
-            return self.tool.func(code)
-        except Exception as e:
-            return f"Error running best practices analysis: {str(e)}"
-    
-    def analyze_magic_numbers(self, code):
-        """Sends a prompt to the LLM to check for magic numbers while avoiding false positives from defined constants."""
-        prompt = f"""
-        You are an expert in software engineering best practices. Your task is to analyze Python code **only for magic numbers** and flag **only numbers that are directly used in expressions without being defined as constants first**.
-
-        ### **Rules:**
-        - **IGNORE** numbers **0, 1, -1**, as they are commonly accepted as non-magic numbers.
-        - **DO NOT** flag a number if it has already been assigned to a **constant variable** before usage.
-        - **ONLY flag a number** if it is directly used in an expression **without being assigned to a constant** beforehand.
-        - If a number appears in a `range()` function, **DO NOT flag it** if it is constructed using a pre-defined constant.
-        - Provide a **structured list** of flagged numbers, including:
-            - **Line number**
-            - **The problematic number**
-            - **A brief reason why it is a magic number**
-        - If no violations exist, return **only**: "No magic numbers found."
-
-        ### Now analyze the following code:
-        {code}
-
-        **Provide your analysis below:**
-        """
+    def analyze_magic_numbers(self, code, cancel_token=None):
+        """Finds numbers used directly in expressions without being defined as constants first."""
         try:
-            return query_gradio_client(prompt).strip()
+            magic_numbers = run_sandboxed(find_magic_numbers, code, cancel_token=cancel_token)
+            if not magic_numbers:
+                return "No magic numbers found."
+            # A sandbox limit finding has no line
+            return "\n".join(f"Line {issue['line']}: {issue['message']}" if "line" in issue else issue["message"]
+                             for issue in magic_numbers)
         except Exception as e:
             return f"Error analyzing magic numbers: {str(e)}"
 
-    def generate_report(self, tool_feedback, magic_numbers_analysis, code):
+    def measure(self, code, cancel_token=None):
+        """The magic numbers passed to generate_report."""
+        return {"magic_numbers_analysis": self.analyze_magic_numbers(code, cancel_token=cancel_token)}
+
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None, magic_numbers_analysis=""):
         """Generates a clear and actionable best practices report."""
         report_prompt = f"""
         You are an expert in software engineering best practices. 
@@ -76,36 +67,24 @@ class BestPracticesAgent:
         - Provide a **structured, detailed list** of problems, ensuring that each reported issue is genuinely a violation.
         - DO NOT CORRECT THE CODE!
 
-        Tool Feedback: {tool_feedback}
-        Magic Numbers Analysis: {magic_numbers_analysis}
+        Tool Feedback: {compact_findings(tool_feedback)}
+        Magic Numbers Analysis: {compact_findings(magic_numbers_analysis)}
         Code: {code}
         """
         try:
-            return query_gradio_client(report_prompt).strip()
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token).strip()
         except Exception as e:
             return f"Error generating best practices report: {str(e)}"
 
-    def check_analysis(self, analysis):
+    def check_report(self, report, cancel_token=None):
         """Determines if the code fully follows best practices."""
         validation_prompt = f"""
         You are a software best practices expert. Based on the following analysis, does the code still contain **ANY** best practices violations?
-        Analysis: {analysis}
+        Analysis: {report}
         Answer **only** 'yes' if there are issues or 'no' if the code is fully correct.
         """
         try:
-            has_issues = query_gradio_client(validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues  # Returns True if code follows best practices, False otherwise.
         except Exception as e:
             return f"Error validating best practices analysis: {str(e)}"
-
-    def run(self, code):
-        """Runs the best practices checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_best_practices(code)
-            magic_numbers_analysis = self.analyze_magic_numbers(code)
-            report = self.generate_report(tool_analysis, magic_numbers_analysis, code)
-            is_valid = self.check_analysis(report)
-            return report, is_valid
-        except Exception as e:
-            return f"Error during best practices analysis workflow: {str(e)}", False
\ No newline at end of file
@@ -1,11 +1,19 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
+from tools.memory_profiler import MEMORY_PROFILE, format_memory_profile, profile_memory
+from tools.runtime_profiler import RUNTIME_PROFILE, format_runtime_profile, profile_runtime
+
+class CodeEfficiencyAgent(AnalysisAgent):
+    subject = "code efficiency"
 
-class CodeEfficiencyAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "CodeEfficiencyAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the report lists any critical efficiency issues"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing code efficiency."""
         plan_prompt = f"""
         You are a software optimization expert. Create a simple step-by-step plan of max 5 steps to analyze the efficiency
@@ -21,26 +29,52 @@ class CodeEfficiencyAgent:
         {code}
         """
         try:
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code efficiency analysis plan: {str(e)}"
 
-    def analyze_efficiency(self, code):
-        """Run the code efficiency analysis tool and return its output."""
+    def measure_runtime(self, code, cancel_token=None):
+        """Time the submitted functions on growing inputs (RUNTIME_PROFILE) and return the growth curves as text."""
         try:
-            return self.tool.func(code)
+            return format_runtime_profile(profile_runtime(code, cancel_token=cancel_token))
         except Exception as e:
-            return f"Error running code efficiency analysis: {str(e)}"
-        
-    def generate_report(self, plan, tool_feedback, code):
+            return f"Error measuring runtime growth: {str(e)}"
+
+    def measure_memory(self, code, cancel_token=None):
+        """Trace the memory the submitted functions allocate on growing inputs (MEMORY_PROFILE) and return it as text."""
+        try:
+            return format_memory_profile(profile_memory(code, cancel_token=cancel_token))
+        except Exception as e:
+            return f"Error measuring memory footprint: {str(e)}"
+
+    def measure(self, code, cancel_token=None):
+        """The runtime growth and memory footprint passed to generate_report, where enabled."""
+        return {
+            "runtime_growth": self.measure_runtime(code, cancel_token=cancel_token) if RUNTIME_PROFILE else "",
+            "memory_footprint": self.measure_memory(code, cancel_token=cancel_token) if MEMORY_PROFILE else "",
+        }
+
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None, runtime_growth="", memory_footprint=""):
         """Generate a final report summarizing all efficiency issues and suggesting improvements."""
+        measured = f"""- Measured Runtime Growth (the functions timed on growing inputs of size n):
+        {runtime_growth}
+        Prefer these measurements over the tool's static complexity guesses, but where a function measured as
+        O(1) is estimated to grow by the tool, its generated inputs may have hit a shortcut: report both.
+        """ if runtime_growth else ""
+        if memory_footprint:
+            measured += f"""- Measured Memory Footprint (peak allocation per input size n, the lines that allocated most at the
+        largest size, and lists built in full where a generator would do):
+        {memory_footprint}
+        Only flag memory as an issue where it grows with n faster than the result the function returns.
+        """
         report_prompt = f"""
         You are a software optimization expert. Based on the following:
         - Analysis Plan: {plan}
-        - Tool Feedback: {tool_feedback}
-        - Code: {code}
+        - Tool Feedback: {compact_findings(tool_feedback)}
+        {measured}- Code: {code}
 
         Generate a short and precise report summarizing efficiency issues and suggest improvements.
+        - Tool findings with a "Fix:" already name the data structure or idiom to use; keep their suggestion and line.
         - **Critical Issues (must fix):** Only include inefficiencies that significantly impact performance.
         - **Minor Issues (Optional):** Only include very minor inefficiencies that do not impact performance.
         - If an inefficiency is **only relevant for massive datasets**, mention it but **do not flag it as an issue**.
@@ -50,11 +84,11 @@ class CodeEfficiencyAgent:
         - **Minor Issues (Optional):** [List only if truly minor and not affecting performance]
         """
         try:
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code efficiency report: {str(e)}"
 
-    def check_analysis(self, report):
+    def check_report(self, report, cancel_token=None):
         """Ensure code is not marked valid if critical issues exist and prevent over-reporting minor issues."""
         efficiency_validation_prompt = f"""
         You are a software optimization expert. Based on the following efficiency report, determine if the code is efficient.
@@ -66,18 +100,7 @@ class CodeEfficiencyAgent:
         {report}
         """
         try:
-            has_issues = query_gradio_client(efficiency_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(efficiency_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues
         except Exception as e:
             return f"Error checking error handling report: {str(e)}"
-
-    def run(self, code):
-        """Execute the code efficiency checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_efficiency(code)
-            report = self.generate_report(plan, tool_analysis, code)
-            is_valid = self.check_analysis(report)
-            return report, is_valid
-        except Exception as e:
-            return f"Error running code efficiency analysis: {str(e)}", False
@@ -1,11 +1,17 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
+
+class CodeStructureAgent(AnalysisAgent):
+    subject = "code structure"
 
-class CodeStructureAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "CodeStructureAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code has any structural or modularity issues (ignore comments, only tool-detected issues count)"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing the modularity and structure of the code."""
         plan_prompt = f"""
         You are a software architecture expert. Create a simple step-by-step plan of max 5 steps to analyze the modularity
@@ -20,24 +26,17 @@ class CodeStructureAgent:
         {code}
         """
         try:        
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code structure analysis plan: {str(e)}"
 
 
-    def analyze_structure(self, code):
-        """Run the code structure analysis tool and return its output."""
-        try:
-            return self.tool.func(code)
-        except Exception as e:
-            return f"Error running code structure analysis: {str(e)}"
-
-    def generate_report(self, plan, tool_feedback, code):
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None):
         """Generate a final report based on the plan, tool feedback, and code."""
         report_prompt = f"""
         You are a software architecture expert. Based on the following:
         - Analysis Plan: {plan}
-        - Tool Feedback: {tool_feedback}
+        - Tool Feedback: {compact_findings(tool_feedback)}
         - Code: {code}
 
         Generate a short report summarizing all modularity and structural issues and suggesting improvements.
@@ -46,11 +45,11 @@ class CodeStructureAgent:
         Do not improve/revise the code.
         """
         try:
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code style report: {str(e)}"
 
-    def check_report(self, report):
+    def check_report(self, report, cancel_token=None):
         """Check if there are structural/modularity issues based on the report."""
         structure_validation_prompt = f"""
         You are a software architecture expert. Based on the following modularity and structure report, determine if the code has any issues.
@@ -59,18 +58,7 @@ class CodeStructureAgent:
         Answer only 'yes' if there are issues or 'no' if the code is fine.
         """
         try:
-            has_issues = query_gradio_client(structure_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(structure_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues
         except Exception as e:
             return f"Error checking code structure report: {str(e)}"
-
-    def run(self, code):
-        """Execute the code structure checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_structure(code)
-            report = self.generate_report(plan, tool_analysis, code)
-            is_valid = self.check_report(report)
-            return report, is_valid
-        except Exception as e:
-            return f"Error running code structure analysis: {str(e)}", False
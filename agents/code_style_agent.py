@@ -1,12 +1,50 @@
+import copy
+import functools
+import hashlib
+import threading
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.code_style_tool import recheck_style
+from tools.findings_compactor import compact_findings
 
+# Style results kept per code, so a revision of the code only has its edited lines re-checked
+STYLE_RESULTS_KEPT = 64
+
+
+class CodeStyleAgent(AnalysisAgent):
+    subject = "code style"
 
-class CodeStyleAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "CodeStyleAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code has any style issues (ignore comments, only black-detected issues count)"
+        self.previous_code = None
+        self._results = {}  # Code hash -> tool output, shared with the copies made by for_revision
+        self._results_lock = threading.Lock()
+
+    def for_revision(self, previous_code):
+        """
+        A copy of the agent for a revision of previous_code: Black only re-checks the edited lines, the other
+        issues are taken from the result of previous_code. It runs in this process, where that result is kept.
+        """
+        agent = copy.copy(self)
+        agent.previous_code = previous_code
+        agent.runs_locally = True
+        return agent
 
-    def create_plan(self, code):
+    def _remember(self, code, result):
+        key = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        with self._results_lock:
+            self._results[key] = result
+            while len(self._results) > STYLE_RESULTS_KEPT:
+                del self._results[next(iter(self._results))]  # Oldest first
+
+    def _remembered(self, code):
+        with self._results_lock:
+            return self._results.get(hashlib.sha256(code.encode("utf-8")).hexdigest())
+
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing the code's style."""
         plan_prompt = f"""
         You are a coding style expert. Create a simple step-by-step plan of max 5 steps to identify style issues in the provided code.
@@ -19,23 +57,29 @@ class CodeStyleAgent:
         {code}
         """
         try:
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code style analysis plan: {str(e)}"
 
-    def analyze_style(self, code):
-        """Run the coding style tool and return its output."""
+    def run_tool(self, code, cancel_token=None):
+        """Run the coding style tool and return its output (on a revision, only for the edited lines)."""
         try:
-            return self.tool.func(code)
+            check = functools.partial(self.tool.func, cancel_token=cancel_token)
+            if self.previous_code is not None:
+                result = recheck_style(self.previous_code, code, self._remembered(self.previous_code), check=check)
+            else:
+                result = check(code)
+            self._remember(code, result)
+            return result
         except Exception as e:
             return f"Error running code style analysis: {str(e)}"
 
-    def generate_report(self, plan, tool_feedback, code):
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None):
         """Generate a final report based on the plan, tool feedback, and code."""
         report_prompt = f"""
         You are a coding style expert. Based on the following:
         - Analysis Plan: {plan}
-        - Tool Feedback: {tool_feedback}
+        - Tool Feedback: {compact_findings(tool_feedback)}
         - Code: {code}
 
         Generate a short report summarizing all coding style issues and suggesting improvements.
@@ -43,11 +87,11 @@ class CodeStyleAgent:
         Do not improve/revise the code.
         """
         try:
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating code style report: {str(e)}"
         
-    def check_report(self, report):
+    def check_report(self, report, cancel_token=None):
         """Check if there are coding style issues based on the report."""
         style_validation_prompt = f"""
         You are a coding style expert. Based on the following coding style report, determine if the code has any style issues.
@@ -56,20 +100,7 @@ class CodeStyleAgent:
         Answer only 'yes' if there are issues or 'no' if the code is fine.
         """
         try:
-            has_issues = query_gradio_client(style_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(style_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues
         except Exception as e:
             return f"Error checking code style report: {str(e)}"
-
-    def run(self, code):
-        """Execute the coding style checking workflow."""
-        try:  
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_style(code)
-            report = self.generate_report(plan, tool_analysis, code)
-            is_valid = self.check_report(report)
-            
-            return report, is_valid
-        except Exception as e:
-            return f"Error running code style analysis: {str(e)}", False
-    
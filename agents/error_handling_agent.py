@@ -1,12 +1,18 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
 
 
-class ErrorHandlingAgent:
+class ErrorHandlingAgent(AnalysisAgent):
+    subject = "error handling"
+
     def __init__(self, tool):
         self.tool = tool
         self.name = "ErrorHandlingAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code has any error handling issues"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing the code's error handling."""
         plan_prompt = f"""
         You are an error handling analysis expert. Create a simple step-by-step plan of max 5 steps to evaluate the error handling practices in the provided code.
@@ -18,23 +24,16 @@ class ErrorHandlingAgent:
         {code}
         """
         try:
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating error handling analysis plan: {str(e)}"
 
-    def analyze_error_handling(self, code):
-        """Run the error handling tool and return its output."""
-        try:
-            return self.tool.func(code)
-        except Exception as e:
-            return f"Error running error handling analysis: {str(e)}"
-
-    def generate_report(self, plan, tool_feedback, code):
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None):
         """Generate a final report based on the plan, tool feedback, and code."""
         report_prompt = f"""
         You are an error handling analysis expert. Based on the following:
         - Analysis Plan: {plan}
-        - Tool Feedback: {tool_feedback}
+        - Tool Feedback: {compact_findings(tool_feedback)}
         - Code: {code}
 
         Generate a short report summarizing all error handling issues within the code.
@@ -43,32 +42,19 @@ class ErrorHandlingAgent:
         Ensure that your response is logically consistent.
         """
         try:
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating error handling report: {str(e)}"
 
-    def check_analysis(self, analysis):
+    def check_report(self, report, cancel_token=None):
         """Check if there are error handling issues based on the report."""
         error_handling_validation_prompt = f"""
         You are an error handling analysis expert. Based on the following error handling analysis, determine if the code has any error handling issues.
-        Analysis: {analysis}
+        Analysis: {report}
         Answer only 'yes' if there are issues or 'no' if the code is fine.
         """
         try:
-            has_issues = query_gradio_client(error_handling_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(error_handling_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues
         except Exception as e:
             return f"Error checking error handling report: {str(e)}"
-
-    def run(self, code):
-        """Execute the error handling checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_error_handling(code)
-            report = self.generate_report(plan, tool_analysis, code)
-
-            is_valid = self.check_analysis(report)
-
-            return report, is_valid
-        except Exception as e:
-            return f"Error during error handling analysis workflow: {str(e)}", False            
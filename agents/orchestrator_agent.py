@@ -1,12 +1,33 @@
+import json
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from gradio_llm import query_gradio_client
 
+# Stages of a fan-out run, reported as the stage of its slowest agent
+FAN_OUT_STAGES = ("plan", "tool", "report", "verdict")
+
+class FanOutRun:
+    """A group of agents run as one unit (e.g. one background job), see OrchestratorAgent.run_all."""
+
+    # Workers only run single agents, so the group runs in the app process (its tools may still run remotely)
+    runs_locally = True
+
+    def __init__(self, orchestrator, agents):
+        self.orchestrator = orchestrator
+        self.agents = agents
+        self.name = "AllAgents"
+
+    def run(self, code, progress=None, cancel_token=None):
+        return self.orchestrator.run_all(code, self.agents, progress=progress, cancel_token=cancel_token)
+
+
 class OrchestratorAgent:
     def __init__(self, agents):
         self.name = "Orchestrator"
         self.agents = agents
         self.execution_plan = []
 
-    def create_plan_with_llm(self, code):
+    def create_plan_with_llm(self, code, cancel_token=None):
         plan_prompt = f"""
         You are an assistant coordinating a code analysis process. The available agents are:
         {', '.join(agent.name for agent in self.agents)}.
@@ -26,15 +47,15 @@ class OrchestratorAgent:
         ***
         """
         try:
-            response = query_gradio_client(plan_prompt)
-            self.execution_plan = self.parse_plan(response)
+            response = query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
+            self.execution_plan = self.parse_plan(response, cancel_token=cancel_token)
             if not self.execution_plan:
                 print("Warning: Execution plan is empty. Check the LLM response and parsed agent names.")
             return response
         except Exception as e:
             return f"Error generating execution plan: {str(e)}"
 
-    def parse_plan(self, plan):
+    def parse_plan(self, plan, cancel_token=None):
         parse_plan_prompt = f"""
         You have the task to parse the necessary agents from the given plan:
         {plan}
@@ -43,7 +64,7 @@ class OrchestratorAgent:
         ["SyntaxAgent", "SemanticsAgent"]
         """
         try:
-            parsed_plan = query_gradio_client(parse_plan_prompt)
+            parsed_plan = query_gradio_client(parse_plan_prompt, agent=self.name, stage="parse_plan", cancel_token=cancel_token)
             agent_names = eval(parsed_plan)
             if not isinstance(agent_names, list) or not all(isinstance(name, str) for name in agent_names):
                 raise ValueError("Parsed plan is not a valid list of agent names.")
@@ -54,7 +75,7 @@ class OrchestratorAgent:
         agent_dict = {agent.name: agent for agent in self.agents}
         return [agent_dict[name] for name in agent_names if name in agent_dict]
 
-    def adjust_plan_with_llm(self, initial_plan, user_feedback):
+    def adjust_plan_with_llm(self, initial_plan, user_feedback, cancel_token=None):
         adjust_prompt = f"""
         The user has requested adjustments to the plan:
         {initial_plan}
@@ -64,8 +85,8 @@ class OrchestratorAgent:
         Provide an updated execution plan based on the user's instructions. Clearly list the agents to be run and their order.
         """
         try:
-            response = query_gradio_client(adjust_prompt)
-            self.execution_plan = self.parse_plan(response)
+            response = query_gradio_client(adjust_prompt, agent=self.name, stage="adjust_plan", cancel_token=cancel_token)
+            self.execution_plan = self.parse_plan(response, cancel_token=cancel_token)
             return response
         except Exception as e:
             return f"Error adjusting execution plan: {str(e)}"
@@ -101,20 +122,161 @@ class OrchestratorAgent:
 
             Return only the action as a single word: 'run', 'adjust', or 'exit'.
             """
-            return query_gradio_client(decision_prompt).strip().lower()
+            return query_gradio_client(decision_prompt, agent=self.name, stage="decide").strip().lower()
         except Exception as e:
             return f"Error deciding next action: {str(e)}"
 
-    def execute(self, code):
+    def execute(self, code, cancel_token=None):
         try:
             code_list = []
             for agent in self.execution_plan:
-                code = agent.run(code)
+                code = agent.run(code, cancel_token=cancel_token)
                 code_list.append(f"{agent.name} Improved Code:\n{code}")
             return "\n\n".join(code_list)
         except Exception as e:
             return f"Error executing the workflow: {str(e)}"
 
+    def analyze_all(self, code, agents=None, progress=None, cancel_token=None):
+        """
+        Runs the analysis of several agents in parallel, without asking for their verdicts.
+
+        Returns:
+            dict: Agent name -> (report, tool_analysis), or the exception the analysis raised.
+        """
+        agents = agents if agents is not None else self.execution_plan
+        progress = progress or (lambda stage: None)
+        stages = {agent.name: FAN_OUT_STAGES[0] for agent in agents}
+        reported = [None]
+        lock = threading.Lock()
+
+        def agent_progress(name):
+            def update(stage):
+                with lock:
+                    stages[name] = stage
+                    slowest = min(stages.values(), key=FAN_OUT_STAGES.index)
+                    changed = slowest != reported[0]
+                    reported[0] = slowest
+                if changed:
+                    progress(slowest)
+                elif cancel_token is not None:
+                    cancel_token.raise_if_cancelled()
+            return update
+
+        def analyze(agent):
+            try:
+                return agent.analyze(code, progress=agent_progress(agent.name), cancel_token=cancel_token)
+            except Exception as e:
+                return e
+
+        with ThreadPoolExecutor(max_workers=max(len(agents), 1), thread_name_prefix="fan-out") as executor:
+            futures = {agent.name: executor.submit(analyze, agent) for agent in agents}
+            return {name: future.result() for name, future in futures.items()}
+
+    def check_all(self, analyses, agents=None, cancel_token=None):
+        """
+        Asks for the verdicts of all finished analyses in one prompt.
+        Agents without a valid verdict in the response are checked with their own prompt instead,
+        and agents that decide without the model (local_verdict) are never part of the prompt.
+
+        Args:
+            analyses: Agent name -> (report, tool_analysis).
+            agents: The agents that ran the analyses (the orchestrator's agents by default).
+
+        Returns:
+            dict: Agent name -> True if the agent found no issues.
+        """
+        agent_dict = {agent.name: agent for agent in (agents if agents is not None else self.agents)}
+        results = {
+            name: agent_dict[name].check(*analyses[name], cancel_token=cancel_token)
+            for name in analyses if name in agent_dict and getattr(agent_dict[name], "local_verdict", False)
+        }
+        agents = [agent_dict[name] for name in analyses if name in agent_dict and name not in results]
+        if not agents:
+            return results
+
+        sections = "\n\n".join(
+            f"### {agent.name}\nIssue criterion: {agent.verdict_criterion}\n{agent.verdict_evidence(*analyses[agent.name])}"
+            for agent in agents
+        )
+        example = json.dumps({agent.name: {"has_issues": False} for agent in agents[:2]})
+        verdict_prompt = f"""
+        You are reviewing the results of several code analysis agents. For each agent below, decide if its issue criterion is met.
+
+        {sections}
+
+        Answer only with a JSON object that has exactly one key per agent ({', '.join(agent.name for agent in agents)})
+        and the value {{"has_issues": true}} if the criterion is met or {{"has_issues": false}} if the code is fine.
+        Example:
+        {example}
+        """
+        try:
+            response = query_gradio_client(verdict_prompt, agent=self.name, stage="batch_verdict", cancel_token=cancel_token)
+            verdicts = self.parse_verdicts(response, [agent.name for agent in agents])
+        except Exception as e:
+            print(f"Error getting batched verdicts: {e}")
+            verdicts = {}
+
+        for agent in agents:
+            if agent.name in verdicts:
+                results[agent.name] = not verdicts[agent.name]
+            else:
+                # Missing or malformed verdict, fall back to the agent's own check
+                results[agent.name] = agent.check(*analyses[agent.name], cancel_token=cancel_token)
+        return results
+
+    def parse_verdicts(self, response, agent_names):
+        """
+        Validates a batched verdict response against the expected schema {"<agent>": {"has_issues": bool}}.
+
+        Returns:
+            dict: Agent name -> has_issues, only for the agents with a valid verdict.
+        """
+        start, end = response.find("{"), response.rfind("}")
+        if start == -1 or end < start:
+            return {}
+        try:
+            data = json.loads(response[start:end + 1])
+        except json.JSONDecodeError:
+            return {}
+        if not isinstance(data, dict):
+            return {}
+
+        verdicts = {}
+        for name in agent_names:
+            value = data.get(name)
+            if isinstance(value, dict):
+                value = value.get("has_issues")
+            if isinstance(value, bool):
+                verdicts[name] = value
+        return verdicts
+
+    def run_all(self, code, agents=None, progress=None, cancel_token=None):
+        """
+        Runs several agents in parallel and asks for all their verdicts in one prompt.
+
+        Returns:
+            list: (agent name, report, is_valid) in the order of the agents.
+        """
+        agents = agents if agents is not None else self.execution_plan
+        analyses = self.analyze_all(code, agents, progress=progress, cancel_token=cancel_token)
+        finished = {name: result for name, result in analyses.items() if not isinstance(result, Exception)}
+        if progress is not None:
+            progress("verdict")
+        verdicts = self.check_all(finished, agents, cancel_token=cancel_token)
+
+        results = []
+        for agent in agents:
+            result = analyses[agent.name]
+            if isinstance(result, Exception):
+                results.append((agent.name, f"Error running {agent.name}: {str(result)}", False))
+            else:
+                results.append((agent.name, result[0], verdicts[agent.name]))
+        return results
+
+    def fan_out(self, agents=None):
+        """Returns the agents of the plan (or the given ones) as one runnable unit."""
+        return FanOutRun(self, list(agents if agents is not None else self.execution_plan))
+
     def run_workflow(self, code):
         try:
             initial_plan = self.create_plan_with_llm(code)
@@ -1,11 +1,17 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
+
+class SecurityAnalysisAgent(AnalysisAgent):
+    subject = "security"
 
-class SecurityAnalysisAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "SecurityAnalysisAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code has vulnerabilities over MEDIUM severity (1-2 LOW severity issues are fine)"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing the security of the code."""
         plan_prompt = f"""
         You are a cybersecurity expert. Create a simple step-by-step plan of max 5 steps to analyze the security of the provided code.
@@ -24,23 +30,16 @@ class SecurityAnalysisAgent:
         {code}
         """
         try:
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating security analysis plan: {str(e)}"
 
-    def analyze_security(self, code):
-        """Run the security analysis tool and return its output."""
-        try:
-            return self.tool.func(code)
-        except Exception as e:
-            return f"Error running security analysis: {str(e)}"
-
-    def generate_report(self, plan, tool_feedback, code):
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None):
         """Generate a final security report based on the plan, tool feedback, and code."""
         report_prompt = f"""
         You are a cybersecurity expert. Based on the following:
         - Security Analysis Plan: {plan}
-        - Tool Feedback: {tool_feedback}
+        - Tool Feedback: {compact_findings(tool_feedback)}
         - Code: {code}
 
         Generate a short report summarizing all security vulnerabilities and suggesting improvements.
@@ -52,33 +51,30 @@ class SecurityAnalysisAgent:
         Do not improve/revise the code.
         """
         try:
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating security report: {str(e)}"
     
-    def check_report(self, report, tool_feedback):
+    def check_report(self, report, tool_feedback, cancel_token=None):
         """Check if there are security issues based on the report."""
         security_validation_prompt = f"""
         You are a cybersecurity expert. Based on the following security report, determine if the code has any security vulnerabilities.
 
         Report: {report}
-        Tool Feedback: {tool_feedback}
+        Tool Feedback: {compact_findings(tool_feedback)}
         Answer only 'yes' if there are vulnerabilities such as anything over MEDIUM severity.
         Answer only 'no' if the code is secure or only contains 1-2 LOW severity issues.
         """
         try:
-            has_issues = query_gradio_client(security_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(security_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues  # Returns True if code is secure, False otherwise.
         except Exception as e:
             return f"Error checking security report: {str(e)}"
 
-    def run(self, code):
-        """Execute the security checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_security(code)
-            report = self.generate_report(plan, tool_analysis, code)
-            is_valid = self.check_report(report, tool_analysis)
-            return report, is_valid
-        except Exception as e:
-            return f"Error during security analysis workflow: {str(e)}", False
\ No newline at end of file
+    def check(self, report, tool_analysis, cancel_token=None):
+        """Returns True if the analysis found no issues."""
+        return self.check_report(report, tool_analysis, cancel_token=cancel_token)
+
+    def verdict_evidence(self, report, tool_analysis):
+        """The verdict is based on the report and the bandit output."""
+        return f"Report: {report}\nTool Feedback: {compact_findings(tool_analysis)}"
@@ -1,11 +1,17 @@
 from gradio_llm import query_gradio_client
+from agents.analysis_agent import AnalysisAgent
+from tools.findings_compactor import compact_findings
+
+class SyntaxAgent(AnalysisAgent):
+    subject = "syntax"
 
-class SyntaxAgent:
     def __init__(self, tool):
         self.tool = tool
         self.name = "SyntaxAgent"
+        # What counts as an issue when all verdicts are asked for in one prompt
+        self.verdict_criterion = "the code has any syntax issues"
 
-    def create_plan(self, code):
+    def create_plan(self, code, cancel_token=None):
         """Create a plan for analyzing the code's syntax."""
         try:
             plan_prompt = f"""
@@ -17,34 +23,34 @@ class SyntaxAgent:
             Code:
             {code}
             """
-            return query_gradio_client(plan_prompt)
+            return query_gradio_client(plan_prompt, agent=self.name, stage="plan", cancel_token=cancel_token)
         except Exception as e:
             return f"Error creating plan: {str(e)}"
 
-    def analyze_syntax(self, code):
+    def run_tool(self, code, cancel_token=None):
         """Run the syntax tool and return its output."""
         try:
-            return self.tool.func(code)
+            return self.tool.func(code, cancel_token=cancel_token)
         except Exception as e:
             return [{"line": 0, "message": f"Error during syntax analysis: {str(e)}"}]
 
-    def generate_report(self, plan, tool_feedback, code):
+    def generate_report(self, plan, tool_feedback, code, cancel_token=None):
         """Generate a final report based on the plan, tool feedback, and code."""
         try:
             report_prompt = f"""
             You are a syntax analysis expert. Based on the following:
             - Analysis Plan: {plan}
-            - Tool Feedback: {tool_feedback}
+            - Tool Feedback: {compact_findings(tool_feedback)}
             - Code: {code}
             
             Generate a short report summarizing all syntax issues within the code.
             Do not improve/revise the code.
             """
-            return query_gradio_client(report_prompt)
+            return query_gradio_client(report_prompt, agent=self.name, stage="report", cancel_token=cancel_token)
         except Exception as e:
             return f"Error generating report: {str(e)}"
     
-    def check_analysis(self, analysis):
+    def check_analysis(self, analysis, cancel_token=None):
         """Check if there are syntax issues based on the report."""
         try:
             syntax_validation_prompt = f"""
@@ -52,20 +58,15 @@ class SyntaxAgent:
             Analysis: {analysis}
             Answer only 'yes' if there are issues or 'no' if the code is fine.
             """
-            has_issues = query_gradio_client(syntax_validation_prompt).strip().lower() == "yes"
+            has_issues = query_gradio_client(syntax_validation_prompt, agent=self.name, stage="verdict", cancel_token=cancel_token).strip().lower() == "yes"
             return not has_issues  # Returns True if code is fine, False otherwise.
         except Exception as e:
             return False  # Assume there are issues if error occurs during validation
-        
-    def run(self, code):
-        """Execute the syntax checking workflow."""
-        try:
-            plan = self.create_plan(code)
-            tool_analysis = self.analyze_syntax(code)
-            report = self.generate_report(plan, tool_analysis, code)
 
-            is_valid = self.check_analysis(tool_analysis)
+    def check(self, report, tool_analysis, cancel_token=None):
+        """Returns True if the syntax tool found no issues."""
+        return self.check_analysis(tool_analysis, cancel_token=cancel_token)
 
-            return report, is_valid
-        except Exception as e:
-            return f"Error during syntax analysis workflow: {str(e)}", False
\ No newline at end of file
+    def verdict_evidence(self, report, tool_analysis):
+        """The verdict is based on the syntax tool output."""
+        return f"Analysis: {tool_analysis}"
@@ -1,42 +1,34 @@
+import config  # Loads .env before the modules below read their settings
 import streamlit as st
-from agents.orchestrator_agent import OrchestratorAgent
-from agents.syntax_agent import SyntaxAgent
-from agents.semantics_agent import SemanticsAgent
-from agents.code_style_agent import CodeStyleAgent
-from agents.code_structure_agent import CodeStructureAgent
-from agents.security_analysis_agent import SecurityAnalysisAgent
-from agents.code_efficiency_agent import CodeEfficiencyAgent
-from agents.documentation_agent import DocumentationAgent
-from agents.error_handling_agent import ErrorHandlingAgent
-from agents.best_practices_agent import BestPracticesAgent
-from tools.syntax_tool import syntax_tool
-from tools.semantics_tool import semantics_tool
-from tools.code_style_tool import code_style_tool
-from tools.code_structure_tool import code_structure_tool
-from tools.security_analysis_tool import security_analysis_tool
-from tools.code_efficiency_tool import code_efficiency_tool
-from tools.documentation_tool import documentation_tool
-from tools.error_handling_tool import error_handling_tool
-from tools.best_practices_tool import best_practices_tool
-
-# Initialize Agents
-syntax_agent = SyntaxAgent(syntax_tool)
-semantics_agent = SemanticsAgent(semantics_tool)
-code_style_agent = CodeStyleAgent(code_style_tool)
-documentation_agent = DocumentationAgent(documentation_tool)
-code_structure_agent = CodeStructureAgent(code_structure_tool)
-security_analysis_agent = SecurityAnalysisAgent(security_analysis_tool)
-code_efficiency_agent = CodeEfficiencyAgent(code_efficiency_tool)
-error_handling_agent = ErrorHandlingAgent(error_handling_tool)
-best_practices_agent = BestPracticesAgent(best_practices_tool)
-orchestrator = OrchestratorAgent(agents=[syntax_agent, semantics_agent, code_style_agent, code_structure_agent, security_analysis_agent, code_efficiency_agent, documentation_agent, error_handling_agent, best_practices_agent])
+import uuid
+from pipeline import build_agents, build_orchestrator, remote_tool
+from prompt_accounting import prompt_ledger, summary_table_row
+from speculation import SpeculativeRuns
+from jobs import BROKER_DISPATCH, STAGES, job_manager
+from session_store import SessionHistory, purge_history
+from admission import admit, admitted, default_plan
+import metrics
+
+# Initialize Agents (with a broker in "tool" mode, the analysis tools run on remote workers)
+if job_manager.broker is not None and BROKER_DISPATCH == "tool":
+    orchestrator = build_orchestrator(build_agents(wrap_tool=lambda tool: remote_tool(tool, job_manager.broker)))
+else:
+    orchestrator = build_orchestrator()
+
+# Serves /metrics once per server process if METRICS_PORT is set
+metrics.start_metrics_server()
 
 st.title("💬 LLM Code Tutor Chatbot")
 st.markdown("Analyze and improve your code with AI-driven syntax and semantic checks.")
 
 # Initialize session state
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+metrics.touch_session(st.session_state["session_id"])
 if "chat_history" not in st.session_state:
-    st.session_state["chat_history"] = []
+    # Keeps only the newest messages in memory, older ones are spilled to disk
+    st.session_state["chat_history"] = SessionHistory(st.session_state["session_id"])
+    purge_history()  # Spilled messages of expired sessions
 if "code" not in st.session_state:
     st.session_state["code"] = ""
 if "plan" not in st.session_state:
@@ -51,6 +43,69 @@ if "code_needs_fixing" not in st.session_state:
     st.session_state["code_needs_fixing"] = False
 if "waiting_for_next" not in st.session_state:
     st.session_state["waiting_for_next"] = False
+if "speculative_runs" not in st.session_state:
+    st.session_state["speculative_runs"] = SpeculativeRuns(st.session_state["session_id"])
+if "current_job_id" not in st.session_state:
+    st.session_state["current_job_id"] = None
+if "run_all" not in st.session_state:
+    st.session_state["run_all"] = False
+if "profiles" not in st.session_state:
+    st.session_state["profiles"] = []
+if "admission" not in st.session_state:
+    st.session_state["admission"] = None  # Mode the current code is analyzed in, decided by its size
+if "previous_code" not in st.session_state:
+    st.session_state["previous_code"] = None  # The code the current code is a revision of
+
+
+def agent_for_code(agent):
+    """The agent as run on the current code: in the mode of its admission, re-checking only the edits of a revision."""
+    if st.session_state["previous_code"] is not None and hasattr(agent, "for_revision"):
+        agent = agent.for_revision(st.session_state["previous_code"])
+    return admitted(agent, st.session_state["admission"])
+
+
+def cancel_current_job():
+    """Cancels the running analysis job of this session."""
+    if st.session_state.get("current_job_id"):
+        job_manager.cancel(st.session_state["current_job_id"])
+        st.session_state["current_job_id"] = None
+
+
+@st.fragment(run_every=1.0)
+def show_job_progress(job_id):
+    """Polls a background analysis job and reruns the app once it has finished."""
+    job = job_manager.get(job_id)
+    if job is None or job.done:
+        st.rerun()
+    stage = job.stage or "queued"
+    st.progress(job.progress, text=f"⏳ {job.agent_name}: {stage} ({job.elapsed:.1f}s)")
+    steps = []
+    for name in STAGES:
+        if name in job.stage_times:
+            steps.append(f"✅ {name} ({job.stage_times[name]:.1f}s)")
+        elif name == job.stage:
+            steps.append(f"⏳ **{name}** ({job.stage_elapsed:.1f}s)")
+        else:
+            steps.append(name)
+    st.caption(" → ".join(steps))
+
+
+# Prompt accounting for all LLM calls made by this server
+with st.sidebar.expander("📊 Prompt Accounting"):
+    prompt_stats = prompt_ledger.summary()
+    if prompt_stats:
+        st.dataframe([summary_table_row(row) for row in prompt_stats])
+    else:
+        st.caption("No LLM calls yet.")
+
+# Profiling of this session's agent runs (PROFILE_AGENTS profiles them for every session)
+with st.sidebar.expander("🔬 Profiling"):
+    profile_runs = st.checkbox("Profile agent runs", key="profile_runs",
+                               help="Records a cProfile dump, a collapsed-stack flamegraph and the top allocations of every agent run.")
+    # None leaves it to PROFILE_AGENTS
+    st.session_state["speculative_runs"].profile = True if profile_runs else None
+    for agent_name, paths in st.session_state["profiles"][-5:]:
+        st.caption(f"{agent_name}: `{paths['summary']}`, flamegraph `{paths['collapsed']}`")
 
 # User input for the code snippet
 code_snippet = st.text_area("✍️ Enter your code for analysis:", st.session_state["code"], height=300)
@@ -61,13 +116,22 @@ if st.button("🛠️ Generate Execution Plan"):
     else:
         try:
             st.session_state["code"] = code_snippet
-            plan = orchestrator.create_plan_with_llm(code_snippet)
+            st.session_state["previous_code"] = None
+            st.session_state["speculative_runs"].discard()
+            cancel_current_job()
+            admission = st.session_state["admission"] = admit(code_snippet)
+            if admission.mode == "full":
+                plan = orchestrator.create_plan_with_llm(code_snippet)
+                st.session_state["execution_plan"] = orchestrator.parse_plan(plan)
+            else:
+                # Large input: no plan-generation prompts, every agent runs
+                plan = default_plan(orchestrator.agents, admission)
+                st.session_state["execution_plan"] = list(orchestrator.agents)
             st.session_state["plan"] = plan
-            st.session_state["execution_plan"] = orchestrator.parse_plan(plan)
             st.session_state["last_checked_agent_index"] = 0
             st.session_state["code_needs_fixing"] = False
             st.session_state["waiting_for_next"] = False
-            st.session_state["chat_history"] = []
+            st.session_state["chat_history"].clear()
             st.success("Execution plan created! You can adjust it before running analysis.")
         except Exception as e:
             st.error(f"Error generating execution plan: {e}")
@@ -93,14 +157,30 @@ if st.session_state["plan"]:
 if st.session_state["plan"] and st.button("🚀 Run Analysis"):
     try:
         st.session_state["running_analysis"] = True
+        st.session_state["run_all"] = False
         st.session_state["code_needs_fixing"] = False
         st.session_state["last_checked_agent_index"] = 0
         st.session_state["waiting_for_next"] = False
+        cancel_current_job()
         st.markdown(f"## 🚀 Running Analysis: {st.session_state['execution_plan'][st.session_state['last_checked_agent_index']].name}")
         st.rerun()
     except Exception as e:
         st.error(f"Error starting analysis: {e}")
 
+# Run all agents of the plan in parallel, their verdicts are asked for in one prompt
+if st.session_state["plan"] and st.button("⚡ Run All Agents"):
+    try:
+        st.session_state["running_analysis"] = True
+        st.session_state["run_all"] = True
+        st.session_state["code_needs_fixing"] = False
+        st.session_state["last_checked_agent_index"] = 0
+        st.session_state["waiting_for_next"] = False
+        st.session_state["speculative_runs"].discard()
+        cancel_current_job()
+        st.rerun()
+    except Exception as e:
+        st.error(f"Error starting analysis: {e}")
+
 # Analysis Loop
 if st.session_state["running_analysis"] and not st.session_state["waiting_for_next"]:
     if not st.session_state["execution_plan"]:
@@ -110,42 +190,108 @@ if st.session_state["running_analysis"] and not st.session_state["waiting_for_ne
     # Get the current agent
     agent_index = st.session_state["last_checked_agent_index"]
 
-    if agent_index < len(st.session_state["execution_plan"]):
-        agent = st.session_state["execution_plan"][agent_index]
+    if st.session_state["run_all"] and st.session_state["execution_plan"]:
+        job = job_manager.get(st.session_state["current_job_id"]) if st.session_state["current_job_id"] else None
 
-        # Show running agent
-        st.session_state["chat_history"].append(f"## 🚀 Running Analysis: {agent.name}")
+        if job is None:
+            agent_names = ", ".join(agent.name for agent in st.session_state["execution_plan"])
+            st.session_state["chat_history"].append(f"## 🚀 Running Analysis: {agent_names}")
+            fan_out = orchestrator.fan_out([agent_for_code(agent) for agent in st.session_state["execution_plan"]])
+            job = job_manager.submit(st.session_state["session_id"], fan_out, st.session_state["code"],
+                                     profile=st.session_state["speculative_runs"].profile)
+            st.session_state["current_job_id"] = job.id
 
-        try:
-            # Run the agent and get the report
-            report, is_valid = agent.run(st.session_state["code"])
+        if not job.done:
+            show_job_progress(job.id)
+        else:
+            st.session_state["current_job_id"] = None
+            st.session_state["running_analysis"] = False
+            job_manager.forget(job.id)
+            if job.profile_paths:
+                st.session_state["profiles"].append((job.agent_name, job.profile_paths))
+
+            if job.status != "done":
+                st.error(f"Error running agents: {job.error or job.status}")
+            else:
+                failed_agents = []
+                for agent_name, report, is_valid in job.result:
+                    st.session_state["chat_history"].append(report)
+                    if is_valid:
+                        st.session_state["chat_history"].append(f"✅ **{agent_name} has finished. No issues detected.**")
+                    else:
+                        failed_agents.append(agent_name)
+
+                if failed_agents:
+                    st.session_state["chat_history"].append(f"⚠️ **Issues detected by {', '.join(failed_agents)}! Please correct the code below and submit it.**")
+                    st.session_state["code_needs_fixing"] = True
+
+    elif agent_index < len(st.session_state["execution_plan"]):
+        agent = agent_for_code(st.session_state["execution_plan"][agent_index])
+        job = job_manager.get(st.session_state["current_job_id"]) if st.session_state["current_job_id"] else None
+
+        if job is None:
+            # Show running agent
+            st.session_state["chat_history"].append(f"## 🚀 Running Analysis: {agent.name}")
 
-            # Display the agent's report
-            st.session_state["chat_history"].append(report)
+            # Use the background run started while the user was reading, if there is one
+            job = st.session_state["speculative_runs"].take(agent, st.session_state["code"])
+            if job is None:
+                job = job_manager.submit(st.session_state["session_id"], agent, st.session_state["code"],
+                                         profile=st.session_state["speculative_runs"].profile)
+            st.session_state["current_job_id"] = job.id
 
-            if not is_valid:
-                # If issues are found, stop and ask the user to correct them
-                st.session_state["chat_history"].append("⚠️ **Issues detected! Please correct the code below and submit it.**")
-                st.session_state["code_needs_fixing"] = True
-                st.session_state["running_analysis"] = False
+        if not job.done:
+            # The page stays responsive while the agent runs, the fragment reruns the app once it is done
+            show_job_progress(job.id)
+        else:
+            st.session_state["current_job_id"] = None
+            job_manager.forget(job.id)
+            if job.profile_paths:
+                st.session_state["profiles"].append((job.agent_name, job.profile_paths))
 
+            if job.status != "done":
+                st.error(f"Error running agent {agent.name}: {job.error or job.status}")
             else:
-                # If code passes, confirm success
-                st.session_state["chat_history"].append(f"✅ **{agent.name} has finished. No issues detected.**")
-                st.session_state["last_checked_agent_index"] += 1
-
-                # Check if another agent exists
-                if st.session_state["last_checked_agent_index"] < len(st.session_state["execution_plan"]):
-                    next_agent = st.session_state["execution_plan"][st.session_state["last_checked_agent_index"]]
-                    st.session_state["chat_history"].append(f"### ⏭️ Next Agent: {next_agent.name}")
-
-                    # Pause and wait for user confirmation
-                    st.session_state["waiting_for_next"] = True
-                    st.rerun()
-        except Exception as e:
-            st.error(f"Error running agent {agent.name}: {e}")
+                report, is_valid = job.result
+
+                # Display the agent's report
+                st.session_state["chat_history"].append(report)
+
+                if not is_valid:
+                    # If issues are found, stop and ask the user to correct them
+                    st.session_state["chat_history"].append("⚠️ **Issues detected! Please correct the code below and submit it.**")
+                    st.session_state["code_needs_fixing"] = True
+                    st.session_state["running_analysis"] = False
+
+                else:
+                    # If code passes, confirm success
+                    st.session_state["chat_history"].append(f"✅ **{agent.name} has finished. No issues detected.**")
+                    st.session_state["last_checked_agent_index"] += 1
+
+                    # Check if another agent exists
+                    if st.session_state["last_checked_agent_index"] < len(st.session_state["execution_plan"]):
+                        next_agent = st.session_state["execution_plan"][st.session_state["last_checked_agent_index"]]
+                        st.session_state["chat_history"].append(f"### ⏭️ Next Agent: {next_agent.name}")
 
-# Display chat history
+                        # Start the next agent(s) in the background while the user reads the report
+                        remaining_agents = [agent_for_code(agent) for agent in
+                                            st.session_state["execution_plan"][st.session_state["last_checked_agent_index"]:]]
+                        st.session_state["speculative_runs"].start(remaining_agents, st.session_state["code"])
+
+                        # Pause and wait for user confirmation
+                        st.session_state["waiting_for_next"] = True
+                        st.rerun()
+
+# Display chat history, older messages are loaded back from disk on request
+if st.session_state["chat_history"].has_older():
+    if st.button("⬆️ Load earlier messages"):
+        if st.session_state["chat_history"].load_older() or not st.session_state["chat_history"].has_paged():
+            st.rerun()
+        st.info("The earlier messages shown reached the memory limit of this session (HISTORY_MAX_BYTES), hide them first.")
+if st.session_state["chat_history"].has_paged():
+    if st.button("⬇️ Hide earlier messages"):
+        st.session_state["chat_history"].collapse()
+        st.rerun()
 for message in st.session_state["chat_history"]:
     st.markdown(message)
 
@@ -166,7 +312,14 @@ if st.session_state["code_needs_fixing"]:
     if st.button("🔄 Submit Revised Code"):
         try:
             st.markdown(f"## 🚀 Running Analysis: {st.session_state['execution_plan'][st.session_state['last_checked_agent_index']].name}")
+            # The style agent only re-checks the lines edited since the previous submission
+            st.session_state["previous_code"] = st.session_state["code"]
             st.session_state["code"] = corrected_code
+            st.session_state["admission"] = admit(corrected_code)
+            # Drop all work on the old code, including LLM calls and subprocesses still in flight
+            st.session_state["speculative_runs"].discard()
+            job_manager.cancel_session(st.session_state["session_id"])
+            st.session_state["current_job_id"] = None
             st.session_state["running_analysis"] = True
             st.session_state["code_needs_fixing"] = False
             st.session_state["waiting_for_next"] = False
@@ -176,6 +329,10 @@ if st.session_state["code_needs_fixing"]:
 
 if st.button("🔄 Restart Workflow"):
     try:
+        if "session_id" in st.session_state:
+            job_manager.cancel_session(st.session_state["session_id"])
+        if "chat_history" in st.session_state:
+            st.session_state["chat_history"].clear()
         for key in list(st.session_state.keys()):
             del st.session_state[key]  # Clears all stored session state variables
         st.rerun()
@@ -0,0 +1,473 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from cancellation import OperationCancelled
+
+# Where tasks are queued, e.g. "sqlite:///broker.sqlite3" or "redis://localhost:6379/0" (empty runs everything locally)
+ANALYSIS_BROKER_URL = os.getenv("ANALYSIS_BROKER_URL", "")
+# Seconds a worker may hold a task without a heartbeat before it is handed to another worker
+VISIBILITY_TIMEOUT = float(os.getenv("BROKER_VISIBILITY_TIMEOUT", "60"))
+# Deliveries of a task before it is marked as failed
+MAX_ATTEMPTS = int(os.getenv("BROKER_MAX_ATTEMPTS", "3"))
+# Seconds results of finished tasks are kept
+RESULT_TTL = int(os.getenv("BROKER_RESULT_TTL", "3600"))
+# Workers without a heartbeat for this many seconds are considered dead
+WORKER_TIMEOUT = float(os.getenv("BROKER_WORKER_TIMEOUT", "30"))
+
+
+class Broker(ABC):
+    """
+    Task queue shared by the app and the workers, with at-least-once delivery:
+    a reserved task is handed out again if its worker stops sending heartbeats.
+
+    Task statuses: queued -> running -> done / failed, or cancelled at any time.
+    """
+
+    @abstractmethod
+    def enqueue(self, kind, payload, max_attempts=MAX_ATTEMPTS, dedupe_key=None):
+        """
+        Queues a task and returns its id.
+        If a queued or running task has the same dedupe_key, its id is returned instead of queueing a new task.
+        """
+
+    @abstractmethod
+    def reserve(self, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        """Takes the oldest queued task for a worker. Returns the task dict or None."""
+
+    @abstractmethod
+    def update_stage(self, task_id, stage):
+        """Records the stage a running task reached."""
+
+    @abstractmethod
+    def complete(self, task_id, result):
+        """Marks a task as done with its result."""
+
+    @abstractmethod
+    def fail(self, task_id, error, retry=False):
+        """Marks a task as failed, or queues it again if retry is set and it has attempts left."""
+
+    @abstractmethod
+    def cancel(self, task_id):
+        """Marks a queued or running task as cancelled; finished tasks keep their status."""
+
+    @abstractmethod
+    def get_task(self, task_id):
+        """Returns the task dict (id, kind, payload, status, stage, attempts, result, error, worker_id) or None."""
+
+    @abstractmethod
+    def heartbeat(self, worker_id, task_ids=(), info=None):
+        """Records that a worker is alive and extends the leases of the tasks it holds."""
+
+    @abstractmethod
+    def workers(self):
+        """Returns the workers that sent a heartbeat recently."""
+
+    @abstractmethod
+    def requeue_expired(self):
+        """Hands tasks whose lease expired (their worker died) back to the queue."""
+
+    def wait(self, task_id, timeout=None, poll_interval=0.1, cancel_token=None, on_stage=None, cancel_task=True):
+        """
+        Waits for a task to finish. Cancels the task if the cancellation token is cancelled,
+        unless cancel_task is False (e.g. because other callers share the task).
+
+        Returns:
+            The task result.
+
+        Raises:
+            RuntimeError: If the task failed.
+            TimeoutError: If the timeout expired.
+            OperationCancelled: If the task or the token was cancelled.
+        """
+        deadline = time.time() + timeout if timeout is not None else None
+        stage = None
+        unregister = lambda: None
+        if cancel_token is not None and cancel_task:
+            unregister = cancel_token.register(lambda: self.cancel(task_id))
+        try:
+            while True:
+                task = self.get_task(task_id)
+                if task is None:
+                    raise RuntimeError(f"Task {task_id} does not exist.")
+                if on_stage is not None and task["stage"] and task["stage"] != stage:
+                    stage = task["stage"]
+                    on_stage(stage)
+                if task["status"] == "done":
+                    return task["result"]
+                if task["status"] == "failed":
+                    raise RuntimeError(f"Task {task_id} failed: {task['error']}")
+                if task["status"] == "cancelled":
+                    raise OperationCancelled()
+                if deadline is not None and time.time() > deadline:
+                    raise TimeoutError(f"Task {task_id} did not finish within {timeout} seconds.")
+                if cancel_token is not None:
+                    if cancel_token.wait(poll_interval):
+                        raise OperationCancelled()
+                else:
+                    time.sleep(poll_interval)
+        finally:
+            unregister()
+
+
+class SQLiteBroker(Broker):
+    """
+    Broker on a SQLite database. Use a file shared by the processes of one host,
+    or ":memory:" to run workers as threads in the same process (e.g. for tests).
+    """
+
+    def __init__(self, path=":memory:"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        if path != ":memory:":
+            self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.executescript("""
+            CREATE TABLE IF NOT EXISTS tasks (
+                id TEXT PRIMARY KEY,
+                kind TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                result TEXT,
+                error TEXT,
+                worker_id TEXT,
+                lease_until REAL,
+                dedupe_key TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS tasks_queue ON tasks (status, created_at);
+            CREATE TABLE IF NOT EXISTS workers (
+                id TEXT PRIMARY KEY,
+                info TEXT,
+                last_seen REAL NOT NULL
+            );
+        """)
+        # Broker files created before tasks could be de-duplicated lack the column
+        columns = {row[1] for row in self._connection.execute("PRAGMA table_info(tasks)")}
+        if "dedupe_key" not in columns:
+            self._connection.execute("ALTER TABLE tasks ADD COLUMN dedupe_key TEXT")
+        self._connection.execute("CREATE INDEX IF NOT EXISTS tasks_dedupe ON tasks (dedupe_key, status)")
+
+    def _execute(self, sql, params=()):
+        with self._lock:
+            return self._connection.execute(sql, params).fetchall()
+
+    def enqueue(self, kind, payload, max_attempts=MAX_ATTEMPTS, dedupe_key=None):
+        task_id = uuid.uuid4().hex
+        with self._lock:
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = None
+                if dedupe_key is not None:
+                    row = self._connection.execute(
+                        "SELECT id FROM tasks WHERE dedupe_key = ? AND status IN ('queued', 'running') LIMIT 1",
+                        (dedupe_key,),
+                    ).fetchone()
+                if row is None:
+                    self._connection.execute(
+                        "INSERT INTO tasks (id, kind, payload, status, max_attempts, dedupe_key, created_at) "
+                        "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                        (task_id, kind, json.dumps(payload), max_attempts, dedupe_key, time.time()),
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return row[0] if row is not None else task_id
+
+    def reserve(self, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        self.requeue_expired()
+        with self._lock:
+            # BEGIN IMMEDIATE takes the write lock, so two workers never reserve the same task
+            self._connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._connection.execute(
+                    "SELECT id FROM tasks WHERE status = 'queued' ORDER BY created_at LIMIT 1"
+                ).fetchone()
+                if row is not None:
+                    self._connection.execute(
+                        "UPDATE tasks SET status = 'running', worker_id = ?, lease_until = ?, attempts = attempts + 1 WHERE id = ?",
+                        (worker_id, time.time() + visibility_timeout, row[0]),
+                    )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+        return self.get_task(row[0]) if row is not None else None
+
+    def update_stage(self, task_id, stage):
+        self._execute("UPDATE tasks SET stage = ? WHERE id = ?", (stage, task_id))
+
+    def complete(self, task_id, result):
+        self._execute(
+            "UPDATE tasks SET status = 'done', result = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (json.dumps(result, default=str), time.time(), task_id),
+        )
+
+    def fail(self, task_id, error, retry=False):
+        if retry:
+            self._execute(
+                "UPDATE tasks SET status = 'queued', worker_id = NULL, lease_until = NULL, error = ? "
+                "WHERE id = ? AND status = 'running' AND attempts < max_attempts",
+                (error, task_id),
+            )
+        self._execute(
+            "UPDATE tasks SET status = 'failed', error = ?, finished_at = ? WHERE id = ? AND status = 'running'",
+            (error, time.time(), task_id),
+        )
+
+    def cancel(self, task_id):
+        self._execute(
+            "UPDATE tasks SET status = 'cancelled', finished_at = ? WHERE id = ? AND status IN ('queued', 'running')",
+            (time.time(), task_id),
+        )
+
+    def get_task(self, task_id):
+        rows = self._execute(
+            "SELECT id, kind, payload, status, stage, attempts, result, error, worker_id FROM tasks WHERE id = ?",
+            (task_id,),
+        )
+        if not rows:
+            return None
+        task_id, kind, payload, status, stage, attempts, result, error, worker_id = rows[0]
+        return {
+            "id": task_id,
+            "kind": kind,
+            "payload": json.loads(payload),
+            "status": status,
+            "stage": stage,
+            "attempts": attempts,
+            "result": json.loads(result) if result is not None else None,
+            "error": error,
+            "worker_id": worker_id,
+        }
+
+    def heartbeat(self, worker_id, task_ids=(), info=None):
+        now = time.time()
+        self._execute(
+            "INSERT OR REPLACE INTO workers (id, info, last_seen) VALUES (?, ?, ?)",
+            (worker_id, json.dumps(info or {}), now),
+        )
+        for task_id in task_ids:
+            self._execute(
+                "UPDATE tasks SET lease_until = ? WHERE id = ? AND worker_id = ? AND status = 'running'",
+                (now + VISIBILITY_TIMEOUT, task_id, worker_id),
+            )
+
+    def workers(self):
+        rows = self._execute("SELECT id, info, last_seen FROM workers WHERE last_seen > ?", (time.time() - WORKER_TIMEOUT,))
+        return [{"id": worker_id, "info": json.loads(info), "last_seen": last_seen} for worker_id, info, last_seen in rows]
+
+    def requeue_expired(self):
+        now = time.time()
+        self._execute(
+            "UPDATE tasks SET status = 'failed', error = 'Worker lease expired too many times.', finished_at = ? "
+            "WHERE status = 'running' AND lease_until < ? AND attempts >= max_attempts",
+            (now, now),
+        )
+        self._execute(
+            "UPDATE tasks SET status = 'queued', worker_id = NULL, lease_until = NULL "
+            "WHERE status = 'running' AND lease_until < ?",
+            (now,),
+        )
+        # Drop finished tasks whose results nobody collected
+        self._execute("DELETE FROM tasks WHERE status IN ('done', 'failed', 'cancelled') AND finished_at < ?", (now - RESULT_TTL,))
+
+
+# Returns the id of a queued or running task with the same dedupe key, or else queues the new task under the key
+_REDIS_ENQUEUE_DEDUPE = """
+local existing = redis.call('GET', KEYS[1])
+if existing then
+    local status = redis.call('HGET', ARGV[2] .. existing, 'status')
+    if status == 'queued' or status == 'running' then return existing end
+end
+redis.call('HSET', ARGV[2] .. ARGV[1], 'id', ARGV[1], 'kind', ARGV[3], 'payload', ARGV[4], 'status', 'queued',
+           'stage', '', 'attempts', 0, 'max_attempts', ARGV[5], 'worker_id', '')
+redis.call('RPUSH', KEYS[2], ARGV[1])
+redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[6])
+return ARGV[1]
+"""
+
+# Atomically moves the oldest queued task into the lease set and marks it as running
+_REDIS_RESERVE = """
+local task_id = redis.call('LPOP', KEYS[1])
+if not task_id then return nil end
+redis.call('ZADD', KEYS[2], ARGV[1], task_id)
+local key = ARGV[3] .. task_id
+redis.call('HSET', key, 'status', 'running', 'worker_id', ARGV[2])
+redis.call('HINCRBY', key, 'attempts', 1)
+return task_id
+"""
+
+# Hands a task with an expired lease back to the queue, or fails it if it has no attempts left
+_REDIS_REQUEUE = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return 0 end
+local key = ARGV[2] .. ARGV[1]
+if redis.call('HGET', key, 'status') ~= 'running' then return 0 end
+if tonumber(redis.call('HGET', key, 'attempts')) >= tonumber(redis.call('HGET', key, 'max_attempts')) then
+    redis.call('HSET', key, 'status', 'failed', 'error', 'Worker lease expired too many times.')
+    redis.call('EXPIRE', key, ARGV[3])
+    return 0
+end
+redis.call('HSET', key, 'status', 'queued', 'worker_id', '')
+redis.call('RPUSH', KEYS[2], ARGV[1])
+return 1
+"""
+
+
+class RedisBroker(Broker):
+    """Broker on Redis (or any server speaking the Redis protocol with Lua scripting) for multi-host deployments."""
+
+    def __init__(self, url, prefix="llm_code_tutor"):
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("The redis package is required for a redis:// broker. Install it with 'pip install redis'.")
+        self._redis = redis.Redis.from_url(url, decode_responses=True)
+        self._queue = f"{prefix}:queue"
+        self._leases = f"{prefix}:leases"
+        self._workers = f"{prefix}:workers"
+        self._dedupe_prefix = f"{prefix}:dedupe:"
+        self._task_prefix = f"{prefix}:task:"
+        self._reserve_script = self._redis.register_script(_REDIS_RESERVE)
+        self._requeue_script = self._redis.register_script(_REDIS_REQUEUE)
+        self._enqueue_dedupe_script = self._redis.register_script(_REDIS_ENQUEUE_DEDUPE)
+
+    def enqueue(self, kind, payload, max_attempts=MAX_ATTEMPTS, dedupe_key=None):
+        task_id = uuid.uuid4().hex
+        if dedupe_key is not None:
+            return self._enqueue_dedupe_script(
+                keys=[self._dedupe_prefix + dedupe_key, self._queue],
+                args=[task_id, self._task_prefix, kind, json.dumps(payload), max_attempts, RESULT_TTL],
+            )
+        pipe = self._redis.pipeline()
+        pipe.hset(self._task_prefix + task_id, mapping={
+            "id": task_id,
+            "kind": kind,
+            "payload": json.dumps(payload),
+            "status": "queued",
+            "stage": "",
+            "attempts": 0,
+            "max_attempts": max_attempts,
+            "worker_id": "",
+        })
+        pipe.rpush(self._queue, task_id)
+        pipe.execute()
+        return task_id
+
+    def reserve(self, worker_id, visibility_timeout=VISIBILITY_TIMEOUT):
+        self.requeue_expired()
+        while True:
+            task_id = self._reserve_script(
+                keys=[self._queue, self._leases],
+                args=[time.time() + visibility_timeout, worker_id, self._task_prefix],
+            )
+            if task_id is None:
+                return None
+            task = self.get_task(task_id)
+            if task is not None and task["status"] == "running":
+                return task
+            self._redis.zrem(self._leases, task_id)  # Cancelled while it was queued
+
+    def update_stage(self, task_id, stage):
+        self._redis.hset(self._task_prefix + task_id, "stage", stage)
+
+    def _finish(self, task_id, mapping):
+        key = self._task_prefix + task_id
+        if self._redis.hget(key, "status") != "running":
+            return
+        pipe = self._redis.pipeline()
+        pipe.hset(key, mapping=mapping)
+        pipe.zrem(self._leases, task_id)
+        pipe.expire(key, RESULT_TTL)
+        pipe.execute()
+
+    def complete(self, task_id, result):
+        self._finish(task_id, {"status": "done", "result": json.dumps(result, default=str)})
+
+    def fail(self, task_id, error, retry=False):
+        key = self._task_prefix + task_id
+        attempts, max_attempts = self._redis.hmget(key, "attempts", "max_attempts")
+        if retry and attempts is not None and int(attempts) < int(max_attempts):
+            pipe = self._redis.pipeline()
+            pipe.hset(key, mapping={"status": "queued", "worker_id": "", "error": error})
+            pipe.zrem(self._leases, task_id)
+            pipe.rpush(self._queue, task_id)
+            pipe.execute()
+        else:
+            self._finish(task_id, {"status": "failed", "error": error})
+
+    def cancel(self, task_id):
+        key = self._task_prefix + task_id
+        if self._redis.hget(key, "status") in ("queued", "running"):
+            pipe = self._redis.pipeline()
+            pipe.hset(key, "status", "cancelled")
+            pipe.zrem(self._leases, task_id)
+            pipe.lrem(self._queue, 0, task_id)
+            pipe.expire(key, RESULT_TTL)
+            pipe.execute()
+
+    def get_task(self, task_id):
+        data = self._redis.hgetall(self._task_prefix + task_id)
+        if not data:
+            return None
+        return {
+            "id": data["id"],
+            "kind": data["kind"],
+            "payload": json.loads(data["payload"]),
+            "status": data["status"],
+            "stage": data.get("stage") or None,
+            "attempts": int(data.get("attempts", 0)),
+            "result": json.loads(data["result"]) if data.get("result") else None,
+            "error": data.get("error"),
+            "worker_id": data.get("worker_id") or None,
+        }
+
+    def heartbeat(self, worker_id, task_ids=(), info=None):
+        now = time.time()
+        pipe = self._redis.pipeline()
+        pipe.hset(self._workers, worker_id, json.dumps({"info": info or {}, "last_seen": now}))
+        for task_id in task_ids:
+            pipe.zadd(self._leases, {task_id: now + VISIBILITY_TIMEOUT}, xx=True)
+        pipe.execute()
+
+    def workers(self):
+        alive, cutoff = [], time.time() - WORKER_TIMEOUT
+        for worker_id, value in self._redis.hgetall(self._workers).items():
+            data = json.loads(value)
+            if data["last_seen"] > cutoff:
+                alive.append({"id": worker_id, "info": data["info"], "last_seen": data["last_seen"]})
+            else:
+                self._redis.hdel(self._workers, worker_id)
+        return alive
+
+    def requeue_expired(self):
+        for task_id in self._redis.zrangebyscore(self._leases, "-inf", time.time()):
+            self._requeue_script(keys=[self._leases, self._queue], args=[task_id, self._task_prefix, RESULT_TTL])
+
+
+def get_broker(url=None):
+    """
+    Creates a broker from a URL: "sqlite:///path/to/file", "sqlite://:memory:" or "redis://host:port/db".
+
+    Returns:
+        Broker: The broker, or None if no URL is configured.
+    """
+    url = ANALYSIS_BROKER_URL if url is None else url
+    if not url:
+        return None
+    if url.startswith("sqlite://"):
+        # sqlite:///relative.db, sqlite:////absolute/path.db or sqlite://:memory:
+        path = url[len("sqlite://"):]
+        path = path[1:] if path.startswith("/") else path
+        return SQLiteBroker(path or ":memory:")
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBroker(url)
+    raise ValueError(f"Unsupported broker URL: {url}")
@@ -0,0 +1,68 @@
+import threading
+
+
+class OperationCancelled(BaseException):
+    """
+    Raised inside work whose cancellation token was cancelled.
+    Derives from BaseException (like asyncio.CancelledError) so the agents'
+    `except Exception` handlers do not turn a cancellation into an error report.
+    """
+
+
+class CancellationToken:
+    """Thread-safe flag that tells running work to stop, with callbacks to abort in-flight operations."""
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._callbacks = []
+        self._lock = threading.Lock()
+
+    @property
+    def cancelled(self):
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancels the token and runs the registered callbacks (e.g. kill a subprocess, cancel a remote job)."""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception:
+                pass  # Cancelling is best effort
+
+    def register(self, callback):
+        """
+        Registers a callback to run on cancellation. Runs it immediately if the token is already cancelled.
+
+        Returns:
+            callable: Function that unregisters the callback once the operation has finished.
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return lambda: self._unregister(callback)
+        callback()
+        return lambda: None
+
+    def _unregister(self, callback):
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self):
+        if self._event.is_set():
+            raise OperationCancelled()
+
+    def wait(self, timeout=None):
+        """Waits until the token is cancelled or the timeout expires. Returns True if cancelled."""
+        return self._event.wait(timeout)
+
+
+def raise_if_cancelled(cancel_token):
+    """Checkpoint for code that may or may not have been given a token."""
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
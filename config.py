@@ -0,0 +1,5 @@
+from dotenv import load_dotenv, find_dotenv
+
+# Load environment variables from the .env file (settings can also come from the environment itself).
+# Modules read their settings when they are imported, so entry points import this module before any other.
+load_dotenv(find_dotenv())
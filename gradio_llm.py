@@ -1,33 +1,134 @@
+import config  # Loads .env before the modules below read their settings
 from gradio_client import Client
-from dotenv import load_dotenv, find_dotenv
+from prompt_accounting import enforce_prompt_budget, prompt_ledger
+from cancellation import OperationCancelled, raise_if_cancelled
+from single_flight import SingleFlight
+import metrics
+import hashlib
+import json
 import os
+import threading
+import time
 
-# Load environment variables from the .env file
-if not find_dotenv():
-    raise FileNotFoundError(".env file not found")
-load_dotenv()
+# Appends every prompt/response pair sent to the backend to this JSONL file (e.g. for the llm_standin.py replay server)
+LLM_RECORD_PATH = os.getenv("LLM_RECORD_PATH", "")
 
-# Get the client URL from the .env file
-client_url = os.getenv("CLIENT_URL")
-if not client_url:
-    raise ValueError("CLIENT_URL not found in .env file")
+_client = None
+_client_lock = threading.Lock()
+_record_lock = threading.Lock()
 
-# Initialize the client
-try:
-    client = Client(client_url)
-except Exception as e:
-    raise ConnectionError(f"Failed to initialize client: {e}")
 
-# Helper function for querying Gradio Client
-def query_gradio_client(prompt):
+def get_client():
+    """Connects to the Gradio Client at CLIENT_URL on first use."""
+    global _client
+    with _client_lock:
+        if _client is None:
+            client_url = os.getenv("CLIENT_URL")
+            if not client_url:
+                raise ValueError("CLIENT_URL not found in the environment or .env file")
+            try:
+                _client = Client(client_url)
+            except Exception as e:
+                raise ConnectionError(f"Failed to initialize client: {e}")
+        return _client
+
+
+# Model size requested from the Space, part of the key of identical requests
+MODEL = "32B"
+
+# Sharing of identical in-flight requests: "local" between threads of this process,
+# "broker" also between processes through the analysis broker, "off" sends every request
+LLM_SINGLE_FLIGHT = os.getenv("LLM_SINGLE_FLIGHT", "local").strip().lower()
+_single_flight = SingleFlight()
+# Requests that joined an identical in-flight request are cache hits
+metrics.CACHE_REQUESTS.add_function(lambda: {
+    ("llm_single_flight", "hit"): _single_flight.stats["shared"],
+    ("llm_single_flight", "miss"): _single_flight.stats["calls"],
+})
+_broker = None
+if LLM_SINGLE_FLIGHT == "broker":
+    from broker import get_broker
+    _broker = get_broker()
+
+
+def request_key(prompt, model=MODEL):
+    """Identifies byte-identical requests to the same model."""
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def request_completion(prompt, cancel_token=None):
+    """
+    Sends one prompt to the model backend and returns the response text.
+    If the cancellation token is cancelled while waiting, the remote job is cancelled and OperationCancelled is raised.
+    """
+    start = time.perf_counter()
+    metrics.LLM_BACKEND_IN_FLIGHT.inc()
     try:
-        result = client.predict(
+        job = get_client().submit(
                 query=prompt,
                 history=[],
                 system="",
-                radio="32B",
+                radio=MODEL,
                 api_name="/model_chat"
         )
-        return result[1][0][1]
+        if cancel_token is not None:
+            unregister = cancel_token.register(job.cancel)
+            try:
+                while not job.done():
+                    if cancel_token.wait(0.1):
+                        raise OperationCancelled()
+            finally:
+                unregister()
+        response = job.result()[1][0][1]
+    finally:
+        metrics.LLM_BACKEND_IN_FLIGHT.dec()
+        metrics.LLM_BACKEND_LATENCY.observe(time.perf_counter() - start)
+    if LLM_RECORD_PATH:
+        _record(prompt, response, time.perf_counter() - start)
+    return response
+
+
+def _record(prompt, response, latency):
+    entry = {"key": request_key(prompt), "model": MODEL, "prompt": prompt, "response": response, "latency": latency}
+    with _record_lock:
+        with open(LLM_RECORD_PATH, "a", encoding="utf-8") as record_file:
+            record_file.write(json.dumps(entry) + "\n")
+
+
+def _shared_completion(prompt, cancel_token=None):
+    """Sends the prompt, sharing one backend call between concurrent identical requests."""
+    if LLM_SINGLE_FLIGHT == "off":
+        return request_completion(prompt, cancel_token)
+
+    key = request_key(prompt)
+    if _broker is not None:
+        # Identical requests of other processes are merged into the same broker task
+        def send(token):
+            task_id = _broker.enqueue("llm", {"prompt": prompt}, dedupe_key=key)
+            return _broker.wait(task_id, cancel_token=token, cancel_task=False)
+    else:
+        def send(token):
+            return request_completion(prompt, token)
+    return _single_flight.do(key, send, cancel_token)
+
+
+# Helper function for querying Gradio Client
+def query_gradio_client(prompt, agent=None, stage=None, cancel_token=None):
+    """
+    Sends a prompt to the model and records its size and latency under the given agent and stage.
+    Concurrent identical prompts share one backend call (see LLM_SINGLE_FLIGHT).
+    """
+    raise_if_cancelled(cancel_token)
+    prompt = enforce_prompt_budget(prompt, agent, stage)
+    start = time.perf_counter()
+    try:
+        with metrics.track(metrics.LLM_REQUESTS, metrics.LLM_LATENCY, agent=agent or "unknown", stage=stage or "unknown"):
+            response = _shared_completion(prompt, cancel_token)
+    except OperationCancelled:
+        prompt_ledger.record(agent, stage, prompt, None, time.perf_counter() - start, error=True)
+        raise
     except Exception as e:
-        raise RuntimeError(f"Failed to query Gradio Client: {e}")
\ No newline at end of file
+        prompt_ledger.record(agent, stage, prompt, None, time.perf_counter() - start, error=True)
+        raise RuntimeError(f"Failed to query Gradio Client: {e}")
+    prompt_ledger.record(agent, stage, prompt, response, time.perf_counter() - start)
+    return response
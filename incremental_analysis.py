@@ -0,0 +1,311 @@
+import argparse
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+import config  # Loads .env before the modules below read their settings
+from cancellation import raise_if_cancelled
+import metrics
+from pipeline import AGENT_TOOLS
+from project_analysis import PROJECT_WORKERS, ProjectGraph, run_tool, tool_arguments
+from tools.findings_compactor import collect_findings
+
+# Local SQLite file with the tool results and reports of analyzed file versions
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", "analysis_results.sqlite3")
+
+# Statuses of the findings a tool returns when it hit a sandbox limit (see sandbox.limit_finding)
+LIMIT_STATUSES = {"timeout", "memory", "crashed"}
+
+HUNK_HEADER = re.compile(r"^@@ -\d+(?:,\d+)? \+(\d+)(?:,(\d+))? @@")
+
+
+def _git(repo, *args):
+    process = subprocess.run(["git", "-C", str(repo), *args], capture_output=True, text=True, check=False)
+    if process.returncode != 0:
+        raise RuntimeError(f"git {args[0]} failed: {process.stderr.strip()}")
+    return process.stdout
+
+
+def changed_python_files(repo, base):
+    """
+    Finds the Python files changed since a git revision, including uncommitted and untracked files.
+
+    Returns:
+        dict: Path relative to the repository root -> changed line ranges [(start, end), ...] in the
+              current file (1-based, inclusive), or None for untracked files (every line is new).
+              Deleted files are left out.
+    """
+    changes = {}
+    path = None
+    # Explicit prefixes, so diff.noprefix or diff.mnemonicPrefix in the user's git config cannot change the "+++ b/" lines
+    diff = _git(repo, "diff", "--unified=0", "--no-color", "--no-renames", "--src-prefix=a/", "--dst-prefix=b/",
+                base, "--", "*.py")
+    for line in diff.splitlines():
+        if line.startswith("+++ "):
+            path = None if line[4:] == "/dev/null" else line[6:]  # Strip "+++ b/"
+            if path is not None:
+                changes.setdefault(path, [])
+        elif path is not None:
+            match = HUNK_HEADER.match(line)
+            if match:
+                start, count = int(match.group(1)), int(match.group(2) or 1)
+                # A pure deletion has no new lines, anchor it to the line after the deleted ones
+                changes[path].append((max(start, 1), start + count - 1) if count else (start + 1, start + 1))
+    for path in _git(repo, "ls-files", "--others", "--exclude-standard", "--", "*.py").splitlines():
+        changes[path] = None
+    return changes
+
+
+def is_cacheable(output):
+    """
+    False for the output of a tool run that failed (a sandbox limit finding or an error message),
+    which may succeed when it is run again.
+    """
+    if isinstance(output, str):
+        return not output.startswith("Error")
+    if isinstance(output, dict):
+        return "error" not in output
+    if isinstance(output, (list, tuple)):
+        return not any(
+            (isinstance(item, dict) and item.get("status") in LIMIT_STATUSES)
+            or (isinstance(item, str) and item.startswith("Error"))
+            for item in output
+        )
+    return True
+
+
+def content_hash(code):
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def _database(db_path):
+    """Opens the results database for one transaction (a connection per operation keeps it thread-safe)."""
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        with connection:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    content_hash TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    context TEXT NOT NULL,
+                    value TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    PRIMARY KEY (content_hash, name, context)
+                )
+            """)
+            yield connection
+    finally:
+        connection.close()
+
+
+class ResultsStore:
+    """
+    Tool results and reports of analyzed file versions, keyed by the hash of the file content,
+    the agent (or report) name and the context the result depends on (e.g. line ranges).
+    """
+
+    def __init__(self, db_path=RESULTS_DB_PATH):
+        self.db_path = db_path
+
+    @staticmethod
+    def _context(context):
+        return hashlib.sha256(json.dumps(context, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def get(self, code_hash, name, context=None):
+        """Returns the stored value, or None."""
+        with _database(self.db_path) as connection:
+            row = connection.execute(
+                "SELECT value FROM results WHERE content_hash = ? AND name = ? AND context = ?",
+                (code_hash, name, self._context(context)),
+            ).fetchone()
+        metrics.CACHE_REQUESTS.inc(cache="results_store", result="hit" if row else "miss")
+        return json.loads(row[0]) if row else None
+
+    def put(self, code_hash, name, value, context=None):
+        with _database(self.db_path) as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results (content_hash, name, context, value, created_at) VALUES (?, ?, ?, ?, ?)",
+                (code_hash, name, self._context(context), json.dumps(value, default=str), time.time()),
+            )
+
+    def purge(self, max_age_seconds):
+        """Deletes results older than max_age_seconds."""
+        with _database(self.db_path) as connection:
+            connection.execute("DELETE FROM results WHERE created_at < ?", (time.time() - max_age_seconds,))
+
+
+def _location_range(location):
+    start, _, end = location.partition("-")
+    return int(start), int(end or start)
+
+
+def map_to_hunks(tool_output, line_ranges):
+    """
+    Assigns the findings of a tool output to the changed hunks they fall into.
+
+    Returns:
+        tuple: ({(start, end): [finding, ...]}, number of findings outside the changed hunks)
+    """
+    hunks = {line_range: [] for line_range in line_ranges}
+    outside = 0
+    for source, severity, location, message in collect_findings(tool_output):
+        if location is None or not location.split("-")[0].isdigit():
+            continue  # File-level findings (e.g. "No inline comments found") belong to no hunk
+        start, end = _location_range(location)
+        matching = [line_range for line_range in line_ranges if start <= line_range[1] and line_range[0] <= end]
+        for line_range in matching:
+            hunks[line_range].append({"source": source, "severity": severity, "line": location, "message": message})
+        if not matching:
+            outside += 1
+    return hunks, outside
+
+
+def _hunk_report(path, code, hunks, cancel_token=None):
+    from gradio_llm import query_gradio_client
+    lines = code.splitlines()
+    sections = []
+    for (start, end), findings in hunks.items():
+        if not findings:
+            continue
+        changed = "\n".join(lines[start - 1:end])
+        listed = "\n".join(f"- [{finding['severity'].upper()}] {finding['message']} (line {finding['line']})"
+                           for finding in findings)
+        sections.append(f"### Lines {start}-{end}\n```python\n{changed}\n```\n{listed}")
+    if not sections:
+        return "No issues found in the changed lines."
+    report_prompt = f"""
+    You are a code review expert. The following lines of '{path}' were changed, with the issues the analysis tools found in them:
+
+    {chr(10).join(sections)}
+
+    Generate a short report of the issues introduced by these changes, per changed region.
+    Do not improve/revise the code.
+    """
+    try:
+        return query_gradio_client(report_prompt, agent="Incremental", stage="hunk_report", cancel_token=cancel_token)
+    except Exception as e:
+        return f"Error generating report: {str(e)}"
+
+
+def analyze_changes(repo, base, agent_names=None, with_reports=True, store=None, workers=PROJECT_WORKERS, cancel_token=None):
+    """
+    Analyzes only the Python files changed since a git revision.
+    - Tools run only on changed files; tools that support it (e.g. style) only check the changed lines
+    - Results and reports are stored by file content, so unchanged versions are never analyzed twice
+    - Findings are mapped back to the changed hunks
+
+    Returns:
+        dict: "base", "files" (per changed file: hunks with their findings, findings outside the hunks,
+              whether the results were reused, and the report) and "deleted" files.
+    """
+    root = Path(_git(repo, "rev-parse", "--show-toplevel").strip())
+    store = store or ResultsStore()
+    agent_names = agent_names or list(AGENT_TOOLS)
+    changes = changed_python_files(root, base)
+
+    # Cross-file context comes from the whole repository, not only the changed files
+    graph = ProjectGraph(root)
+    modules_by_path = {module.path: module for module in graph.modules.values()}
+
+    def analyze_file(path, line_ranges):
+        module = modules_by_path.get((root / path).resolve())
+        if module is None:
+            return None  # Deleted, or in a directory the project graph skips
+        code = module.code
+        code_hash = content_hash(code)
+        line_ranges = line_ranges if line_ranges is not None else [(1, max(len(code.splitlines()), 1))]
+        result = {"hunks": {line_range: [] for line_range in line_ranges}, "outside": {}, "reused": True, "findings": {}}
+
+        for agent_name in agent_names:
+            tool = AGENT_TOOLS[agent_name][1]
+            context = tool_arguments(tool, external_uses=sorted(module.external_uses), line_ranges=line_ranges)
+            output = store.get(code_hash, agent_name, context)
+            if output is None:
+                result["reused"] = False
+                output = run_tool(tool, code, cancel_token, **context)
+                if is_cacheable(output):
+                    store.put(code_hash, agent_name, output, context)
+            result["findings"][agent_name] = output
+            hunks, outside = map_to_hunks(output, line_ranges)
+            for line_range, findings in hunks.items():
+                result["hunks"][line_range].extend(dict(finding, agent=agent_name) for finding in findings)
+            result["outside"][agent_name] = outside
+
+        if with_reports:
+            report_context = {"agents": agent_names, "line_ranges": line_ranges}
+            report = store.get(code_hash, "report", report_context)
+            if report is None:
+                report = _hunk_report(path, code, result["hunks"], cancel_token)
+                if not report.startswith("Error"):
+                    store.put(code_hash, "report", report, report_context)
+            result["report"] = report
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="incremental") as executor:
+        futures = {path: executor.submit(analyze_file, path, line_ranges) for path, line_ranges in sorted(changes.items())}
+        files, deleted = {}, []
+        for path, future in futures.items():
+            raise_if_cancelled(cancel_token)
+            result = future.result()
+            if result is None:
+                deleted.append(path)
+            else:
+                files[path] = result
+    return {"base": base, "files": files, "deleted": deleted}
+
+
+def format_changes_report(result):
+    """Renders the result of analyze_changes as Markdown."""
+    lines = [f"# Changes since {result['base']}", ""]
+    if not result["files"]:
+        lines.append("No changed Python files.")
+    for path, file_result in result["files"].items():
+        lines += [f"## {path}" + (" (stored results)" if file_result["reused"] else ""), ""]
+        if file_result.get("report"):
+            lines += [file_result["report"], ""]
+        for (start, end), findings in file_result["hunks"].items():
+            if not findings:
+                continue
+            lines.append(f"### Lines {start}-{end}")
+            lines += [f"- [{finding['severity'].upper()}] {finding['agent']}: {finding['message']} (line {finding['line']})"
+                      for finding in findings]
+            lines.append("")
+        outside = sum(file_result["outside"].values())
+        if outside:
+            lines += [f"{outside} more findings are in unchanged lines of this file.", ""]
+    if result["deleted"]:
+        lines += ["Not analyzed (deleted or skipped): " + ", ".join(result["deleted"]), ""]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzes only the Python files changed since a git revision.")
+    parser.add_argument("--base", required=True, help="Git revision to compare against (e.g. origin/main, HEAD~1).")
+    parser.add_argument("--repo", default=".", help="Repository directory.")
+    parser.add_argument("--agents", default=None, help=f"Comma-separated agents (default: all of {', '.join(AGENT_TOOLS)}).")
+    parser.add_argument("--no-llm", action="store_true", help="Only run the tools, without reports.")
+    parser.add_argument("--output", default=None, help="Write the Markdown report to this file instead of printing it.")
+    args = parser.parse_args()
+
+    agent_names = [name.strip() for name in args.agents.split(",")] if args.agents else None
+    unknown = [name for name in agent_names or [] if name not in AGENT_TOOLS]
+    if unknown:
+        parser.error(f"Unknown agents: {', '.join(unknown)}")
+
+    report = format_changes_report(analyze_changes(args.repo, args.base, agent_names, with_reports=not args.no_llm))
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+import hashlib
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from broker import get_broker
+from cancellation import CancellationToken, OperationCancelled
+from profiling import profiled
+import metrics
+
+# Stages every agent run goes through, in order
+STAGES = ("plan", "tool", "report", "verdict")
+
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "8"))
+# Finished jobs nobody collected (e.g. the user closed the tab) are dropped after this many seconds
+JOB_RETENTION_SECONDS = int(os.getenv("JOB_RETENTION_SECONDS", "3600"))
+# With a broker configured: "agent" runs whole agents on workers, "tool" only runs the analysis tools there
+BROKER_DISPATCH = os.getenv("BROKER_DISPATCH", "agent").strip().lower()
+
+
+def code_fingerprint(code):
+    """Hash of the submitted code, used to tell whether a result still belongs to the current code."""
+    return hashlib.sha256(code.encode("utf-8")).hexdigest()
+
+
+class AnalysisJob:
+    """One agent run executing in the background, with its current stage and timings."""
+
+    def __init__(self, session_id, agent, code, profile=None):
+        self.id = uuid.uuid4().hex
+        self.session_id = session_id
+        self.agent_name = agent.name
+        self.code_fingerprint = code_fingerprint(code)
+        self.status = "queued"  # queued, running, done, failed or cancelled
+        self.stage = None
+        self.stage_times = {}  # stage -> seconds spent in it
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.result = None
+        self.error = None
+        self.future = None
+        self.cancel_token = CancellationToken()
+        self.profile = profile  # Profile the run regardless of PROFILE_AGENTS (True), or as configured (None)
+        self.profile_paths = {}  # Artifacts of the profiled run, if it ran in this process
+        self._stage_started_at = None
+
+    def set_stage(self, stage):
+        """Progress callback passed to the agent's run(). Also a cancellation checkpoint between stages."""
+        self.cancel_token.raise_if_cancelled()
+        now = time.time()
+        if self.stage is not None:
+            self.stage_times[self.stage] = now - self._stage_started_at
+        self.stage, self._stage_started_at = stage, now
+
+    def _finish(self, status):
+        now = time.time()
+        if self.stage is not None and self.stage not in self.stage_times:
+            self.stage_times[self.stage] = now - self._stage_started_at
+        self.status, self.finished_at = status, now
+
+    @property
+    def done(self):
+        return self.status in ("done", "failed", "cancelled")
+
+    @property
+    def elapsed(self):
+        """Seconds since the job started running (or was submitted, while queued)."""
+        return (self.finished_at or time.time()) - (self.started_at or self.submitted_at)
+
+    @property
+    def stage_elapsed(self):
+        return time.time() - self._stage_started_at if self._stage_started_at and not self.done else 0.0
+
+    @property
+    def progress(self):
+        """Fraction of the stages that are finished."""
+        if self.status == "done":
+            return 1.0
+        if self.stage not in STAGES:
+            return 0.0
+        return STAGES.index(self.stage) / len(STAGES)
+
+
+class JobManager:
+    """
+    Runs agent analyses on a shared thread pool so Streamlit script threads never block on them.
+    With a broker, the agents run on remote workers and the pool threads only wait for their results.
+    """
+
+    def __init__(self, max_workers=ANALYSIS_WORKERS, broker=None):
+        self.broker = broker
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="analysis-job")
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, session_id, agent, code, profile=None):
+        """Queues agent.run(code) and returns the job tracking it."""
+        self.prune()
+        job = AnalysisJob(session_id, agent, code, profile)
+        with self._lock:
+            self._jobs[job.id] = job
+        job.future = self._executor.submit(self._execute, job, agent, code)
+        return job
+
+    def _execute(self, job, agent, code):
+        if job.cancel_token.cancelled:
+            job._finish("cancelled")
+            return
+        job.status, job.started_at = "running", time.time()
+        try:
+            job.result = self._run(job, agent, code)
+            job.cancel_token.raise_if_cancelled()  # Discard results of work that was superseded meanwhile
+            job._finish("done")
+        except OperationCancelled:
+            job._finish("cancelled")
+        except Exception as e:
+            job.error = str(e)
+            job._finish("failed")
+
+    def _run(self, job, agent, code):
+        if self.broker is not None and BROKER_DISPATCH == "agent" and not getattr(agent, "runs_locally", False):
+            task_id = self.broker.enqueue("agent", {"agent": agent.name, "code": code, "profile": job.profile})
+            report, is_valid = self.broker.wait(task_id, cancel_token=job.cancel_token, on_stage=job.set_stage)
+            return report, is_valid
+        with profiled(agent.name, code, enabled=job.profile) as profile_run, \
+                metrics.track(metrics.AGENT_RUNS, metrics.AGENT_LATENCY, agent=agent.name):
+            result = agent.run(code, progress=job.set_stage, cancel_token=job.cancel_token)
+        if profile_run is not None:
+            job.profile_paths = profile_run.paths
+        return result
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def session_jobs(self, session_id):
+        with self._lock:
+            return [job for job in self._jobs.values() if job.session_id == session_id]
+
+    def cancel(self, job_id):
+        """Cancels a job and forgets it. Running jobs abort their in-flight LLM calls and subprocesses."""
+        job = self.forget(job_id)
+        if job is not None and not job.done:
+            job.cancel_token.cancel()
+            if job.future is not None and job.future.cancel():
+                job._finish("cancelled")  # It never started
+        return job
+
+    def cancel_session(self, session_id):
+        """Cancels every job of a session, e.g. when its code was revised or the workflow restarted."""
+        for job in self.session_jobs(session_id):
+            self.cancel(job.id)
+
+    def forget(self, job_id):
+        with self._lock:
+            return self._jobs.pop(job_id, None)
+
+    def prune(self, max_age=JOB_RETENTION_SECONDS):
+        """Drops finished jobs that were never collected."""
+        cutoff = time.time() - max_age
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items() if job.done and job.finished_at < cutoff]:
+                del self._jobs[job_id]
+
+    def counts(self):
+        """
+        Returns:
+            dict: Number of queued and running jobs across all sessions.
+        """
+        with self._lock:
+            statuses = [job.status for job in self._jobs.values()]
+        return {"queued": statuses.count("queued"), "running": statuses.count("running")}
+
+
+# Shared by every session served by this process
+job_manager = JobManager(broker=get_broker())
+metrics.ANALYSIS_JOBS.add_function(lambda: {(status,): count for status, count in job_manager.counts().items()})
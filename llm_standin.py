@@ -0,0 +1,171 @@
+import argparse
+import json
+import random
+import threading
+import time
+from gradio_llm import MODEL, request_key
+
+# Response for prompts without a recording when misses are answered instead of failing
+DEFAULT_RESPONSE = "no"
+
+
+def parse_latency(spec):
+    """
+    Parses a latency distribution in seconds:
+    - "fixed:0.5"
+    - "uniform:0.2,1.5"
+    - "normal:0.8,0.2" (mean, standard deviation, never below 0)
+    - "lognormal:-0.5,0.4" (mu, sigma of the underlying normal distribution)
+    - "replay" (the latency measured when the response was recorded)
+
+    Returns:
+        tuple: (kind, parameters)
+    """
+    kind, _, parameters = spec.partition(":")
+    kind = kind.strip().lower()
+    values = [float(value) for value in parameters.split(",") if value.strip()]
+    expected = {"fixed": 1, "uniform": 2, "normal": 2, "lognormal": 2, "replay": 0}
+    if kind not in expected or len(values) != expected[kind]:
+        raise ValueError(f"Invalid latency distribution '{spec}'. Use fixed:S, uniform:A,B, normal:MEAN,STD, lognormal:MU,SIGMA or replay.")
+    return kind, values
+
+
+def load_recordings(paths):
+    """
+    Reads the JSONL files written with LLM_RECORD_PATH.
+
+    Returns:
+        dict: Request key -> (response, recorded latency). The last recording of a prompt wins.
+    """
+    recordings = {}
+    for path in paths:
+        with open(path, encoding="utf-8") as record_file:
+            for line in record_file:
+                if line.strip():
+                    entry = json.loads(line)
+                    key = entry.get("key") or request_key(entry["prompt"], entry.get("model", MODEL))
+                    recordings[key] = (entry["response"], entry.get("latency", 0.0))
+    return recordings
+
+
+class StandIn:
+    """
+    Replays recorded responses like the model backend would: with simulated latency, errors and streaming.
+    Runs are deterministic for a given seed and sequence of requests.
+    """
+
+    def __init__(self, recordings, latency="replay", error_rate=0.0, on_miss="default",
+                 default_response=DEFAULT_RESPONSE, stream_chunk_chars=0, stream_chunk_delay=0.0, seed=None):
+        if on_miss not in ("default", "error"):
+            raise ValueError("on_miss must be 'default' or 'error'")
+        self.recordings = recordings
+        self.latency = parse_latency(latency) if isinstance(latency, str) else latency
+        self.error_rate = error_rate
+        self.on_miss = on_miss
+        self.default_response = default_response
+        self.stream_chunk_chars = stream_chunk_chars
+        self.stream_chunk_delay = stream_chunk_delay
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {"requests": 0, "hits": 0, "misses": 0, "errors": 0}
+
+    def _sample_latency(self, recorded):
+        kind, values = self.latency
+        with self._lock:
+            if kind == "fixed":
+                return values[0]
+            if kind == "uniform":
+                return self._random.uniform(*values)
+            if kind == "normal":
+                return max(self._random.gauss(*values), 0.0)
+            if kind == "lognormal":
+                return self._random.lognormvariate(*values)
+        return recorded
+
+    def respond(self, query, model=MODEL):
+        """
+        Looks up the response to a prompt and samples the latency and whether the request fails.
+
+        Returns:
+            tuple: (response, latency in seconds)
+
+        Raises:
+            LookupError: If the prompt was never recorded and misses are errors.
+            RuntimeError: For a simulated backend error.
+        """
+        recorded = self.recordings.get(request_key(query, model))
+        with self._lock:
+            self.stats["requests"] += 1
+            self.stats["hits" if recorded else "misses"] += 1
+            failed = self.error_rate > 0 and self._random.random() < self.error_rate
+            if failed:
+                self.stats["errors"] += 1
+        response, recorded_latency = recorded or (None, 0.0)
+        latency = self._sample_latency(recorded_latency)
+        if failed:
+            time.sleep(latency)
+            raise RuntimeError("Simulated backend error.")
+        if response is None:
+            if self.on_miss == "error":
+                raise LookupError("No recorded response for this prompt.")
+            response = self.default_response
+        return response, latency
+
+    def model_chat(self, query, history, system, radio):
+        """The /model_chat endpoint: yields (text, history, system) like the real Space, streaming if configured."""
+        try:
+            response, latency = self.respond(query, radio or MODEL)
+        except (LookupError, RuntimeError) as e:
+            import gradio as gr
+            raise gr.Error(str(e))
+        time.sleep(latency)
+        history = list(history or [])
+        if self.stream_chunk_chars > 0:
+            for end in range(self.stream_chunk_chars, len(response), self.stream_chunk_chars):
+                yield "", history + [[query, response[:end]]], system
+                time.sleep(self.stream_chunk_delay)
+        yield "", history + [[query, response]], system
+
+
+def build_app(stand_in):
+    """Builds the Gradio app exposing the stand-in under the same /model_chat API as the real Space."""
+    import gradio as gr
+    with gr.Blocks(title="LLM stand-in") as app:
+        query = gr.Textbox(label="query")
+        history = gr.JSON(label="history")
+        system = gr.Textbox(label="system")
+        radio = gr.Radio(choices=["0.5B", "1.5B", "3B", "7B", "14B", "32B"], value=MODEL, label="radio")
+        text = gr.Textbox(label="text")
+        send = gr.Button("Send")
+        send.click(stand_in.model_chat, inputs=[query, history, system, radio], outputs=[text, history, system],
+                   api_name="model_chat")
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local stand-in for the model backend that replays recorded responses.")
+    parser.add_argument("recordings", nargs="*", help="JSONL files recorded with LLM_RECORD_PATH.")
+    parser.add_argument("--port", type=int, default=7861)
+    parser.add_argument("--latency", default="replay", help="Latency distribution, e.g. fixed:0.5, uniform:0.2,1.5, "
+                                                            "normal:0.8,0.2, lognormal:-0.5,0.4 or replay (default).")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests that fail.")
+    parser.add_argument("--on-miss", choices=["default", "error"], default="default",
+                        help="Answer unrecorded prompts with --default-response or fail them.")
+    parser.add_argument("--default-response", default=DEFAULT_RESPONSE)
+    parser.add_argument("--stream-chunk-chars", type=int, default=0, help="Stream responses in chunks of this size (0: no streaming).")
+    parser.add_argument("--stream-chunk-delay", type=float, default=0.05, help="Seconds between streamed chunks.")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests served at the same time.")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latencies and errors.")
+    args = parser.parse_args()
+
+    stand_in = StandIn(
+        load_recordings(args.recordings), latency=args.latency, error_rate=args.error_rate, on_miss=args.on_miss,
+        default_response=args.default_response, stream_chunk_chars=args.stream_chunk_chars,
+        stream_chunk_delay=args.stream_chunk_delay, seed=args.seed,
+    )
+    print(f"Replaying {len(stand_in.recordings)} recorded responses. Point CLIENT_URL at http://127.0.0.1:{args.port}/")
+    build_app(stand_in).queue(default_concurrency_limit=args.concurrency).launch(server_port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import argparse
+import json
+import os
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import uuid
+from collections import defaultdict
+import config  # Loads .env before the modules imported below read their settings
+
+# Code submitted by every simulated student, and the revision submitted after an agent found issues
+DEFAULT_CODE = '''import os
+
+def average(values):
+    total = 0
+    for value in values:
+        total = total + value
+    return total / len(values)
+
+def find_duplicates(items):
+    duplicates = []
+    for i in range(len(items)):
+        for j in range(len(items)):
+            if i != j and items[i] == items[j] and items[i] not in duplicates:
+                duplicates.append(items[i])
+    return duplicates
+'''
+DEFAULT_REVISED_CODE = '''def average(values):
+    """Returns the mean of a non-empty list of numbers."""
+    return sum(values) / len(values)
+
+
+def find_duplicates(items):
+    """Returns the items that occur more than once."""
+    seen, duplicates = set(), set()
+    for item in items:
+        if item in seen:
+            duplicates.add(item)
+        seen.add(item)
+    return list(duplicates)
+'''
+# Agents run when the plan of the model cannot be parsed (e.g. the stand-in answers an unrecorded prompt)
+DEFAULT_AGENTS = ["SyntaxAgent", "SemanticsAgent", "CodeStyleAgent"]
+
+
+def _max_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class LoadTestStats:
+    """Thread-safe step latencies, session outcomes and queue depth samples of a load test."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.step_latencies = defaultdict(list)
+        self.sessions = {"completed": 0, "failed": 0}
+        self.errors = []
+        self.history_bytes = []
+        self.queue_samples = []
+
+    def record_step(self, step, seconds):
+        with self._lock:
+            self.step_latencies[step].append(seconds)
+
+    def record_session(self, ok, history_bytes, error=None):
+        with self._lock:
+            self.sessions["completed" if ok else "failed"] += 1
+            self.history_bytes.append(history_bytes)
+            if error:
+                self.errors.append(error)
+
+    def record_queue(self, counts):
+        with self._lock:
+            self.queue_samples.append(counts)
+
+
+class _Step:
+    """Times one workflow step of a session."""
+
+    def __init__(self, stats, name):
+        self.stats, self.name = stats, name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.stats.record_step(self.name, time.perf_counter() - self.start)
+        return False
+
+
+def run_session(orchestrator, stats, code, revised_code, think_time, history_db, fallback_agents, max_revisions=1):
+    """
+    Goes through the app workflow like one student: generate the plan, update it, run every agent as a
+    background job, and submit the revised code once an agent finds issues.
+    """
+    from jobs import job_manager
+    from session_store import SessionHistory
+
+    session_id = f"load-{uuid.uuid4().hex}"
+    history = SessionHistory(session_id, db_path=history_db)
+    try:
+        with _Step(stats, "generate_plan"):
+            plan = orchestrator.create_plan_with_llm(code)
+            execution_plan = orchestrator.parse_plan(plan)
+        time.sleep(think_time)
+
+        with _Step(stats, "update_plan"):
+            adjusted_plan = orchestrator.adjust_plan_with_llm(plan, "Keep the plan short.")
+            execution_plan = orchestrator.parse_plan(adjusted_plan) or execution_plan
+        if not execution_plan:
+            agent_dict = {agent.name: agent for agent in orchestrator.agents}
+            execution_plan = [agent_dict[name] for name in fallback_agents]
+
+        revisions = 0
+        index = 0
+        while index < len(execution_plan):
+            agent = execution_plan[index]
+            history.append(f"## 🚀 Running Analysis: {agent.name}")
+            with _Step(stats, f"agent:{agent.name}"):
+                job = job_manager.submit(session_id, agent, code)
+                while not job.done:
+                    time.sleep(0.05)
+                job_manager.forget(job.id)
+            if job.status != "done":
+                raise RuntimeError(f"{agent.name} {job.status}: {job.error}")
+            report, is_valid = job.result
+            history.append(report)
+            time.sleep(think_time)
+
+            if not is_valid and revisions < max_revisions:
+                # The student fixes the code and the same agent runs again
+                with _Step(stats, "submit_revision"):
+                    job_manager.cancel_session(session_id)
+                    code = revised_code
+                revisions += 1
+                continue
+            index += 1
+        stats.record_session(True, history.memory_bytes)
+    except Exception as e:
+        stats.record_session(False, history.memory_bytes, f"{type(e).__name__}: {e}")
+    finally:
+        history.clear()
+
+
+def _sample_queues(stats, stop, interval):
+    from jobs import job_manager
+    while not stop.wait(interval):
+        stats.record_queue(job_manager.counts())
+
+
+def start_standin(recordings, latency, error_rate, seed, port):
+    """Serves a replay stand-in for the model backend in this process and points the client at it."""
+    from llm_standin import StandIn, build_app, load_recordings
+    stand_in = StandIn(load_recordings(recordings), latency=latency, error_rate=error_rate, seed=seed)
+    build_app(stand_in).queue(default_concurrency_limit=256).launch(server_port=port, prevent_thread_lock=True, quiet=True)
+    os.environ["CLIENT_URL"] = f"http://127.0.0.1:{port}/"
+    return stand_in
+
+
+def run_load_test(sessions, ramp_up=0.0, think_time=0.0, code=DEFAULT_CODE, revised_code=DEFAULT_REVISED_CODE,
+                  fallback_agents=None, queue_interval=0.2):
+    """
+    Runs concurrent sessions through the whole pipeline and collects throughput, latency and memory figures.
+
+    Returns:
+        dict: The load test report (see format_report).
+    """
+    from pipeline import build_orchestrator
+    from prompt_accounting import prompt_ledger
+
+    orchestrator = build_orchestrator()
+    stats = LoadTestStats()
+    prompt_ledger.reset()
+    history_db = os.path.join(tempfile.mkdtemp(prefix="load-test-"), "history.sqlite3")
+
+    stop = threading.Event()
+    sampler = threading.Thread(target=_sample_queues, args=(stats, stop, queue_interval), daemon=True)
+    sampler.start()
+
+    rss_before = _max_rss_bytes()
+    start = time.perf_counter()
+    threads = []
+    for index in range(sessions):
+        thread = threading.Thread(
+            target=run_session,
+            args=(orchestrator, stats, code, revised_code, think_time, history_db, fallback_agents or DEFAULT_AGENTS),
+            name=f"session-{index}", daemon=True,
+        )
+        thread.start()
+        threads.append(thread)
+        if ramp_up and sessions > 1:
+            time.sleep(ramp_up / (sessions - 1))
+    for thread in threads:
+        thread.join()
+    duration = time.perf_counter() - start
+    stop.set()
+    sampler.join()
+
+    return _build_report(stats, prompt_ledger.summary(), sessions, duration, _max_rss_bytes() - rss_before)
+
+
+def _latency_row(samples):
+    from prompt_accounting import percentile
+    return {
+        "count": len(samples),
+        "p50": percentile(samples, 0.50),
+        "p95": percentile(samples, 0.95),
+        "p99": percentile(samples, 0.99),
+        "max": max(samples) if samples else None,
+    }
+
+
+def _build_report(stats, ledger, sessions, duration, rss_growth):
+    llm_calls = sum(row["calls"] for row in ledger)
+    queued = [sample["queued"] for sample in stats.queue_samples] or [0]
+    running = [sample["running"] for sample in stats.queue_samples] or [0]
+    return {
+        "sessions": sessions,
+        "completed": stats.sessions["completed"],
+        "failed": stats.sessions["failed"],
+        "duration_seconds": duration,
+        "throughput": {
+            "sessions_per_minute": stats.sessions["completed"] / duration * 60 if duration else 0,
+            "llm_calls_per_second": llm_calls / duration if duration else 0,
+        },
+        "steps": {step: _latency_row(samples) for step, samples in sorted(stats.step_latencies.items())},
+        "llm_stages": {
+            f"{row['agent']}/{row['stage']}": {
+                "count": row["calls"],
+                "errors": row["errors"],
+                "p50": row["p50_latency_seconds"],
+                "p95": row["p95_latency_seconds"],
+                "p99": row["p99_latency_seconds"],
+            }
+            for row in ledger
+        },
+        "queues": {
+            "max_queued": max(queued),
+            "mean_queued": statistics.mean(queued),
+            "max_running": max(running),
+            "mean_running": statistics.mean(running),
+        },
+        "memory": {
+            "rss_growth_bytes": rss_growth,
+            "rss_growth_per_session_bytes": rss_growth / sessions if sessions else 0,
+            "history_bytes_per_session": statistics.mean(stats.history_bytes) if stats.history_bytes else 0,
+        },
+        "errors": stats.errors[:20],
+    }
+
+
+def format_report(report):
+    """Renders a load test report as plain text."""
+    def seconds(value):
+        return f"{value:8.3f}" if value is not None else "       -"
+
+    lines = [
+        f"Sessions: {report['completed']}/{report['sessions']} completed, {report['failed']} failed "
+        f"in {report['duration_seconds']:.1f}s",
+        f"Throughput: {report['throughput']['sessions_per_minute']:.1f} sessions/min, "
+        f"{report['throughput']['llm_calls_per_second']:.2f} LLM calls/s",
+        "",
+        f"{'Step':<40} {'count':>6} {'p50':>8} {'p95':>8} {'p99':>8}",
+    ]
+    for name, row in list(report["steps"].items()) + [("", None)] + list(report["llm_stages"].items()):
+        if row is None:
+            lines.append(f"{'LLM stage':<40}")
+            continue
+        lines.append(f"{name:<40} {row['count']:>6} {seconds(row['p50'])} {seconds(row['p95'])} {seconds(row['p99'])}")
+    queues, memory = report["queues"], report["memory"]
+    lines += [
+        "",
+        f"Job queue: max {queues['max_queued']} queued (mean {queues['mean_queued']:.1f}), "
+        f"max {queues['max_running']} running (mean {queues['mean_running']:.1f})",
+        f"Memory: {memory['rss_growth_per_session_bytes'] / 1024:.0f} KiB RSS growth per session, "
+        f"{memory['history_bytes_per_session'] / 1024:.1f} KiB chat history per session",
+    ]
+    if report["errors"]:
+        lines += ["", "Errors:"] + [f"- {error}" for error in report["errors"]]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulates concurrent students going through the LLM Code Tutor workflow.")
+    parser.add_argument("--sessions", type=int, default=10, help="Concurrent sessions.")
+    parser.add_argument("--ramp-up", type=float, default=0.0, help="Seconds over which the sessions are started.")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds a student spends reading between steps.")
+    parser.add_argument("--agents", default=",".join(DEFAULT_AGENTS),
+                        help="Agents run when the model's plan cannot be parsed (comma-separated).")
+    parser.add_argument("--standin", nargs="*", default=None, metavar="RECORDING",
+                        help="Serve a replay stand-in in this process (optionally with recordings) instead of CLIENT_URL.")
+    parser.add_argument("--latency", default="lognormal:-1,0.5", help="Latency distribution of the stand-in.")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Error rate of the stand-in.")
+    parser.add_argument("--seed", type=int, default=1, help="Seed of the stand-in.")
+    parser.add_argument("--port", type=int, default=7861, help="Port of the stand-in.")
+    parser.add_argument("--json", default=None, help="Also write the report as JSON to this file.")
+    args = parser.parse_args()
+
+    if args.standin is not None:
+        start_standin(args.standin, args.latency, args.error_rate, args.seed, args.port)
+
+    report = run_load_test(args.sessions, ramp_up=args.ramp_up, think_time=args.think_time,
+                           fallback_agents=[name.strip() for name in args.agents.split(",")])
+    print(format_report(report))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as report_file:
+            json.dump(report, report_file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
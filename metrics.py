@@ -0,0 +1,281 @@
+import functools
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from langchain.agents import Tool
+import config  # Loads .env before the settings below are read; metrics is imported early by every entry point
+from cancellation import OperationCancelled
+
+# Port of the /metrics endpoint in Prometheus text format (0 disables it)
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# A session counts as active while it reran the app within this many seconds
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "300"))
+
+# Latency buckets in seconds, from fast tools to slow model responses
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value):
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}" if pairs else ""
+
+
+class Metric:
+    """A metric with optional labels. Values can also come from functions evaluated at scrape time."""
+
+    type = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+        self._functions = []
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects the labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def add_function(self, function):
+        """
+        Adds values computed at scrape time.
+
+        Args:
+            function: Returns {label values tuple: value}, e.g. {("queued",): 3}.
+        """
+        self._functions.append(function)
+
+    def samples(self):
+        """Returns: dict: Label values tuple -> value."""
+        with self._lock:
+            values = dict(self._values)
+        for function in self._functions:
+            try:
+                values.update({tuple(str(value) for value in key): value for key, value in function().items()})
+            except Exception as e:
+                print(f"Error collecting {self.name}: {e}")
+        return values
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, value in sorted(self.samples().items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Counter(Metric):
+    """A value that only goes up, e.g. the number of requests."""
+
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        if amount < 0:
+            raise ValueError("Counters can only be increased.")
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    """A value that goes up and down, e.g. the number of in-flight requests."""
+
+    type = "gauge"
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    """Observations counted in cumulative buckets, e.g. latencies."""
+
+    type = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            counts = list(counts)  # Never change a list a scrape may be reading
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+            self._values[key] = (counts, total + value)
+
+    def expose(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, (counts, total) in sorted(self.samples().items()):
+            for bound, count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {counts[-1]}")
+        return lines
+
+
+class Registry:
+    """The metrics of this process, rendered in the Prometheus text exposition format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def register(self, metric):
+        with self._lock:
+            if metric.name in self._metrics:
+                raise ValueError(f"Metric {metric.name} is already registered.")
+            self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self):
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines += metric.expose()
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+LLM_REQUESTS = REGISTRY.counter("llm_requests_total", "Prompts sent to the model, by outcome.", ("agent", "stage", "outcome"))
+LLM_LATENCY = REGISTRY.histogram("llm_request_duration_seconds", "Time until the model answered a prompt.", ("agent", "stage"))
+LLM_BACKEND_IN_FLIGHT = REGISTRY.gauge("llm_backend_in_flight", "Requests currently waiting for the model backend.")
+LLM_BACKEND_LATENCY = REGISTRY.histogram("llm_backend_duration_seconds", "Duration of the requests actually sent to the model backend.")
+TOOL_CALLS = REGISTRY.counter("tool_calls_total", "Analysis tool calls, by outcome.", ("tool", "outcome"))
+TOOL_LATENCY = REGISTRY.histogram("tool_duration_seconds", "Duration of analysis tool calls.", ("tool",))
+AGENT_RUNS = REGISTRY.counter("agent_runs_total", "Agent runs, by outcome.", ("agent", "outcome"))
+AGENT_LATENCY = REGISTRY.histogram("agent_run_duration_seconds", "Duration of whole agent runs.", ("agent",))
+SANDBOX_EVENTS = REGISTRY.counter("sandbox_events_total", "Sandboxed tool calls, limits hit (timeouts, memory, crashes) and recycled processes.", ("event",))
+CACHE_REQUESTS = REGISTRY.counter("cache_requests_total", "Lookups of reusable results, by cache and hit or miss.", ("cache", "result"))
+ANALYSIS_JOBS = REGISTRY.gauge("analysis_jobs", "Background analysis jobs of this process, by status.", ("status",))
+ACTIVE_SESSIONS = REGISTRY.gauge("active_sessions", "Sessions active within the last SESSION_IDLE_SECONDS.")
+
+_sessions_lock = threading.Lock()
+_session_seen = {}  # Session id -> last time it was active
+
+
+def touch_session(session_id):
+    """Marks a session as active, e.g. on every rerun of the app."""
+    now = time.time()
+    with _sessions_lock:
+        _session_seen[session_id] = now
+        for stale in [key for key, seen in _session_seen.items() if now - seen > SESSION_IDLE_SECONDS]:
+            del _session_seen[stale]
+
+
+def _active_sessions():
+    cutoff = time.time() - SESSION_IDLE_SECONDS
+    with _sessions_lock:
+        return {(): sum(1 for seen in _session_seen.values() if seen >= cutoff)}
+
+
+ACTIVE_SESSIONS.add_function(_active_sessions)
+
+
+@contextmanager
+def track(counter, histogram, **labels):
+    """Times the block into the histogram and counts its outcome (ok, cancelled or error) in the counter."""
+    start = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    except OperationCancelled:
+        outcome = "cancelled"
+        raise
+    finally:
+        histogram.observe(time.perf_counter() - start, **labels)
+        counter.inc(outcome=outcome, **labels)
+
+
+def tracked_tool(tool):
+    """Wraps a tool so the duration and outcome of every call are recorded (labelled by the tool's function)."""
+    name = tool.func.__name__
+
+    @functools.wraps(tool.func)  # Keeps the signature, so optional arguments (e.g. cancel_token) are still detected
+    def func(code, *args, **kwargs):
+        with track(TOOL_CALLS, TOOL_LATENCY, tool=name):
+            return tool.func(code, *args, **kwargs)
+
+    return Tool(name=tool.name, func=func, description=tool.description)
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = REGISTRY
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = self.registry.expose().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes every few seconds would flood the log
+
+
+_server = None
+_server_lock = threading.Lock()
+
+
+def start_metrics_server(port=None, host=None):
+    """
+    Serves /metrics on a background thread, once per process. Does nothing if the port is 0.
+
+    Returns:
+        ThreadingHTTPServer: The server, or None if it is disabled or the port is taken.
+    """
+    global _server
+    port = METRICS_PORT if port is None else port
+    with _server_lock:
+        if _server is not None or not port:
+            return _server
+        try:
+            _server = ThreadingHTTPServer((host or METRICS_HOST, port), _MetricsHandler)
+        except OSError as e:
+            print(f"Error starting the metrics server on port {port}: {e}")
+            return None
+        threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True).start()
+        return _server
@@ -0,0 +1,77 @@
+import inspect
+from langchain.agents import Tool
+from agents.orchestrator_agent import OrchestratorAgent
+from agents.syntax_agent import SyntaxAgent
+from agents.semantics_agent import SemanticsAgent
+from agents.code_style_agent import CodeStyleAgent
+from agents.code_structure_agent import CodeStructureAgent
+from agents.security_analysis_agent import SecurityAnalysisAgent
+from agents.code_efficiency_agent import CodeEfficiencyAgent
+from agents.documentation_agent import DocumentationAgent
+from agents.error_handling_agent import ErrorHandlingAgent
+from agents.best_practices_agent import BestPracticesAgent
+from tools.syntax_tool import syntax_tool
+from tools.semantics_tool import semantics_tool
+from tools.code_style_tool import code_style_tool
+from tools.code_structure_tool import code_structure_tool
+from tools.security_analysis_tool import security_analysis_tool
+from tools.code_efficiency_tool import code_efficiency_tool
+from tools.documentation_tool import documentation_tool
+from tools.error_handling_tool import error_handling_tool
+from tools.best_practices_tool import best_practices_tool
+from profiling import profiled_tool
+from metrics import tracked_tool
+from sandbox import sandboxed_tool
+
+# Agent class and the tool it uses (run in the sandbox, with its calls recorded in the metrics), in the default order of the analysis
+AGENT_TOOLS = {
+    "SyntaxAgent": (SyntaxAgent, tracked_tool(sandboxed_tool(syntax_tool))),
+    "SemanticsAgent": (SemanticsAgent, tracked_tool(sandboxed_tool(semantics_tool))),
+    "CodeStyleAgent": (CodeStyleAgent, tracked_tool(sandboxed_tool(code_style_tool))),
+    "CodeStructureAgent": (CodeStructureAgent, tracked_tool(sandboxed_tool(code_structure_tool))),
+    "SecurityAnalysisAgent": (SecurityAnalysisAgent, tracked_tool(sandboxed_tool(security_analysis_tool))),
+    "CodeEfficiencyAgent": (CodeEfficiencyAgent, tracked_tool(sandboxed_tool(code_efficiency_tool))),
+    "DocumentationAgent": (DocumentationAgent, tracked_tool(sandboxed_tool(documentation_tool))),
+    "ErrorHandlingAgent": (ErrorHandlingAgent, tracked_tool(sandboxed_tool(error_handling_tool))),
+    "BestPracticesAgent": (BestPracticesAgent, tracked_tool(sandboxed_tool(best_practices_tool))),
+}
+
+# Tools by name, so tool runs can be dispatched by name (e.g. to remote workers)
+TOOLS = {tool.name: tool for _, tool in AGENT_TOOLS.values()}
+
+
+def remote_tool(tool, broker):
+    """
+    Wraps a tool so each call runs as a task on a worker and waits for its result.
+    It takes the keyword arguments of the tool (e.g. line_ranges), which must be JSON-serializable.
+    """
+    def func(code, cancel_token=None, **kwargs):
+        task_id = broker.enqueue("tool", {"tool": tool.name, "code": code, "kwargs": kwargs})
+        return broker.wait(task_id, cancel_token=cancel_token)
+
+    # Callers check which arguments the tool accepts; cancel_token is taken by every remote tool
+    signature = inspect.signature(tool.func)
+    if "cancel_token" not in signature.parameters:
+        cancel = inspect.Parameter("cancel_token", inspect.Parameter.KEYWORD_ONLY, default=None)
+        signature = signature.replace(parameters=[*signature.parameters.values(), cancel])
+    func.__signature__ = signature
+    return Tool(name=tool.name, func=func, description=tool.description)
+
+
+def build_agents(wrap_tool=None):
+    """
+    Creates one instance of every agent.
+
+    Args:
+        wrap_tool: Optional function applied to each tool before it is given to its agent.
+                   Without it, tools are profiled in this process when PROFILE_AGENTS selects them.
+    """
+    agents = []
+    for agent_class, tool in AGENT_TOOLS.values():
+        agents.append(agent_class(wrap_tool(tool) if wrap_tool else profiled_tool(tool)))
+    return agents
+
+
+def build_orchestrator(agents=None):
+    """Creates the orchestrator over the given agents (all agents by default)."""
+    return OrchestratorAgent(agents=agents if agents is not None else build_agents())
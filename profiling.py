@@ -0,0 +1,216 @@
+import cProfile
+import functools
+import hashlib
+import io
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from langchain.agents import Tool
+
+# Agents and tools whose runs are profiled: "" (off), "all", or comma-separated names (e.g. "SecurityAnalysisAgent,analyze_code_structure")
+PROFILE_AGENTS = os.getenv("PROFILE_AGENTS", "")
+# Directory with one subdirectory of profiles per submission hash, and an index.jsonl of all runs
+PROFILE_DIR = os.getenv("PROFILE_DIR", "profiles")
+# Seconds between two stack samples of the profiled thread
+PROFILE_SAMPLE_INTERVAL = float(os.getenv("PROFILE_SAMPLE_INTERVAL", "0.005"))
+# Functions and allocation sites listed in the summary of a run
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+# Frames stored per traced allocation (more frames cost more memory while tracing)
+PROFILE_TRACEBACK_FRAMES = int(os.getenv("PROFILE_TRACEBACK_FRAMES", "1"))
+
+_local = threading.local()  # Whether a run is already profiled on this thread
+_index_lock = threading.Lock()
+_tracemalloc_lock = threading.Lock()
+_tracemalloc_users = 0
+_tracemalloc_started = False
+
+
+def profiling_enabled(name):
+    """Whether PROFILE_AGENTS selects the agent or tool function with this name."""
+    selected = {part.strip() for part in PROFILE_AGENTS.split(",") if part.strip()}
+    return "all" in selected or name in selected
+
+
+def _frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StackSampler:
+    """Samples the stack of one thread at a fixed interval and counts the collapsed stacks (root first)."""
+
+    def __init__(self, thread_id, interval=PROFILE_SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name=f"stack-sampler-{thread_id}", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        return self.stacks
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            labels = []
+            while frame is not None:
+                labels.append(_frame_label(frame.f_code))
+                frame = frame.f_back
+            if labels:
+                self.stacks[";".join(reversed(labels))] += 1
+
+
+def _acquire_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        if _tracemalloc_users == 0 and not tracemalloc.is_tracing():
+            tracemalloc.start(PROFILE_TRACEBACK_FRAMES)
+            _tracemalloc_started = True
+        _tracemalloc_users += 1
+
+
+def _release_tracemalloc():
+    global _tracemalloc_users, _tracemalloc_started
+    with _tracemalloc_lock:
+        _tracemalloc_users -= 1
+        if _tracemalloc_users == 0 and _tracemalloc_started:
+            tracemalloc.stop()  # Only if profiling started it, so other tracemalloc users are left alone
+            _tracemalloc_started = False
+
+
+class ProfileRun:
+    """The artifacts of one profiled run: a .prof file (pstats), a .collapsed stack file and a .txt summary."""
+
+    def __init__(self, name, code, directory=None):
+        self.name = name
+        self.fingerprint = hashlib.sha256(code.encode("utf-8")).hexdigest()
+        self.started_at = time.time()
+        self.directory = Path(directory or PROFILE_DIR)
+        self.paths = {}
+        self.duration = None
+
+    def _write(self, profile, stacks, snapshots, peak):
+        run_dir = self.directory / self.fingerprint[:16]
+        run_dir.mkdir(parents=True, exist_ok=True)
+        stem = run_dir / f"{self.name}-{time.strftime('%Y%m%d-%H%M%S', time.localtime(self.started_at))}-{threading.get_ident()}"
+        self.paths = {"pstats": f"{stem}.prof", "collapsed": f"{stem}.collapsed", "summary": f"{stem}.txt"}
+
+        if profile is not None:
+            profile.dump_stats(self.paths["pstats"])
+        else:
+            del self.paths["pstats"]
+        # One "frame;frame;frame count" line per stack, the input of flamegraph.pl and speedscope
+        with open(self.paths["collapsed"], "w", encoding="utf-8") as collapsed_file:
+            for stack, count in stacks.most_common():
+                collapsed_file.write(f"{stack} {count}\n")
+
+        hot_functions = io.StringIO()
+        if profile is not None:
+            pstats.Stats(profile, stream=hot_functions).sort_stats("cumulative").print_stats(PROFILE_TOP)
+        else:
+            hot_functions.write("  not recorded: another run held the profiler, see the sampled stacks (.collapsed)")
+        before, after = snapshots
+        ignored = [tracemalloc.Filter(False, tracemalloc.__file__), tracemalloc.Filter(False, __file__)]
+        growth = after.filter_traces(ignored).compare_to(before.filter_traces(ignored), "lineno")
+        allocations = [
+            f"{stat.size_diff / 1024:10.1f} KiB {stat.count_diff:+8d} blocks  {stat.traceback[0].filename}:{stat.traceback[0].lineno}"
+            for stat in growth[:PROFILE_TOP] if stat.size_diff > 0
+        ]
+        summary = [
+            f"Profile of {self.name} for submission {self.fingerprint}",
+            f"Wall time: {self.duration:.3f}s, {sum(stacks.values())} stack samples every {PROFILE_SAMPLE_INTERVAL * 1000:g}ms",
+            # tracemalloc traces the whole process, so concurrent runs add to these figures
+            f"Peak traced memory: {peak / 1024 / 1024:.1f} MiB (process-wide while this run was traced)",
+            "",
+            "Top allocations (memory still held at the end of the run, by line):",
+            *(allocations or ["  none"]),
+            "",
+            "Hot functions (cumulative time):",
+            hot_functions.getvalue().strip(),
+        ]
+        with open(self.paths["summary"], "w", encoding="utf-8") as summary_file:
+            summary_file.write("\n".join(summary) + "\n")
+
+        entry = {"name": self.name, "fingerprint": self.fingerprint, "started_at": self.started_at,
+                 "duration": self.duration, "peak_bytes": peak, **self.paths}
+        with _index_lock, open(self.directory / "index.jsonl", "a", encoding="utf-8") as index_file:
+            index_file.write(json.dumps(entry) + "\n")
+
+
+@contextmanager
+def profiled(name, code, enabled=None, directory=None):
+    """
+    Profiles the code run inside the block with cProfile, a stack sampler and tracemalloc, and writes the
+    artifacts under PROFILE_DIR/<submission hash>/. Runs nested in a profiled run of the same thread are
+    covered by the outer profile and not profiled again.
+
+    Args:
+        name: Agent name or tool function name, used for the file names and to check PROFILE_AGENTS.
+        code: The submitted code the run belongs to.
+        enabled: Profile regardless of PROFILE_AGENTS (True), never (False) or as configured (None).
+
+    Yields:
+        ProfileRun: The run whose paths are set once the block exits, or None if it is not profiled.
+    """
+    if not (enabled or (enabled is None and profiling_enabled(name))) or getattr(_local, "active", False):
+        yield None
+        return
+
+    run = ProfileRun(name, code, directory)
+    _local.active = True
+    _acquire_tracemalloc()
+    try:
+        tracemalloc.reset_peak()
+        before = tracemalloc.take_snapshot()
+        sampler = StackSampler(threading.get_ident())
+        profile = cProfile.Profile()
+        start = time.perf_counter()
+        try:
+            profile.enable()
+        except ValueError:
+            # Python 3.12+ allows one active profiler per process: a concurrent run holds it, this one is only sampled
+            profile = None
+        sampler.start()
+        try:
+            yield run
+        finally:
+            if profile is not None:
+                profile.disable()
+            run.duration = time.perf_counter() - start
+            stacks = sampler.stop()
+            after = tracemalloc.take_snapshot()
+            peak = tracemalloc.get_traced_memory()[1]
+            try:
+                run._write(profile, stacks, (before, after), peak)
+            except OSError as e:
+                print(f"Error writing profile of {name}: {e}")
+    finally:
+        _release_tracemalloc()
+        _local.active = False
+
+
+def profiled_tool(tool):
+    """
+    Wraps a tool so its calls are profiled when PROFILE_AGENTS selects its function (e.g. analyze_code_structure).
+    Tools that run in a sandbox process are profiled there instead and returned as they are.
+    """
+    if getattr(tool.func, "profiled_in_sandbox", False):
+        return tool
+
+    @functools.wraps(tool.func)  # Keeps the signature, so optional arguments (e.g. cancel_token) are still detected
+    def func(code, *args, **kwargs):
+        with profiled(tool.func.__name__, code):
+            return tool.func(code, *args, **kwargs)
+
+    return Tool(name=tool.name, func=func, description=tool.description)
@@ -0,0 +1,346 @@
+import argparse
+import ast
+import inspect
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import config  # Loads .env before the modules below read their settings
+from cancellation import raise_if_cancelled
+from pipeline import AGENT_TOOLS
+from tools.findings_compactor import SEVERITY_RANK, collect_findings, compact_findings
+
+# Threads running tools and per-module reports in parallel
+PROJECT_WORKERS = int(os.getenv("PROJECT_WORKERS", "8"))
+# Module reports summarized per prompt; larger projects are summarized in several rounds
+PROJECT_SUMMARY_FAN_IN = int(os.getenv("PROJECT_SUMMARY_FAN_IN", "10"))
+
+# Directories that never contain project modules
+SKIPPED_DIRS = {"__pycache__", "venv", "env", "node_modules", "build", "dist", "site-packages"}
+
+# Tool messages that mean "nothing found", e.g. "No syntax issues found."
+NO_FINDINGS = re.compile(r"^No .*(found|detected)\.?$")
+
+
+class Module:
+    """One Python file of the project with its place in the import graph."""
+
+    def __init__(self, name, path, is_package):
+        self.name = name
+        self.path = path
+        self.is_package = is_package
+        self.code = path.read_text(encoding="utf-8", errors="replace")
+        try:
+            self.tree = ast.parse(self.code)
+        except SyntaxError:
+            self.tree = None
+        self.imports = set()  # Project modules this module imports
+        self.imported_by = set()
+        self.external_uses = set()  # Names of this module that other modules use
+        # Attribute names this module accesses, e.g. 'run' of agent.run(); a method may be called through any of them
+        self.attribute_names = {node.attr for node in ast.walk(self.tree) if isinstance(node, ast.Attribute)} if self.tree else set()
+
+    @property
+    def package(self):
+        return self.name if self.is_package else self.name.rpartition(".")[0]
+
+    def top_level_names(self):
+        names = set()
+        for node in self.tree.body if self.tree else []:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                names.add(node.name)
+        return names
+
+    def member_names(self):
+        """Names of the methods and nested classes defined in the classes of this module."""
+        names = set()
+        for node in ast.walk(self.tree) if self.tree else []:
+            if isinstance(node, ast.ClassDef):
+                names.update(member.name for member in node.body
+                             if isinstance(member, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)))
+        return names
+
+
+class ProjectGraph:
+    """
+    The modules of a project directory and the imports between them.
+    If the directory is itself a package, module names start with its name.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root).resolve()
+        base = self.root.parent if (self.root / "__init__.py").exists() else self.root
+        self.modules = {}
+        for path in sorted(self.root.rglob("*.py")):
+            parts = path.relative_to(base).parts
+            if any(part in SKIPPED_DIRS or part.startswith(".") for part in parts[:-1]):
+                continue
+            is_package = path.name == "__init__.py"
+            name_parts = parts[:-1] if is_package else parts[:-1] + (path.stem,)
+            name = ".".join(name_parts) or self.root.name
+            self.modules[name] = Module(name, path, is_package)
+        for module in self.modules.values():
+            self._link(module)
+        # Methods are used through instances, whose types are unknown here: any attribute of that name counts
+        attribute_names = set().union(*(module.attribute_names for module in self.modules.values()))
+        for module in self.modules.values():
+            module.external_uses |= module.member_names() & attribute_names
+
+    def _resolve(self, module, level, target):
+        """Absolute name of a (possibly relative) import target."""
+        if not level:
+            return target or ""
+        package = module.package.split(".") if module.package else []
+        base = package[:len(package) - level + 1]
+        return ".".join(base + ([target] if target else []))
+
+    def _longest_module(self, dotted):
+        """Splits a dotted name into the longest project module prefix and the remaining name parts."""
+        parts = dotted.split(".")
+        for end in range(len(parts), 0, -1):
+            name = ".".join(parts[:end])
+            if name in self.modules:
+                return name, parts[end:]
+        return None, parts
+
+    def _use(self, module, target, name=None):
+        if target is None or target == module.name:
+            return
+        module.imports.add(target)
+        self.modules[target].imported_by.add(module.name)
+        if name == "*":
+            self.modules[target].external_uses |= self.modules[target].top_level_names()
+        elif name:
+            self.modules[target].external_uses.add(name)
+
+    def _link(self, module):
+        if module.tree is None:
+            return
+        aliases = {}  # Local name -> dotted module path it refers to
+        for node in ast.walk(module.tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    target, _ = self._longest_module(alias.name)
+                    self._use(module, target)
+                    if alias.asname:
+                        aliases[alias.asname] = alias.name
+                    else:
+                        aliases[alias.name.split(".")[0]] = alias.name.split(".")[0]
+            elif isinstance(node, ast.ImportFrom):
+                source = self._resolve(module, node.level, node.module)
+                target, rest = self._longest_module(source) if source else (None, [])
+                for alias in node.names:
+                    submodule = f"{source}.{alias.name}"
+                    if submodule in self.modules:
+                        self._use(module, submodule)
+                        aliases[alias.asname or alias.name] = submodule
+                    elif target is not None and not rest:
+                        self._use(module, target, alias.name)
+
+        # Attribute access through imported modules, e.g. utils.helper() uses 'helper' of utils
+        for node in ast.walk(module.tree):
+            if isinstance(node, ast.Attribute):
+                chain = []
+                value = node
+                while isinstance(value, ast.Attribute):
+                    chain.append(value.attr)
+                    value = value.value
+                if isinstance(value, ast.Name) and value.id in aliases:
+                    dotted = ".".join([aliases[value.id]] + list(reversed(chain)))
+                    target, rest = self._longest_module(dotted)
+                    if target is not None and rest:
+                        self._use(module, target, rest[0])
+
+    def order(self):
+        """Module names with dependencies before the modules importing them (import cycles last)."""
+        remaining = {name: set(module.imports) for name, module in self.modules.items()}
+        ordered = []
+        while remaining:
+            ready = sorted(name for name, imports in remaining.items() if not imports & remaining.keys())
+            if not ready:
+                ordered.extend(sorted(remaining))  # Import cycle
+                break
+            ordered.extend(ready)
+            for name in ready:
+                del remaining[name]
+        return ordered
+
+
+def tool_arguments(tool, **context):
+    """The keyword arguments of the context (e.g. external_uses, line_ranges, cancel_token) the tool accepts."""
+    parameters = inspect.signature(tool.func).parameters
+    return {key: value for key, value in context.items() if key in parameters and value is not None}
+
+
+def run_tool(tool, code, cancel_token=None, **context):
+    """Runs one tool on one file, passing the context (e.g. cross-file uses) to tools that accept it."""
+    raise_if_cancelled(cancel_token)
+    try:
+        return tool.func(code, **tool_arguments(tool, cancel_token=cancel_token, **context))
+    except Exception as e:
+        return [f"Error running {tool.name}: {str(e)}"]
+
+
+def count_findings(tool_output, min_severity="low"):
+    """Number of findings of at least min_severity in a tool output, not counting "No issues found" messages."""
+    return sum(1 for _, severity, _, message in collect_findings(tool_output)
+               if SEVERITY_RANK[severity] <= SEVERITY_RANK[min_severity] and not NO_FINDINGS.match(message))
+
+
+def _module_report(module, findings, cancel_token=None):
+    from gradio_llm import query_gradio_client
+    sections = "\n\n".join(f"### {agent_name}\n{compact_findings(output)}" for agent_name, output in findings.items())
+    report_prompt = f"""
+    You are a code review expert. Based on the findings of the analysis tools for the module '{module.name}' of a Python project:
+    - Imports from the project: {', '.join(sorted(module.imports)) or 'none'}
+    - Imported by: {', '.join(sorted(module.imported_by)) or 'none'}
+
+    {sections}
+
+    Generate a short report of the most important issues of this module, grouped by topic.
+    Do not improve/revise the code.
+    """
+    try:
+        return query_gradio_client(report_prompt, agent="Project", stage="module_report", cancel_token=cancel_token)
+    except Exception as e:
+        return f"Error generating report: {str(e)}"
+
+
+def _summarize(reports, executor, cancel_token=None):
+    """Summarizes module reports, in several rounds of PROJECT_SUMMARY_FAN_IN reports for large projects."""
+    from gradio_llm import query_gradio_client
+
+    def summarize(batch):
+        sections = "\n\n".join(f"### {name}\n{report}" for name, report in batch)
+        summary_prompt = f"""
+        You are a code review expert. Below are the reports of several modules of a Python project.
+
+        {sections}
+
+        Summarize the most important issues across these modules in a short report, mentioning the affected modules.
+        Do not improve/revise the code.
+        """
+        try:
+            return query_gradio_client(summary_prompt, agent="Project", stage="summary", cancel_token=cancel_token)
+        except Exception as e:
+            return f"Error generating summary: {str(e)}"
+
+    fan_in = max(PROJECT_SUMMARY_FAN_IN, 2)
+    while True:
+        batches = [reports[start:start + fan_in] for start in range(0, len(reports), fan_in)]
+        summaries = list(executor.map(summarize, batches))
+        if len(summaries) == 1:
+            return summaries[0]
+        reports = [(f"Modules {batch[0][0]} to {batch[-1][0]}", summary) for batch, summary in zip(batches, summaries)]
+
+
+def analyze_project(root, agent_names=None, with_reports=True, workers=PROJECT_WORKERS, cancel_token=None):
+    """
+    Analyzes every module of a project directory.
+    - Builds the import graph, so tools get cross-file context (e.g. functions used by other modules are not dead)
+    - Runs each agent's tool on every file in parallel
+    - Optionally writes one LLM report per module and a summary of those reports
+
+    Returns:
+        dict: "order" (modules, dependencies first), "modules" (per module: path, imports, imported_by,
+              findings per agent, finding counts and report), "totals" (findings per agent) and "summary".
+    """
+    graph = ProjectGraph(root)
+    agent_names = agent_names or list(AGENT_TOOLS)
+    order = graph.order()
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="project") as executor:
+        # Dependencies first, so their results are ready first
+        futures = {}
+        for name in order:
+            module = graph.modules[name]
+            for agent_name in agent_names:
+                futures[(name, agent_name)] = executor.submit(
+                    run_tool, AGENT_TOOLS[agent_name][1], module.code, cancel_token,
+                    external_uses=sorted(module.external_uses),
+                )
+        results = {name: {} for name in order}
+        for (name, agent_name), future in futures.items():
+            results[name][agent_name] = future.result()
+
+        reports = {}
+        if with_reports:
+            report_futures = {
+                name: executor.submit(_module_report, graph.modules[name], results[name], cancel_token)
+                for name in order
+            }
+            reports = {name: future.result() for name, future in report_futures.items()}
+
+        modules, totals = {}, {agent_name: 0 for agent_name in agent_names}
+        for name in order:
+            module = graph.modules[name]
+            counts = {agent_name: count_findings(output) for agent_name, output in results[name].items()}
+            for agent_name, count in counts.items():
+                totals[agent_name] += count
+            modules[name] = {
+                "path": str(module.path),
+                "imports": sorted(module.imports),
+                "imported_by": sorted(module.imported_by),
+                "findings": results[name],
+                "counts": counts,
+                "report": reports.get(name),
+            }
+
+        summary = None
+        if with_reports and reports:
+            raise_if_cancelled(cancel_token)
+            summary = _summarize([(name, reports[name]) for name in order], executor, cancel_token)
+
+    return {"root": str(graph.root), "order": order, "modules": modules, "totals": totals, "summary": summary}
+
+
+def format_project_report(result):
+    """Renders the result of analyze_project as Markdown."""
+    lines = [f"# Project Analysis: {result['root']}", ""]
+    if result["summary"]:
+        lines += ["## Summary", "", result["summary"], ""]
+
+    lines += ["## Findings per Agent", ""]
+    lines += [f"- {agent_name}: {count}" for agent_name, count in result["totals"].items()]
+    lines.append("")
+
+    for name in result["order"]:
+        module = result["modules"][name]
+        lines += [f"## {name}", "", f"`{module['path']}`", ""]
+        if module["imports"]:
+            lines.append(f"Imports: {', '.join(module['imports'])}")
+        if module["imported_by"]:
+            lines.append(f"Imported by: {', '.join(module['imported_by'])}")
+        lines.append("")
+        if module["report"]:
+            lines += [module["report"], ""]
+        else:
+            for agent_name, output in module["findings"].items():
+                if module["counts"][agent_name]:
+                    lines += [f"### {agent_name}", compact_findings(output), ""]
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Analyzes every module of a Python project with the LLM Code Tutor agents.")
+    parser.add_argument("root", help="Project directory.")
+    parser.add_argument("--agents", default=None, help=f"Comma-separated agents (default: all of {', '.join(AGENT_TOOLS)}).")
+    parser.add_argument("--no-llm", action="store_true", help="Only run the tools, without per-module reports and summary.")
+    parser.add_argument("--workers", type=int, default=PROJECT_WORKERS, help="Files analyzed in parallel.")
+    parser.add_argument("--output", default=None, help="Write the Markdown report to this file instead of printing it.")
+    args = parser.parse_args()
+
+    agent_names = [name.strip() for name in args.agents.split(",")] if args.agents else None
+    unknown = [name for name in agent_names or [] if name not in AGENT_TOOLS]
+    if unknown:
+        parser.error(f"Unknown agents: {', '.join(unknown)}")
+
+    report = format_project_report(analyze_project(args.root, agent_names, with_reports=not args.no_llm, workers=args.workers))
+    if args.output:
+        Path(args.output).write_text(report, encoding="utf-8")
+    else:
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+import math
+import os
+import re
+import threading
+from collections import defaultdict, deque
+
+# Rough characters-per-token ratio for Qwen-style BPE tokenizers on code and English prose
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "4"))
+
+# Hard budget for a single prompt (0 disables the budget) and what to do when it is exceeded
+PROMPT_MAX_TOKENS = int(os.getenv("PROMPT_MAX_TOKENS", "0"))
+PROMPT_BUDGET_MODE = os.getenv("PROMPT_BUDGET_MODE", "compact").strip().lower()  # "compact" or "reject"
+
+# Latest latencies kept per agent and stage for the percentiles
+LATENCY_SAMPLES = int(os.getenv("LATENCY_SAMPLES", "1000"))
+
+
+class PromptBudgetExceeded(ValueError):
+    """Raised when a prompt is larger than the configured budget and the budget mode is 'reject'."""
+
+
+def estimate_tokens(text):
+    """Estimates the number of tokens in a text from its character count."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def compact_prompt(prompt, max_tokens):
+    """
+    Shrinks a prompt to fit a token budget.
+    - Strips the indentation the f-string templates add and trailing whitespace
+    - Collapses runs of blank lines
+    - If still too large, cuts the middle of the prompt and leaves a marker
+
+    Returns:
+        str: The compacted prompt.
+    """
+    lines = [line.strip() for line in prompt.strip().splitlines()]
+    compacted = re.sub(r"\n{3,}", "\n\n", "\n".join(lines))
+    if estimate_tokens(compacted) <= max_tokens:
+        return compacted
+
+    # Keep the head (instructions) and the tail (the question being asked) of the prompt
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    marker = "\n[... {} characters omitted to fit the prompt budget ...]\n"
+    keep = max(max_chars - len(marker.format(len(compacted))), 0)
+    head, tail = keep * 2 // 3, keep - keep * 2 // 3
+    omitted = len(compacted) - head - tail
+    return compacted[:head] + marker.format(omitted) + (compacted[-tail:] if tail else "")
+
+
+def percentile(values, fraction):
+    """Nearest-rank percentile (fraction between 0 and 1) of a list of numbers, or None if it is empty."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(max(math.ceil(fraction * len(ordered)) - 1, 0), len(ordered) - 1)]
+
+
+class PromptLedger:
+    """Thread-safe accounting of prompt sizes, response sizes and latencies, aggregated by agent and stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats = defaultdict(lambda: {
+            "calls": 0,
+            "errors": 0,
+            "rejected": 0,
+            "compacted": 0,
+            "input_chars": 0,
+            "input_tokens": 0,
+            "output_chars": 0,
+            "output_tokens": 0,
+            "max_input_tokens": 0,
+            "latency_seconds": 0.0,
+        })
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_SAMPLES))
+
+    def record(self, agent, stage, prompt, response, latency, error=False):
+        """Records one LLM round-trip."""
+        input_tokens = estimate_tokens(prompt)
+        with self._lock:
+            stats = self._stats[(agent or "unknown", stage or "unknown")]
+            stats["calls"] += 1
+            stats["errors"] += 1 if error else 0
+            stats["input_chars"] += len(prompt)
+            stats["input_tokens"] += input_tokens
+            stats["output_chars"] += len(response or "")
+            stats["output_tokens"] += estimate_tokens(response)
+            stats["max_input_tokens"] = max(stats["max_input_tokens"], input_tokens)
+            stats["latency_seconds"] += latency
+            self._latencies[(agent or "unknown", stage or "unknown")].append(latency)
+
+    def record_budget_action(self, agent, stage, action):
+        """Records that a prompt was 'rejected' or 'compacted' by the budget."""
+        with self._lock:
+            self._stats[(agent or "unknown", stage or "unknown")][action] += 1
+
+    def summary(self):
+        """
+        Returns:
+            list: One dict per (agent, stage) with totals, averages, latency percentiles and latency per output token.
+        """
+        with self._lock:
+            items = sorted((key, dict(stats)) for key, stats in self._stats.items())
+            latencies = {key: list(samples) for key, samples in self._latencies.items()}
+
+        rows = []
+        for (agent, stage), stats in items:
+            calls = stats["calls"] or 1
+            stats.update({
+                "agent": agent,
+                "stage": stage,
+                "avg_input_tokens": stats["input_tokens"] / calls,
+                "avg_output_tokens": stats["output_tokens"] / calls,
+                "avg_latency_seconds": stats["latency_seconds"] / calls,
+                "latency_per_output_token": stats["latency_seconds"] / stats["output_tokens"] if stats["output_tokens"] else None,
+                "p50_latency_seconds": percentile(latencies.get((agent, stage)), 0.50),
+                "p95_latency_seconds": percentile(latencies.get((agent, stage)), 0.95),
+                "p99_latency_seconds": percentile(latencies.get((agent, stage)), 0.99),
+            })
+            rows.append(stats)
+        return rows
+
+    def reset(self):
+        with self._lock:
+            self._stats.clear()
+            self._latencies.clear()
+
+
+def summary_table_row(row):
+    """One summary row rounded for display. A row that only has budget actions recorded has no latencies."""
+    return {
+        "agent": row["agent"],
+        "stage": row["stage"],
+        "calls": row["calls"],
+        "avg input tokens": round(row["avg_input_tokens"]),
+        "max input tokens": row["max_input_tokens"],
+        "avg output tokens": round(row["avg_output_tokens"]),
+        "p95 latency s": round(row["p95_latency_seconds"], 2) if row["p95_latency_seconds"] is not None else None,
+        "s / output token": round(row["latency_per_output_token"], 4) if row["latency_per_output_token"] else None,
+        "compacted": row["compacted"],
+        "rejected": row["rejected"],
+    }
+
+
+# Process-wide ledger shared by every agent and session
+prompt_ledger = PromptLedger()
+
+
+def enforce_prompt_budget(prompt, agent=None, stage=None, max_tokens=None, mode=None):
+    """
+    Applies the prompt budget before a prompt is sent.
+
+    Returns:
+        str: The original prompt, or a compacted one in 'compact' mode.
+
+    Raises:
+        PromptBudgetExceeded: If the prompt is over budget in 'reject' mode.
+    """
+    max_tokens = PROMPT_MAX_TOKENS if max_tokens is None else max_tokens
+    mode = PROMPT_BUDGET_MODE if mode is None else mode
+    tokens = estimate_tokens(prompt)
+    if not max_tokens or tokens <= max_tokens:
+        return prompt
+
+    if mode == "reject":
+        prompt_ledger.record_budget_action(agent, stage, "rejected")
+        raise PromptBudgetExceeded(
+            f"Prompt for {agent or 'unknown'}/{stage or 'unknown'} is ~{tokens} tokens, over the budget of {max_tokens} tokens."
+        )
+
+    prompt_ledger.record_budget_action(agent, stage, "compacted")
+    return compact_prompt(prompt, max_tokens)
@@ -0,0 +1,255 @@
+import functools
+import importlib
+import inspect
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing.connection import Connection
+from langchain.agents import Tool
+from cancellation import raise_if_cancelled
+from profiling import PROFILE_DIR, profiled, profiling_enabled
+import metrics
+
+# Where analysis tools run: "process" (a pool of worker processes with limits) or "off" (in the calling thread)
+TOOL_SANDBOX = os.getenv("TOOL_SANDBOX", "process").strip().lower()
+# Wall-clock limit per tool call
+TOOL_TIMEOUT_SECONDS = float(os.getenv("TOOL_TIMEOUT_SECONDS", "30"))
+# Resident memory limit per sandbox process
+TOOL_MEMORY_LIMIT_MB = int(os.getenv("TOOL_MEMORY_LIMIT_MB", "1024"))
+# Sandbox processes shared by all sessions, and tool calls a process serves before it is replaced
+TOOL_SANDBOX_WORKERS = int(os.getenv("TOOL_SANDBOX_WORKERS", str(min(os.cpu_count() or 1, 4))))
+TOOL_SANDBOX_MAX_TASKS = int(os.getenv("TOOL_SANDBOX_MAX_TASKS", "100"))
+
+# Seconds between two checks of the deadline, the memory of the process and cancellation
+POLL_INTERVAL = 0.05
+# The address space limit backs up the memory watchdog against allocations faster than its polling.
+# It is a multiple of the memory limit because virtual memory (thread stacks, mapped libraries) exceeds RSS.
+ADDRESS_SPACE_FACTOR = 4
+
+
+def _serve(memory_limit_mb):
+    """
+    Main loop of a sandbox process (python -m sandbox): runs one function call per message on stdin
+    and sends the result on stdout until stdin is closed.
+    """
+    if memory_limit_mb:
+        limit = memory_limit_mb * ADDRESS_SPACE_FACTOR * 1024 * 1024
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    requests = Connection(0, writable=False)
+    results = Connection(os.dup(1), readable=False)
+    os.dup2(2, 1)  # Output printed by the tools must not corrupt the results
+    while True:
+        try:
+            module, name, code, kwargs, profile_dir = requests.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        try:
+            function = getattr(importlib.import_module(module), name)
+            with profiled(name, code, enabled=profile_dir is not None, directory=profile_dir):
+                result = function(code, **kwargs)
+            results.send(("ok", result))
+        except MemoryError:
+            results.send(("memory", None))
+        except Exception as e:
+            results.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def limit_finding(tool_name, status, message):
+    """The finding returned instead of the tool output when a tool call hit a sandbox limit."""
+    return [{"tool": tool_name, "status": status, "severity": "high", "message": message}]
+
+
+class _SandboxProcess:
+    def __init__(self, memory_limit_mb):
+        # A fresh interpreter instead of fork (unsafe with the server's threads) or multiprocessing's spawn
+        # (which re-runs the main script, e.g. Streamlit's); it imports modules from the same paths as this one
+        env = dict(os.environ, PYTHONPATH=os.pathsep.join(path for path in sys.path if path))
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "sandbox", str(memory_limit_mb)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, env=env,
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+        )
+        self.requests = Connection(os.dup(self.process.stdin.fileno()), readable=False)
+        self.results = Connection(os.dup(self.process.stdout.fileno()), writable=False)
+        self.tasks = 0
+
+    def is_alive(self):
+        return self.process.poll() is None
+
+    def rss_bytes(self):
+        """Resident memory of the process, or None where /proc is not available."""
+        try:
+            with open(f"/proc/{self.process.pid}/statm") as statm:
+                return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return None
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait(1)
+        for stream in (self.requests, self.results, self.process.stdin, self.process.stdout):
+            stream.close()
+
+
+class SandboxPool:
+    """
+    Worker processes that run analysis functions under a wall-clock and memory limit.
+    A call that exceeds a limit, crashes its process or is cancelled kills the process, which is replaced
+    on demand, so one pathological submission cannot stall or bloat the server.
+    """
+
+    def __init__(self, size=TOOL_SANDBOX_WORKERS, timeout=TOOL_TIMEOUT_SECONDS, memory_limit_mb=TOOL_MEMORY_LIMIT_MB,
+                 max_tasks=TOOL_SANDBOX_MAX_TASKS):
+        self.size = max(size, 1)
+        self.timeout = timeout
+        self.memory_limit_mb = memory_limit_mb
+        self.max_tasks = max_tasks
+        self._idle = []
+        self._started = 0
+        self._condition = threading.Condition()
+        self.stats = {"calls": 0, "timeouts": 0, "memory": 0, "crashes": 0, "recycled": 0}
+
+    def _count(self, event):
+        with self._condition:
+            self.stats[event] += 1
+
+    def _acquire(self):
+        with self._condition:
+            while True:
+                while not self._idle and self._started >= self.size:
+                    self._condition.wait()
+                if not self._idle:
+                    break
+                worker = self._idle.pop()
+                if worker.is_alive():
+                    return worker
+                worker.kill()  # Died while idle, e.g. killed by the OOM killer
+                self._started -= 1
+            self._started += 1
+        try:
+            return _SandboxProcess(self.memory_limit_mb)
+        except Exception:
+            with self._condition:
+                self._started -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, worker, recycle):
+        recycle = recycle or not worker.is_alive() or (self.max_tasks and worker.tasks >= self.max_tasks)
+        if recycle:
+            worker.kill()
+        with self._condition:
+            if recycle:
+                self._started -= 1
+                self.stats["recycled"] += 1
+            else:
+                self._idle.append(worker)
+            self._condition.notify()
+
+    def call(self, function, code, cancel_token=None, timeout=None, profile_dir=None, **kwargs):
+        """
+        Runs function(code, **kwargs) in a sandbox process. The function must be importable by module and name.
+        With a profile_dir, the call is profiled in the sandbox process and its profile written there.
+
+        Returns:
+            The result of the function, or a limit finding (see limit_finding) if it timed out,
+            exceeded the memory limit or crashed its process.
+
+        Raises:
+            RuntimeError: If the function raised an exception.
+            OperationCancelled: If the cancel token fired (the process is killed).
+        """
+        function = inspect.unwrap(function)
+        name = function.__name__
+        timeout = self.timeout if timeout is None else timeout
+        memory_limit = self.memory_limit_mb * 1024 * 1024
+        worker = self._acquire()
+        recycle = True
+        try:
+            raise_if_cancelled(cancel_token)
+            worker.requests.send((function.__module__, name, code, kwargs, profile_dir))
+            worker.tasks += 1
+            self._count("calls")
+            deadline = time.monotonic() + timeout
+            while not worker.results.poll(POLL_INTERVAL):
+                raise_if_cancelled(cancel_token)
+                if timeout and time.monotonic() > deadline:
+                    self._count("timeouts")
+                    return limit_finding(name, "timeout", f"Analysis stopped: {name} took longer than {timeout:g}s on this code.")
+                rss = worker.rss_bytes()
+                if memory_limit and rss is not None and rss > memory_limit:
+                    self._count("memory")
+                    return limit_finding(name, "memory", f"Analysis stopped: {name} used more than {self.memory_limit_mb} MB on this code.")
+                if not worker.is_alive():
+                    break
+            try:
+                status, value = worker.results.recv()
+            except (EOFError, OSError):
+                worker.process.wait(1)
+                self._count("crashes")
+                return limit_finding(name, "crashed", f"Analysis stopped: {name} crashed on this code (exit code {worker.process.returncode}).")
+            if status == "memory":
+                self._count("memory")
+                return limit_finding(name, "memory", f"Analysis stopped: {name} ran out of memory on this code.")
+            recycle = False
+            if status == "error":
+                raise RuntimeError(value)
+            return value
+        finally:
+            self._release(worker, recycle)
+
+    def shutdown(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+            self._started -= len(idle)
+        for worker in idle:
+            worker.kill()
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_sandbox():
+    """The sandbox pool shared by this process, created on first use."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool()
+            metrics.SANDBOX_EVENTS.add_function(lambda: {(event,): count for event, count in _pool.stats.items()})
+        return _pool
+
+
+def run_sandboxed(function, code, cancel_token=None, **kwargs):
+    """Runs an analysis function in the sandbox, or directly if TOOL_SANDBOX is off."""
+    if TOOL_SANDBOX == "off":
+        return function(code, **kwargs)
+    return get_sandbox().call(function, code, cancel_token=cancel_token, **kwargs)
+
+
+def sandboxed_tool(tool):
+    """Wraps a tool so every call runs in the sandbox. A cancel_token argument is handled here, not sent along."""
+    accepts_cancel_token = "cancel_token" in inspect.signature(tool.func).parameters
+    name = inspect.unwrap(tool.func).__name__
+
+    @functools.wraps(tool.func)  # Keeps the signature, so optional arguments (e.g. cancel_token) are still detected
+    def func(code, *args, cancel_token=None, **kwargs):
+        if TOOL_SANDBOX == "off":
+            if accepts_cancel_token:
+                kwargs["cancel_token"] = cancel_token
+            return tool.func(code, *args, **kwargs)
+        if args:
+            raise TypeError("Sandboxed tools take their options as keyword arguments.")
+        # Profiled where the tool runs; a profile of this process would only show the wait for the result
+        profile_dir = os.path.abspath(PROFILE_DIR) if profiling_enabled(name) else None
+        return get_sandbox().call(tool.func, code, cancel_token=cancel_token, profile_dir=profile_dir, **kwargs)
+
+    func.profiled_in_sandbox = TOOL_SANDBOX != "off"
+    return Tool(name=tool.name, func=func, description=tool.description)
+
+
+if __name__ == "__main__":
+    _serve(int(sys.argv[1]))
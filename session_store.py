@@ -0,0 +1,191 @@
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections import deque
+from contextlib import contextmanager
+
+# Local SQLite file that receives the older history entries of every session
+HISTORY_DB_PATH = os.getenv("HISTORY_DB_PATH", "session_history.sqlite3")
+# Entries and bytes of one session kept in memory before older entries are spilled to disk
+HISTORY_WINDOW = int(os.getenv("HISTORY_WINDOW", "20"))
+HISTORY_MAX_BYTES = int(os.getenv("HISTORY_MAX_BYTES", str(256 * 1024)))
+# Entries loaded back per "load earlier messages" request
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "10"))
+# Spilled history of sessions idle for longer than this is deleted from disk (0 keeps it forever)
+HISTORY_MAX_AGE_SECONDS = float(os.getenv("HISTORY_MAX_AGE_SECONDS", str(24 * 3600)))
+# Expired history is purged at most this often per process
+HISTORY_PURGE_INTERVAL_SECONDS = 3600
+
+_purge_lock = threading.Lock()
+_last_purge = None
+
+
+@contextmanager
+def _database(db_path):
+    """Opens the history database for one transaction (a connection per operation keeps it thread-safe)."""
+    connection = sqlite3.connect(db_path, timeout=30)
+    try:
+        with connection:
+            yield _prepare(connection)
+    finally:
+        connection.close()
+
+
+def _prepare(connection):
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("""
+        CREATE TABLE IF NOT EXISTS history (
+            session_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            kind TEXT NOT NULL,
+            body BLOB NOT NULL,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (session_id, seq)
+        )
+    """)
+    return connection
+
+
+class SessionHistory:
+    """
+    Chat history of one session with a bounded in-memory window.
+    Older entries are compressed and spilled to a local SQLite file, and paged back in on request.
+    """
+
+    def __init__(self, session_id, db_path=HISTORY_DB_PATH, window=HISTORY_WINDOW, max_bytes=HISTORY_MAX_BYTES):
+        self.session_id = session_id
+        self.db_path = db_path
+        self.window = window
+        self.max_bytes = max_bytes
+        self._entries = deque()  # (seq, kind, text) of the newest entries
+        self._paged = []  # (seq, kind, text) of older entries loaded back from disk
+        self._bytes = 0
+        self._paged_bytes = 0
+        self._next_seq = 0
+        self._spilled = 0
+
+    def append(self, text, kind="message"):
+        """Adds an entry and spills the oldest in-memory entries if the window or memory cap is exceeded."""
+        self._entries.append((self._next_seq, kind, text))
+        self._next_seq += 1
+        self._bytes += len(text.encode("utf-8"))
+
+        spill = []
+        while len(self._entries) > 1 and (len(self._entries) > self.window or self._bytes > self.max_bytes):
+            entry = self._entries.popleft()
+            self._bytes -= len(entry[2].encode("utf-8"))
+            spill.append(entry)
+        if spill:
+            self._spill(spill)
+
+    def _spill(self, entries):
+        now = time.time()
+        with _database(self.db_path) as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO history (session_id, seq, kind, body, created_at) VALUES (?, ?, ?, ?, ?)",
+                [(self.session_id, seq, kind, zlib.compress(text.encode("utf-8")), now) for seq, kind, text in entries],
+            )
+        self._spilled += len(entries)
+
+    def _oldest_visible_seq(self):
+        if self._paged:
+            return self._paged[0][0]
+        if self._entries:
+            return self._entries[0][0]
+        return self._next_seq
+
+    def has_older(self):
+        """True if there are spilled entries older than the ones currently shown."""
+        return self._spilled > 0 and self._oldest_visible_seq() > 0
+
+    def load_older(self, count=HISTORY_PAGE_SIZE):
+        """
+        Pages older entries back in from disk, stopping at the per-session memory cap.
+        Once the cap is reached nothing more is loaded until collapse() drops the paged-in entries.
+
+        Returns:
+            int: Number of entries loaded.
+        """
+        with _database(self.db_path) as connection:
+            rows = connection.execute(
+                "SELECT seq, kind, body FROM history WHERE session_id = ? AND seq < ? ORDER BY seq DESC LIMIT ?",
+                (self.session_id, self._oldest_visible_seq(), count),
+            ).fetchall()
+        if not rows:
+            self._spilled = 0  # Purged from disk in the meantime
+            return 0
+
+        loaded = []
+        for seq, kind, body in rows:
+            text = zlib.decompress(body).decode("utf-8")
+            size = len(text.encode("utf-8"))
+            if size > self.max_bytes:
+                # Would exceed the cap on its own, it stays on disk and a note takes its place
+                text = f"*(An earlier message of {size // 1024} KB is too large to load back.)*"
+                size = len(text.encode("utf-8"))
+            if self._paged_bytes + size > self.max_bytes:
+                break
+            self._paged_bytes += size
+            loaded.append((seq, kind, text))
+        self._paged = list(reversed(loaded)) + self._paged
+        return len(loaded)
+
+    def has_paged(self):
+        """True if older entries were paged back in from disk."""
+        return bool(self._paged)
+
+    def collapse(self):
+        """Drops the entries that were paged back in (they stay on disk)."""
+        self._paged, self._paged_bytes = [], 0
+
+    def clear(self):
+        """Removes the whole history of the session, in memory and on disk."""
+        if self._spilled:
+            with _database(self.db_path) as connection:
+                connection.execute("DELETE FROM history WHERE session_id = ?", (self.session_id,))
+        self._entries.clear()
+        self.collapse()
+        self._bytes, self._spilled = 0, 0
+
+    @property
+    def memory_bytes(self):
+        return self._bytes + self._paged_bytes
+
+    def entries(self, kind="message"):
+        """Yields the texts of the visible entries (paged-in older ones first) of the given kind."""
+        for _, entry_kind, text in self._paged + list(self._entries):
+            if kind is None or entry_kind == kind:
+                yield text
+
+    def __iter__(self):
+        return self.entries()
+
+    def __len__(self):
+        return self._next_seq
+
+
+def purge_history(max_age_seconds=HISTORY_MAX_AGE_SECONDS, db_path=HISTORY_DB_PATH):
+    """
+    Deletes the spilled history of sessions that spilled nothing for max_age_seconds, e.g. abandoned ones.
+    Runs at most once per HISTORY_PURGE_INTERVAL_SECONDS in a process; does nothing if max_age_seconds is 0.
+
+    Returns:
+        bool: True if the purge ran.
+    """
+    global _last_purge
+    if not max_age_seconds:
+        return False
+    now = time.time()
+    with _purge_lock:
+        if _last_purge is not None and now - _last_purge < HISTORY_PURGE_INTERVAL_SECONDS:
+            return False
+        _last_purge = now
+    with _database(db_path) as connection:
+        connection.execute(
+            "DELETE FROM history WHERE session_id IN "
+            "(SELECT session_id FROM history GROUP BY session_id HAVING MAX(created_at) < ?)",
+            (now - max_age_seconds,),
+        )
+    return True
@@ -0,0 +1,79 @@
+import threading
+from cancellation import CancellationToken, OperationCancelled
+
+
+class _Call:
+    """One in-flight call shared by every caller that asked for the same key."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.cancel_token = CancellationToken()
+        self.waiters = 0
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Runs a function once for all concurrent callers with the same key; they all receive its result.
+    The call runs on its own thread, so a caller that gives up does not abort it for the others.
+    The call itself is only cancelled once every caller waiting for it was cancelled.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+        self.stats = {"calls": 0, "shared": 0}
+
+    def do(self, key, fn, cancel_token=None):
+        """
+        Runs fn(cancel_token) for the key, or waits for the call that is already running for it.
+
+        Returns:
+            The result of fn.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.stats["calls"] += 1
+            else:
+                self.stats["shared"] += 1
+            call.waiters += 1
+
+        if leader:
+            threading.Thread(target=self._run, args=(key, call, fn), daemon=True).start()
+        return self._wait(key, call, cancel_token)
+
+    def _run(self, key, call, fn):
+        try:
+            call.result = fn(call.cancel_token)
+        except BaseException as e:
+            call.error = e
+        finally:
+            # New callers after this point start a fresh call instead of getting this result
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def _wait(self, key, call, cancel_token):
+        try:
+            if cancel_token is None:
+                call.done.wait()
+            else:
+                while not call.done.wait(0.1):
+                    cancel_token.raise_if_cancelled()
+        except OperationCancelled:
+            with self._lock:
+                call.waiters -= 1
+                abandoned = call.waiters == 0
+                if abandoned and self._calls.get(key) is call:
+                    del self._calls[key]  # Later callers must not join a call that is being cancelled
+            if abandoned:
+                call.cancel_token.cancel()
+            raise
+        if call.error is not None:
+            raise call.error
+        return call.result
@@ -0,0 +1,50 @@
+import os
+from jobs import code_fingerprint, job_manager
+import metrics
+
+# Which agents to start ahead of time once an agent passes: "next", "all" (remaining agents) or "off"
+SPECULATIVE_AGENTS = os.getenv("SPECULATIVE_AGENTS", "next").strip().lower()
+
+
+class SpeculativeRuns:
+    """Agent runs of one session that were started in the background before the user asked for them."""
+
+    def __init__(self, session_id, mode=None):
+        self.session_id = session_id
+        self.mode = SPECULATIVE_AGENTS if mode is None else mode
+        self.profile = None  # Passed to the jobs, see AnalysisJob.profile
+        self._runs = {}  # agent name -> AnalysisJob
+
+    def start(self, agents, code):
+        """Starts the next agent (or all given agents, depending on the mode) in the background."""
+        if self.mode == "off" or not agents:
+            return
+        if self.mode == "next":
+            agents = agents[:1]
+
+        fingerprint = code_fingerprint(code)
+        for agent in agents:
+            existing = self._runs.get(agent.name)
+            if existing and existing.code_fingerprint == fingerprint:
+                continue  # Already running for this code
+            if existing:
+                job_manager.cancel(existing.id)
+            self._runs[agent.name] = job_manager.submit(self.session_id, agent, code, profile=self.profile)
+
+    def take(self, agent, code):
+        """
+        Returns:
+            AnalysisJob: The speculative run of the agent for exactly this code, or None if there is none.
+        """
+        job = self._runs.pop(agent.name, None)
+        if job is not None and (job.code_fingerprint != code_fingerprint(code) or job.status == "cancelled"):
+            job_manager.cancel(job.id)
+            job = None
+        metrics.CACHE_REQUESTS.inc(cache="speculative_runs", result="miss" if job is None else "hit")
+        return job
+
+    def discard(self):
+        """Drops all speculative work, e.g. because the code changed."""
+        for job in self._runs.values():
+            job_manager.cancel(job.id)
+        self._runs.clear()
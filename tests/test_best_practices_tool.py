@@ -0,0 +1,31 @@
+from tools.best_practices_tool import find_magic_numbers
+
+CODE = """MAX = 10
+MAX_RETRIES = 3
+
+
+class K:
+    LIMIT = 3
+
+
+def f(n, retries):
+    if n > 10:
+        pass
+    while retries < 3:
+        retries += 1
+    return n * 3
+"""
+
+
+def _messages():
+    return {(issue["line"], issue["number"]): issue["message"] for issue in find_magic_numbers(CODE)}
+
+
+def test_constant_suggested_when_its_name_fits():
+    assert "'MAX_RETRIES'" in _messages()[(12, 3)]
+
+
+def test_no_constant_suggested_for_a_value_match_only():
+    messages = _messages()
+    assert "existing constant" not in messages[(10, 10)]
+    assert "existing constant" not in messages[(14, 3)]
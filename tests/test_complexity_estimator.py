@@ -0,0 +1,17 @@
+from tools.complexity_estimator import estimate_complexity
+
+
+def _kinds(code):
+    return [finding["kind"] for finding in estimate_complexity(code)]
+
+
+def test_nested_index_loops_are_not_same_collection():
+    code = "def f(n):\n    for i in range(n):\n        for j in range(n):\n            pass\n"
+    assert "same-iterable" not in _kinds(code)
+    code = "def f(xs):\n    for i in range(len(xs)):\n        for j in range(len(xs)):\n            pass\n"
+    assert "same-iterable" not in _kinds(code)
+
+
+def test_same_collection_reported_once_per_nest():
+    code = "def f(xs):\n    for a in xs:\n        for b in xs:\n            for c in xs:\n                pass\n"
+    assert _kinds(code).count("same-iterable") == 1
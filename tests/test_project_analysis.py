@@ -0,0 +1,28 @@
+from project_analysis import ProjectGraph
+from tools.symbol_index import find_unused_symbols
+
+
+def _dead_functions(module):
+    return [finding["name"] for finding in find_unused_symbols(module.code, external_uses=sorted(module.external_uses))
+            if finding["kind"] == "dead-function"]
+
+
+def test_method_called_only_from_another_module_is_not_dead(tmp_path):
+    (tmp_path / "store.py").write_text(
+        "class Store:\n"
+        "    def load(self):\n"
+        "        return 1\n"
+        "\n"
+        "    def unused(self):\n"
+        "        return 2\n"
+    )
+    (tmp_path / "app.py").write_text(
+        "from store import Store\n"
+        "\n"
+        "store = Store()\n"
+        "print(store.load())\n"
+    )
+    graph = ProjectGraph(tmp_path)
+
+    assert "load" in graph.modules["store"].external_uses
+    assert _dead_functions(graph.modules["store"]) == ["unused"]
@@ -0,0 +1,28 @@
+import pytest
+
+from prompt_accounting import PromptBudgetExceeded, PromptLedger, enforce_prompt_budget, summary_table_row
+
+
+def test_rejected_prompt_row_has_no_latency(monkeypatch):
+    ledger = PromptLedger()
+    monkeypatch.setattr("prompt_accounting.prompt_ledger", ledger)
+    with pytest.raises(PromptBudgetExceeded):
+        enforce_prompt_budget("x" * 400, agent="SyntaxAgent", stage="plan", max_tokens=10, mode="reject")
+
+    (row,) = ledger.summary()
+    assert row["calls"] == 0 and row["rejected"] == 1
+    assert row["p95_latency_seconds"] is None
+
+    table_row = summary_table_row(row)
+    assert table_row["p95 latency s"] is None
+    assert table_row["s / output token"] is None
+    assert table_row["rejected"] == 1
+
+
+def test_recorded_call_row_is_rounded():
+    ledger = PromptLedger()
+    ledger.record("SyntaxAgent", "plan", "prompt", "response", 0.123456)
+
+    table_row = summary_table_row(ledger.summary()[0])
+    assert table_row["calls"] == 1
+    assert table_row["p95 latency s"] == 0.12
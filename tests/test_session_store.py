@@ -0,0 +1,30 @@
+import sqlite3
+
+import session_store
+from session_store import SessionHistory, purge_history
+
+
+def test_purge_deletes_only_expired_sessions(tmp_path, monkeypatch):
+    monkeypatch.setattr(session_store, "_last_purge", None)
+    db_path = str(tmp_path / "history.sqlite3")
+    for session_id in ("expired", "active"):
+        history = SessionHistory(session_id, db_path=db_path, window=1)
+        history.append("first")
+        history.append("second")
+    with sqlite3.connect(db_path) as connection:
+        connection.execute("UPDATE history SET created_at = created_at - 7200 WHERE session_id = 'expired'")
+
+    assert purge_history(3600, db_path=db_path)
+    with sqlite3.connect(db_path) as connection:
+        assert connection.execute("SELECT DISTINCT session_id FROM history").fetchall() == [("active",)]
+    assert not purge_history(3600, db_path=db_path)  # Throttled
+
+
+def test_oversized_entry_is_not_loaded_back(tmp_path):
+    history = SessionHistory("session", db_path=str(tmp_path / "history.sqlite3"), window=1, max_bytes=100)
+    history.append("x" * 500)
+    history.append("y")
+
+    assert history.load_older() == 1
+    assert history.memory_bytes <= 100 + 1
+    assert "x" * 500 not in list(history)
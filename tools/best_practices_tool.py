@@ -1,5 +1,141 @@
 from langchain.agents import Tool
 import ast
+import re
+
+# Numbers that are commonly accepted as non-magic numbers
+ALLOWED_NUMBERS = {0, 1, -1}
+
+CONSTANT_NAME = re.compile(r"^_?[A-Z][A-Z0-9_]*$")
+
+# Name parts that say nothing about what a constant is for, e.g. MAX in MAX_RETRIES
+GENERIC_NAME_WORDS = {"max", "min", "default", "limit", "count", "num", "number", "size", "value", "total", "threshold"}
+
+# Fields of compound statements that are not their header
+STATEMENT_BODIES = {"body", "orelse", "finalbody", "handlers", "cases"}
+
+
+def _is_constant_target(target):
+    return isinstance(target, ast.Name) and CONSTANT_NAME.match(target.id) is not None
+
+
+def _number_value(node):
+    """Returns the numeric value of a literal (including negative literals), or None."""
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.USub, ast.UAdd)):
+        value = _number_value(node.operand)
+        if value is None:
+            return None
+        return -value if isinstance(node.op, ast.USub) else value
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, complex)) and not isinstance(node.value, bool):
+        return node.value
+    return None
+
+
+def _name_words(name):
+    """The specific words of an identifier: MAX_RETRIES -> {"retries"}, retryCount -> {"retry"}."""
+    words = re.sub(r"(?<=[a-z0-9])(?=[A-Z])", "_", name).lower().split("_")
+    return {word for word in words if word and not word.isdigit() and word not in GENERIC_NAME_WORDS}
+
+
+def _statement_words(stmt):
+    """The words of the identifiers in a statement (only the header of a compound statement)."""
+    words = set()
+    for field, value in ast.iter_fields(stmt):
+        if field in STATEMENT_BODIES:
+            continue
+        for child in value if isinstance(value, list) else [value]:
+            for node in ast.walk(child) if isinstance(child, ast.AST) else []:
+                if isinstance(node, ast.Name):
+                    words |= _name_words(node.id)
+                elif isinstance(node, ast.Attribute):
+                    words |= _name_words(node.attr)
+                elif isinstance(node, ast.keyword) and node.arg:
+                    words |= _name_words(node.arg)
+    if isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+        words |= _name_words(stmt.name)
+    return words
+
+
+def _number_contexts(tree):
+    """Maps each node to the class it is in (or None) and the innermost statement containing it."""
+    contexts = {}
+
+    def visit(node, class_name, stmt):
+        if isinstance(node, ast.stmt):
+            stmt = node
+        contexts[id(node)] = (class_name, stmt)
+        inner_class = node.name if isinstance(node, ast.ClassDef) else class_name
+        for field, value in ast.iter_fields(node):
+            for child in value if isinstance(value, list) else [value]:
+                if isinstance(child, ast.AST):
+                    # The header of a class (bases, decorators) is not inside the class
+                    visit(child, inner_class if field == "body" else class_name, stmt)
+
+    visit(tree, None, None)
+    return contexts
+
+
+def find_magic_numbers(code):
+    """
+    Finds numeric literals used directly in expressions instead of named constants.
+    - Ignores 0, 1 and -1
+    - Ignores values assigned to UPPER_CASE constants and default argument values
+    - Mentions a constant that already holds the value if it is in scope (module level, or the class the
+      number is used in) and its name shares a word with the statement, e.g. MAX_RETRIES in `retries < 3`
+
+    Returns:
+        list: Flagged numbers with line, number and message.
+    """
+    tree = ast.parse(code)
+
+    # Track module-level (and class-level) UPPER_CASE constant assignments: value -> [(class or None, name)]
+    constants = {}
+    for scope in [tree] + [node for node in tree.body if isinstance(node, ast.ClassDef)]:
+        class_name = scope.name if isinstance(scope, ast.ClassDef) else None
+        for stmt in scope.body:
+            targets = stmt.targets if isinstance(stmt, ast.Assign) else [stmt.target] if isinstance(stmt, ast.AnnAssign) else []
+            value = _number_value(stmt.value) if targets and stmt.value is not None else None
+            if value is not None:
+                for target in targets:
+                    if _is_constant_target(target):
+                        constants.setdefault(value, []).append((class_name, target.id))
+    contexts = _number_contexts(tree)
+
+    # Literals that define constants or default values are not magic numbers
+    skipped = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Assign) and all(_is_constant_target(t) for t in node.targets):
+            skipped.update(id(child) for child in ast.walk(node.value))
+        elif isinstance(node, ast.AnnAssign) and node.value is not None and _is_constant_target(node.target):
+            skipped.update(id(child) for child in ast.walk(node.value))
+        elif isinstance(node, ast.arguments):
+            for default in node.defaults + [d for d in node.kw_defaults if d is not None]:
+                skipped.update(id(child) for child in ast.walk(default))
+
+    issues = []
+    for node in ast.walk(tree):
+        if id(node) in skipped:
+            continue
+        value = _number_value(node)
+        if value is None:
+            continue
+        # Do not flag the operand of a negative literal a second time
+        if isinstance(node, ast.UnaryOp):
+            skipped.add(id(node.operand))
+        if value in ALLOWED_NUMBERS:
+            continue
+        message = f"Magic number {value} used directly in an expression. Define it as a named constant."
+        class_name, stmt = contexts[id(node)]
+        words = _statement_words(stmt) if stmt is not None else set()
+        for constant_class, name in constants.get(value, []):
+            # Only a constant of the same scope whose name fits the statement, not any constant of equal value
+            if constant_class in (None, class_name) and _name_words(name) & words:
+                display = f"{constant_class}.{name}" if constant_class else name
+                message = f"Magic number {value} used directly in an expression. Use the existing constant '{display}' instead."
+                break
+        issues.append({"line": node.lineno, "number": value, "message": message})
+
+    return sorted(issues, key=lambda issue: issue["line"])
+
 
 def best_practices_analysis(code):
     """Analyzes the code for best practices violations (e.g., naming, magic numbers, clean coding principles)."""
@@ -8,40 +8,34 @@ import pyflakes.reporter
 import pyflakes.api
 from vulture import Vulture
 from langchain.agents import Tool
+from tools.symbol_index import find_unused_symbols
+from tools.complexity_estimator import estimate_complexity
+from tools.performance_rules import find_performance_antipatterns
+from cancellation import raise_if_cancelled
 
-def analyze_ast(code):
+# Run Pyflakes, Pylint and Vulture as cross-checks of the unused-symbol analysis (slow, mostly duplicate findings)
+EFFICIENCY_CROSS_CHECK = os.getenv("EFFICIENCY_CROSS_CHECK", "false").strip().lower() in ("1", "true", "yes")
+
+def analyze_ast(code, tree=None):
     """
-    Uses AST to analyze the code for:
-    - Nested loops (O(n²) complexity)
-    - Recursive functions (potential inefficiency)
-    - Inefficient data structures
+    Estimates the Big-O complexity of every function (see tools.complexity_estimator) from:
+    - The maximum loop nesting (loops over constant ranges do not count, halving loops count as log n)
+    - Nested loops over the same collection
+    - Costly calls inside loops (sorting, linear builtins and methods, other functions of the module)
+    - Recursion (one step at a time, divide and conquer, branching, with or without memoization)
 
     Returns:
-        list: AST-based inefficiency detections.
+        list: Per-function estimates and findings, each with a line number.
     """
-    results = []
     try:
-        tree = ast.parse(code)
+        tree = tree if tree is not None else ast.parse(code)
     except SyntaxError as e:
         return [f"Syntax Error in provided code: {e}"]
 
     try:
-        for node in ast.walk(tree):
-            # Detect nested loops
-            if isinstance(node, (ast.For, ast.While)):
-                nested = any(isinstance(child, (ast.For, ast.While)) for child in ast.walk(node))
-                if nested:
-                    results.append("Nested loops detected (O(n²) complexity). Consider optimizing.")
-
-            # Detect inefficient recursion
-            if isinstance(node, ast.FunctionDef):
-                for child in ast.walk(node):
-                    if isinstance(child, ast.Call) and isinstance(child.func, ast.Name) and child.func.id == node.name:
-                        results.append(f"Recursive function '{node.name}' detected. Consider memoization or iteration.")
+        return estimate_complexity(code, tree=tree)
     except Exception as e:
-        results.append(f"Error analyzing AST: {e}")
-
-    return results
+        return [f"Error analyzing AST: {e}"]
 
 
 def analyze_pyflakes(code):
@@ -81,9 +75,10 @@ def analyze_pyflakes(code):
 
     return issues
 
-def analyze_pylint(code):
+def analyze_pylint(code, cancel_token=None):
     """
     Runs Pylint to analyze code efficiency and captures detected issues.
+    The Pylint subprocess is killed if the cancellation token is cancelled.
 
     Returns:
         dict: Pylint score and detected issues.
@@ -104,23 +99,29 @@ def analyze_pylint(code):
             temp_file.write(code)
 
         # Run Pylint as a subprocess
-        process = subprocess.run(
+        process = subprocess.Popen(
             ["pylint", temp_path, "--output-format=json"],
-            capture_output=True, text=True, check=False
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True
         )
+        unregister = cancel_token.register(process.kill) if cancel_token is not None else (lambda: None)
+        try:
+            stdout, stderr = process.communicate()
+        finally:
+            unregister()
+        raise_if_cancelled(cancel_token)
 
         # Parse Pylint output (if available)
-        if process.stdout.strip():
+        if stdout.strip():
             import json
             try:
-                pylint_output = json.loads(process.stdout)
+                pylint_output = json.loads(stdout)
                 results["issues"] = [issue["message"] for issue in pylint_output if isinstance(issue, dict)]
                 results["score"] = None  # Pylint scores are in separate output formats
             except json.JSONDecodeError:
                 results["issues"].append("Error decoding Pylint JSON output.")
 
-        if process.stderr.strip():
-            results["issues"].append(f"Pylint error: {process.stderr.strip()}")
+        if stderr.strip():
+            results["issues"].append(f"Pylint error: {stderr.strip()}")
 
     except FileNotFoundError:
         results["issues"].append("Pylint could not run due to a missing file or incorrect installation.")
@@ -154,34 +155,57 @@ def analyze_vulture(code):
     return issues
 
 
-def analyze_code_efficiency(code: str):
+def analyze_code_efficiency(code: str, cross_check=None, cancel_token=None, external_uses=()):
     """
     Main function that integrates all the different analysis methods:
-    - AST (for inefficiencies in loops, recursion, and structures)
-    - Pyflakes (for unused variables and redundant operations)
-    - Pylint (for scoring and performance suggestions)
-    - Vulture (for detecting dead/unreachable code)
+    - AST (Big-O estimate per function from loop nesting, calls inside loops and recursion)
+    - Performance rule pack (hot-path anti-patterns, each with the data structure or idiom to use)
+    - Unused-symbol index (for unused imports/variables, unreachable code and dead functions)
+    - Optionally Pyflakes, Pylint and Vulture as cross-checks (EFFICIENCY_CROSS_CHECK)
+
+    Args:
+        external_uses: Names of this module used by other modules of the project, never reported as dead.
 
     Returns:
         dict: Consolidated analysis report.
     """
-    return {
-        "ast_analysis": analyze_ast(code),
-        "pyflakes_issues": analyze_pyflakes(code),
-        "pylint_analysis": analyze_pylint(code),
-        "vulture_issues": analyze_vulture(code),
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        tree = None  # Every analysis reports the syntax error its own way
+    antipatterns = find_performance_antipatterns(code, tree=tree)
+    # A rule finding on a line says more than the estimator's generic note about a costly call in a loop
+    covered = {finding["line"] for finding in antipatterns}
+    results = {
+        "ast_analysis": [finding for finding in analyze_ast(code, tree=tree)
+                         if not (isinstance(finding, dict) and finding["kind"] == "call-in-loop" and finding["line"] in covered)],
+        "performance_antipatterns": antipatterns,
+        "unused_symbols": find_unused_symbols(code, external_uses=external_uses, tree=tree),
     }
 
+    if EFFICIENCY_CROSS_CHECK if cross_check is None else cross_check:
+        raise_if_cancelled(cancel_token)
+        results["cross_check"] = {
+            "pyflakes_issues": analyze_pyflakes(code),
+            "pylint_analysis": analyze_pylint(code, cancel_token=cancel_token),
+            "vulture_issues": analyze_vulture(code),
+        }
+    return results
+
 
 # Define as a LangChain Tool
 code_efficiency_tool = Tool(
     name="Code Efficiency Analysis Tool",
     func=analyze_code_efficiency,
     description="""
-    Analyzes Python code efficiency using AST, Pyflakes, Pylint, and Vulture.
-    - Detects inefficient algorithms and redundant operations.
-    - Flags unnecessary loops, recursion, and suboptimal data structures.
-    - Identifies unused variables and dead code.
-    - Scores efficiency and optimization potential.
+    Analyzes Python code efficiency using AST analysis and a scope/def-use index
+    (optionally cross-checked with Pyflakes, Pylint, and Vulture).
+    - Estimates the Big-O complexity of every function (loop nesting, loops over the same
+      collection, costly calls inside loops, recursion with or without memoization).
+    - Flags hot-path anti-patterns (list membership, index or count in loops, string += in loops,
+      lists used as queues, sorting for a min/max, work repeated in loops) with the data structure
+      or idiom to use instead (set, dict, deque, heapq, str.join, a local variable).
+    - Identifies unused imports, unused variables, unreachable code and dead functions,
+      each with a confidence level (high, medium, low).
     """
 )
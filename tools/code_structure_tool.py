@@ -1,9 +1,97 @@
 import ast
-import radon.complexity as rc
+from functools import cached_property, lru_cache
 import radon.metrics as rm
-from radon.metrics import h_visit
-from radon.complexity import cc_visit
+from radon.metrics import h_visit_ast
+from radon.raw import analyze as raw_analyze
+from radon.visitors import ComplexityVisitor, Class
 from langchain.agents import Tool
+import metrics
+
+
+def _index_blocks(blocks, prefix=""):
+    """Yields (qualified name, block) for radon blocks, including methods, inner classes and closures."""
+    for block in blocks:
+        qualname = prefix + block.name
+        yield qualname, block
+        if isinstance(block, Class):
+            children = list(block.methods) + list(getattr(block, "inner_classes", []))
+        else:
+            children = block.closures
+        yield from _index_blocks(children, qualname + ".")
+
+
+class StructureMetrics:
+    """
+    Radon metrics for one module, computed from a single parsed AST.
+    Complexity is computed once for the whole module and indexed by qualified name and line.
+    Halstead, raw metrics and the Maintainability Index are only computed when first accessed.
+    """
+
+    def __init__(self, code, tree=None):
+        self.code = code
+        self.tree = tree if tree is not None else ast.parse(code)
+
+    @cached_property
+    def _complexity_visitor(self):
+        return ComplexityVisitor.from_ast(self.tree)
+
+    @cached_property
+    def blocks(self):
+        """dict: Qualified name (e.g. 'Class.method.inner') -> radon Function/Class block."""
+        visitor = self._complexity_visitor
+        return dict(_index_blocks(visitor.functions + visitor.classes))
+
+    @cached_property
+    def blocks_by_line(self):
+        """dict: Line number of the definition -> radon Function/Class block."""
+        return {block.lineno: block for block in self.blocks.values()}
+
+    @cached_property
+    def total_complexity(self):
+        return self._complexity_visitor.total_complexity
+
+    @cached_property
+    def halstead(self):
+        return h_visit_ast(self.tree)
+
+    @cached_property
+    def raw(self):
+        return raw_analyze(self.code)
+
+    @cached_property
+    def maintainability_index(self):
+        # Same formula as radon's mi_visit(code, True), reusing the already parsed tree
+        raw = self.raw
+        comments = (raw.comments + raw.multi) / float(raw.sloc) * 100 if raw.sloc != 0 else 0
+        return rm.mi_compute(self.halstead.total.volume, self.total_complexity, raw.lloc, comments)
+
+    def complexity_of(self, qualname):
+        block = self.blocks.get(qualname)
+        return block.complexity if block else None
+
+    def to_dict(self):
+        """Returns all metrics as plain data."""
+        return {
+            "blocks": {name: {"lineno": block.lineno, "endline": block.endline, "complexity": block.complexity}
+                       for name, block in self.blocks.items()},
+            "total_complexity": self.total_complexity,
+            "halstead_metrics": self.halstead.total._asdict(),
+            "maintainability_index": self.maintainability_index,
+            "raw_metrics": self.raw._asdict(),
+        }
+
+
+@lru_cache(maxsize=32)
+def get_structure_metrics(code):
+    """Returns the (cached) StructureMetrics for the code so other agents can reuse them."""
+    return StructureMetrics(code)
+
+
+metrics.CACHE_REQUESTS.add_function(lambda: {
+    ("structure_metrics", "hit"): get_structure_metrics.cache_info().hits,
+    ("structure_metrics", "miss"): get_structure_metrics.cache_info().misses,
+})
+
 
 def analyze_code_structure(code: str):
     """
@@ -18,65 +106,50 @@ def analyze_code_structure(code: str):
     - Nesting depth (high means bad structure)
     - Overall raw metrics: Lines of Code (LOC), comments, blank lines
 
+    The full metrics are available through get_structure_metrics(code).
+
     Returns:
-        dict: Analysis report containing detected issues and suggestions.
+        list: Detected issues and suggestions.
     """
-    results = {
-        "functions": [],
-        "classes": [],
-        "issues": [],
-        "halstead_metrics": {},
-        "maintainability_index": {}
-    }
+    issues = []
 
     try:
-        tree = ast.parse(code)
+        structure_metrics = get_structure_metrics(code)
     except SyntaxError:
         return {"error": "Invalid Python code provided."}
 
-    # Compute Halstead metrics as a replacement for raw metrics
-    halstead_metrics = h_visit(code)
-    results["halstead_metrics"] = halstead_metrics
-    
     # Maintainability Index (MI) for code modularity
-    maintainability_index = rm.mi_visit(code, True)  # True enables additional insights
-    results["maintainability_index"] = maintainability_index
+    maintainability_index = structure_metrics.maintainability_index
     if maintainability_index < 50:  # Maintainability Index ranges from 0-100 (low is bad) - under 65 is considered not easy to maintain
-        results["issues"].append(f"Low maintainability index ({maintainability_index:.2f}). Consider refactoring.")
+        issues.append(f"Low maintainability index ({maintainability_index:.2f}). Consider refactoring.")
 
-    # Analyze functions and classes
-    for node in ast.walk(tree):
-        if isinstance(node, ast.FunctionDef):  # Function analysis
+    # Analyze functions, classes and imports in a single pass over the tree
+    imports = 0
+    for node in ast.walk(structure_metrics.tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):  # Function analysis
             func_name = node.name
             func_length = len(node.body)
-            complexity = cc_visit(node)
-            results["functions"].append({
-                "name": func_name,
-                "length": func_length,
-                "complexity": complexity[0].complexity
-            })
+            block = structure_metrics.blocks_by_line.get(node.lineno)
+            complexity = block.complexity if block else 1
             if func_length > 30:  # Too long
-                results["issues"].append(f"Function '{func_name}' is too long ({func_length} lines). Consider refactoring.")
-            if complexity[0].complexity > 10:  # High complexity
-                results["issues"].append(f"Function '{func_name}' has high complexity ({complexity[0].complexity}). Reduce branching.")
+                issues.append(f"Function '{func_name}' is too long ({func_length} lines). Consider refactoring.")
+            if complexity > 10:  # High complexity
+                issues.append(f"Function '{func_name}' has high complexity ({complexity}). Reduce branching.")
 
         elif isinstance(node, ast.ClassDef):  # Class analysis
             class_name = node.name
-            methods = [n.name for n in node.body if isinstance(n, ast.FunctionDef)]
-            results["classes"].append({
-                "name": class_name,
-                "methods": methods,
-                "num_methods": len(methods)
-            })
+            methods = [n.name for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
             if len(methods) > 10:
-                results["issues"].append(f"Class '{class_name}' has too many methods ({len(methods)}). Consider breaking it down.")
+                issues.append(f"Class '{class_name}' has too many methods ({len(methods)}). Consider breaking it down.")
+
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            imports += 1
 
     # Check module imports (for high coupling)
-    imports = [node for node in ast.walk(tree) if isinstance(node, (ast.Import, ast.ImportFrom))]
-    if len(imports) > 10:
-        results["issues"].append(f"Too many imports ({len(imports)}). This may indicate tight coupling.")
+    if imports > 10:
+        issues.append(f"Too many imports ({imports}). This may indicate tight coupling.")
 
-    return results["issues"]
+    return issues
 
 # Define as a LangChain Tool
 code_structure_tool = Tool(
@@ -2,35 +2,136 @@ from langchain.agents import Tool
 import black
 import difflib
 
-# Define Coding Style Analysis Tool using Black
-def style_analysis(code):
-    """Analyze the code style using Black."""
+
+def format_code(code, line_ranges=None):
+    """
+    Formats the code with Black.
+    If line_ranges is given (list of (start, end) tuples, 1-based and inclusive),
+    only those lines are reformatted using Black's line-range support.
+    """
+    mode = black.Mode()
     try:
-        # Use Black to format the code
-        formatted_code = black.format_str(code, mode=black.Mode())
+        if line_ranges:
+            return black.format_str(code, mode=mode, lines=line_ranges)
+        return black.format_str(code, mode=mode)
     except black.NothingChanged:
-        formatted_code = code  # If no changes are made, return the original code
+        return code  # If no changes are made, return the original code
+
+
+def compute_hunks(original, formatted):
+    """
+    Compares the original code with the formatted code.
+
+    Returns:
+        list: One hunk per changed region with the original line range (1-based, inclusive)
+              and the lines that should replace it.
+    """
+    original_lines = original.splitlines()
+    formatted_lines = formatted.splitlines()
+    matcher = difflib.SequenceMatcher(None, original_lines, formatted_lines, autojunk=False)
+
+    hunks = []
+    for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+        if tag == "equal":
+            continue
+        # Pure insertions have an empty original range, anchor them to the line before
+        start = i1 + 1 if i2 > i1 else i1
+        end = i2 if i2 > i1 else i1
+        hunks.append({
+            "start_line": max(start, 1),
+            "end_line": max(end, 1),
+            "original": original_lines[i1:i2],
+            "replacement": formatted_lines[j1:j2],
+            "message": "Code needs formatting.",
+        })
+    return hunks
+
+
+def _overlaps(hunk, line_ranges):
+    return any(hunk["start_line"] <= end and start <= hunk["end_line"] for start, end in line_ranges)
+
+
+# Define Coding Style Analysis Tool using Black
+def style_analysis(code, line_ranges=None):
+    """
+    Analyze the code style using Black.
+    If line_ranges is given, only those lines are checked.
+    """
+    try:
+        try:
+            formatted_code = format_code(code, line_ranges)
+        except TypeError:
+            # Black versions before 23.11 have no line-range support, format everything instead
+            formatted_code = format_code(code)
     except Exception as e:
         return {"error": f"Error analyzing code style: {str(e)}"}
 
     # Compare the original code with the formatted code to identify issues
     try:
-        diff = difflib.unified_diff(code.splitlines(), formatted_code.splitlines())
-        issues = []
-
-        # Identify lines that need changes
-        for line in diff:
-            if line.startswith('- ') or line.startswith('+ '):
-                issues.append({"line": line.strip(), "message": "Code needs formatting."})
+        issues = compute_hunks(code, formatted_code)
+        if line_ranges:
+            issues = [hunk for hunk in issues if _overlaps(hunk, line_ranges)]
     except Exception as e:
         return {"error": f"Error comparing code formatting: {str(e)}"}
-    
+
     return {"black_analysis": formatted_code, "issues": issues}
 
+
+def changed_line_ranges(previous_code, new_code):
+    """
+    Returns:
+        list: (start, end) line ranges in new_code that differ from previous_code. A deletion
+              is a range over the lines around it, so the code joined there is checked too.
+    """
+    new_total = len(new_code.splitlines())
+    matcher = difflib.SequenceMatcher(None, previous_code.splitlines(), new_code.splitlines(), autojunk=False)
+    ranges = []
+    for tag, _, _, j1, j2 in matcher.get_opcodes():
+        if tag in ("replace", "insert"):
+            ranges.append((j1 + 1, j2))
+        elif tag == "delete" and new_total:
+            ranges.append((max(j1, 1), min(j1 + 1, new_total)))
+    return ranges
+
+
+def _moved_issues(previous_code, new_code, issues):
+    """The issues of previous_code that lie in lines left unchanged in new_code, moved to their new line numbers."""
+    matcher = difflib.SequenceMatcher(None, previous_code.splitlines(), new_code.splitlines(), autojunk=False)
+    moved = []
+    for issue in issues:
+        for i, j, size in matcher.get_matching_blocks():
+            if i + 1 <= issue["start_line"] and issue["end_line"] <= i + size:
+                moved.append({**issue, "start_line": issue["start_line"] + j - i, "end_line": issue["end_line"] + j - i})
+                break
+    return moved
+
+
+def recheck_style(previous_code, new_code, previous_result, check=style_analysis):
+    """
+    Re-checks the style of an edited file: only the edited region is formatted (by check, e.g. the
+    sandboxed tool), the issues of previous_result outside of it are kept at their new line numbers.
+    Without a usable previous result the whole file is checked.
+    """
+    if not isinstance(previous_result, dict) or "issues" not in previous_result:
+        return check(new_code)
+    line_ranges = changed_line_ranges(previous_code, new_code)
+    if not line_ranges:
+        return previous_result
+    result = check(new_code, line_ranges=line_ranges)
+    if not isinstance(result, dict) or "issues" not in result:
+        return result
+    # Issues in the checked ranges come from the new check
+    issues = [hunk for hunk in _moved_issues(previous_code, new_code, previous_result["issues"])
+              if not _overlaps(hunk, line_ranges)]
+    issues += [hunk for hunk in result["issues"] if _overlaps(hunk, line_ranges)]
+    return {"black_analysis": result["black_analysis"], "issues": sorted(issues, key=lambda hunk: hunk["start_line"])}
+
+
 # Create the Tool using Black formatting for analysis
 code_style_tool = Tool(
     name="Coding Style Analysis Tool using Black",
     func=style_analysis,
     description="""Analyzes the code for formatting issues using Black.
-    Compares the original code with the formatted code and identifies what needs to be changed."""
-)
\ No newline at end of file
+    Compares the original code with the formatted code and returns each change as a hunk
+    with the original line range and the formatted replacement lines."""
+)
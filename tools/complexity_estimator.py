@@ -0,0 +1,515 @@
+import ast
+import math
+
+# Complexities are (polynomial degree, log degree) pairs: (2, 0) is O(n²), (1, 1) is O(n log n)
+CONSTANT = (0, 0)
+LOGARITHMIC = (0, 1)
+LINEAR = (1, 0)
+LINEARITHMIC = (1, 1)
+EXPONENTIAL = (math.inf, 0)
+
+# Builtins that go over their (single) argument once
+LINEAR_BUILTINS = {"sum", "min", "max", "any", "all", "list", "tuple", "set", "frozenset", "dict"}
+SORTING_BUILTINS = {"sorted"}
+# Methods that go over their object (list methods)
+LINEAR_METHODS = {"index", "count", "remove", "copy"}
+SORTING_METHODS = {"sort"}
+# Methods that are linear with an argument of 0: list.insert(0, x), list.pop(0)
+FRONT_METHODS = {"insert", "pop"}
+# Decorators that memoize a function
+MEMOIZING_DECORATORS = {"cache", "lru_cache", "cached", "memoize", "memoized"}
+# Iteration helpers that loop over their first argument
+PASS_THROUGH_ITERATORS = {"enumerate", "reversed", "sorted", "iter", "list", "tuple"}
+VIEW_METHODS = {"items", "keys", "values"}
+
+
+def product(a, b):
+    return (a[0] + b[0], a[1] + b[1])
+
+
+def format_complexity(complexity):
+    """Renders a (polynomial degree, log degree) pair, e.g. (2, 1) -> "O(n² log n)"."""
+    degree, log_degree = complexity
+    if degree == math.inf:
+        return "O(2^n)"
+    powers = {1: "n", 2: "n²", 3: "n³"}
+    terms = []
+    if degree:
+        terms.append(powers.get(degree, f"n^{degree:g}"))
+    if log_degree:
+        terms.append("log n" if log_degree == 1 else f"log^{log_degree} n")
+    return f"O({' '.join(terms) or '1'})"
+
+
+def _name(node):
+    """The name of a called function or method, or None."""
+    if isinstance(node, ast.Name):
+        return node.id
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    return None
+
+
+def _is_constant(node):
+    return isinstance(node, ast.Constant) or (
+        isinstance(node, ast.UnaryOp) and isinstance(node.operand, ast.Constant))
+
+
+def _is_halving(node):
+    """x // 2, x >> 1 and similar."""
+    return isinstance(node, ast.BinOp) and isinstance(node.op, (ast.FloorDiv, ast.RShift, ast.Div)) and _is_constant(node.right)
+
+
+def _scales_loop_bound(node):
+    """
+    True if a while loop multiplies or divides a variable of its test by a constant on each pass:
+    n //= 2, i *= 2, or a binary search narrowing lo/hi to a halved mid. Other names halved or
+    doubled in the body (e.g. the terms of a sum) do not shorten the loop.
+    """
+    bound = {child.id for child in ast.walk(node.test) if isinstance(child, ast.Name)}
+    halves = set()
+    for child in ast.walk(node):
+        if (isinstance(child, ast.AugAssign) and isinstance(child.target, ast.Name) and child.target.id in bound
+                and isinstance(child.op, (ast.FloorDiv, ast.RShift, ast.Div, ast.Mult, ast.LShift)) and _is_constant(child.value)):
+            return True
+        if isinstance(child, ast.Assign) and _is_halving(child.value):
+            for target in child.targets:
+                halves |= _bound_names(target)
+    if halves & bound:
+        return True  # e.g. n = n // 2
+    # lo = mid + 1 / hi = mid - 1 with mid = (lo + hi) // 2
+    return any(
+        isinstance(child, ast.Assign) and _bound_names(child.targets[0]) & bound
+        and any(isinstance(name, ast.Name) and name.id in halves for name in ast.walk(child.value))
+        for child in ast.walk(node)
+    )
+
+
+def _is_partition(node):
+    """A part of the input: a comprehension filtering it or a slice up to a halving bound."""
+    return isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp)) or _is_halving(node)
+
+
+def _bound_names(target):
+    return {node.id for node in ast.walk(target) if isinstance(node, ast.Name)}
+
+
+def _lines(lines):
+    """"line 3" or "lines 3, 5" without repetitions."""
+    lines = sorted(set(lines))
+    return f"line{'s' if len(lines) > 1 else ''} {', '.join(map(str, lines))}"
+
+
+def _iterable_key(node):
+    """
+    The collection a loop goes over (enumerate(x) and x.items() go over x), as source text, or None.
+    Index loops over a range are not keyed: looping over all index pairs is the algorithm, not a lookup to replace.
+    """
+    if isinstance(node, ast.Call):
+        name = _name(node.func)
+        if name in PASS_THROUGH_ITERATORS and node.args:
+            return _iterable_key(node.args[0])
+        if isinstance(node.func, ast.Attribute) and name in VIEW_METHODS:
+            return _iterable_key(node.func.value)
+        return None
+    if isinstance(node, (ast.Name, ast.Attribute)):
+        return ast.unparse(node)
+    return None
+
+
+class FunctionInfo:
+    """A function (or the module-level code) with its estimated complexity and the reasons for it."""
+
+    def __init__(self, qualname, node, class_name=None):
+        self.qualname = qualname
+        self.node = node
+        self.class_name = class_name
+        self.complexity = None
+        self.max_depth = 0
+        self.deepest_loops = []  # Lines of the loops of the deepest nest
+        self.notes = []
+        self.findings = []
+
+
+class _Walk:
+    """Cost of the code of one function; collects findings about its loops and calls."""
+
+    def __init__(self, estimator, function):
+        self.estimator = estimator
+        self.function = function
+        self.loops = []  # Enclosing loops that grow with n: (iterable key, line)
+        self.targets = []  # Names bound by the enclosing loops, i.e. the elements of the collections
+        self.exits = CONSTANT  # Cost of the return/raise statements inside loops, which run once
+        self.reported = set()
+
+    # --- Loops ---------------------------------------------------------------------------------
+
+    def _loop_factor(self, node):
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension)):
+            iterable = node.iter
+            if isinstance(iterable, ast.Call) and _name(iterable.func) == "range" and all(_is_constant(a) for a in iterable.args):
+                return CONSTANT
+            if isinstance(iterable, (ast.List, ast.Tuple, ast.Set, ast.Dict, ast.Constant)):
+                return CONSTANT
+            return LINEAR
+        # while loops: counting up to a constant, halving (or doubling) their variable, or linear
+        test = node.test
+        if (isinstance(test, ast.Compare) and all(isinstance(op, (ast.Lt, ast.LtE)) for op in test.ops)
+                and all(_is_constant(c) for c in test.comparators) and not _is_constant(test.left)):
+            if not _scales_loop_bound(node):
+                return CONSTANT
+        return LOGARITHMIC if _scales_loop_bound(node) else LINEAR
+
+    def _enter_loop(self, node, factor):
+        """Pushes a loop that grows with n and reports nested loops over the same collection (once per loop nest)."""
+        iterable = node.iter if hasattr(node, "iter") else None
+        key = _iterable_key(iterable) if iterable is not None else None
+        line = getattr(node, "lineno", None) or iterable.lineno
+        nest = ("nest", self.loops[0][1]) if self.loops else None
+        if factor == LINEAR and key is not None and nest not in self.reported:
+            for outer_key, outer_line in self.loops:
+                if outer_key == key:
+                    self.reported.add(nest)
+                    self.function.findings.append({
+                        "kind": "same-iterable", "name": self.function.qualname, "line": line, "severity": "medium",
+                        "message": f"Nested loops over the same collection `{key}` ({_lines([outer_line, line])}) "
+                                   f"go over all pairs, O(n²). Consider sorting it once, or a set or dict lookup.",
+                    })
+                    break
+        self.loops.append((key, line))
+        depth = len(self.loops)
+        if depth > self.function.max_depth:
+            self.function.max_depth = depth
+            self.function.deepest_loops = [loop_line for _, loop_line in self.loops]
+
+    def _loop(self, node, header_cost, bodies):
+        factor = self._loop_factor(node)
+        if factor != CONSTANT:
+            self._enter_loop(node, factor)
+        targets = _bound_names(node.target) if hasattr(node, "target") else set()
+        self.targets.append(targets)
+        try:
+            inner = max([self.cost(child) for body in bodies for child in body] or [CONSTANT])
+        finally:
+            self.targets.pop()
+            if factor != CONSTANT:
+                self.loops.pop()
+        return max(header_cost, product(factor, inner))
+
+    def _comprehension(self, node):
+        header = CONSTANT
+        pushed = bound = 0
+        factor_total = CONSTANT
+        try:
+            for generator in node.generators:
+                header = max(header, self.cost(generator.iter))
+                factor = self._loop_factor(generator)
+                if factor != CONSTANT:
+                    self._enter_loop(generator, factor)
+                    pushed += 1
+                self.targets.append(_bound_names(generator.target))
+                bound += 1
+                factor_total = product(factor_total, factor)
+            elements = [node.key, node.value] if isinstance(node, ast.DictComp) else [node.elt]
+            conditions = [condition for generator in node.generators for condition in generator.ifs]
+            inner = max(self.cost(child) for child in elements + conditions)
+        finally:
+            for _ in range(pushed):
+                self.loops.pop()
+            del self.targets[len(self.targets) - bound:]
+        return max(header, product(factor_total, inner))
+
+    # --- Calls ---------------------------------------------------------------------------------
+
+    def _call_cost(self, node):
+        """The cost of the call itself (not of its arguments) and a label for it."""
+        name = _name(node.func)
+        if name is None:
+            return CONSTANT, None
+        # What the call works on: the object of a method, the arguments of a function
+        if isinstance(node.func, ast.Attribute):
+            operands = [node.func.value]
+        else:
+            operands = list(node.args) + [keyword.value for keyword in node.keywords]
+        elements = set().union(*self.targets) if self.targets else set()
+        if any(isinstance(child, ast.Name) and child.id in elements for operand in operands for child in ast.walk(operand)):
+            return CONSTANT, None  # Works on one element of a collection the code loops over, not on the collection
+        callee = self.estimator.resolve(node, self.function)
+        if callee is self.function:
+            return CONSTANT, None  # Recursion is estimated separately
+        if callee is not None:
+            return self.estimator.complexity(callee), f"`{callee.qualname}()`"
+        if isinstance(node.func, ast.Name):
+            single = len(node.args) == 1 and not node.keywords and not _is_constant(node.args[0])
+            if name in SORTING_BUILTINS and node.args:
+                return LINEARITHMIC, f"`{name}()`"
+            if name in LINEAR_BUILTINS and single and not isinstance(node.args[0], (ast.List, ast.Tuple)):
+                return LINEAR, f"`{name}()`"
+            return CONSTANT, None
+        if name in SORTING_METHODS:
+            return LINEARITHMIC, f"`.{name}()`"
+        if name in LINEAR_METHODS:
+            return LINEAR, f"`.{name}()`"
+        if name in FRONT_METHODS and node.args and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0:
+            return LINEAR, f"`.{name}(0)`"
+        return CONSTANT, None
+
+    def _call(self, node):
+        own, label = self._call_cost(node)
+        if own > CONSTANT and self.loops and label and node.lineno not in self.reported:
+            self.reported.add(node.lineno)
+            advice = ("Consider a collections.deque." if label.endswith("(0)`")
+                      else "Consider computing it once before the loop, or a data structure that avoids it.")
+            self.function.findings.append({
+                "kind": "call-in-loop", "name": self.function.qualname, "line": node.lineno,
+                "severity": "medium" if own >= LINEAR else "low",
+                "message": f"{label} costs {format_complexity(own)} on every iteration of the loop at line {self.loops[-1][1]}. {advice}",
+            })
+        children = max([self.cost(child) for child in ast.iter_child_nodes(node)] or [CONSTANT])
+        return max(own, children)
+
+    # --- Dispatch ------------------------------------------------------------------------------
+
+    def cost(self, node):
+        """Estimated cost of running a node once."""
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)):
+            return CONSTANT  # Only defined here; estimated as functions of their own
+        if isinstance(node, (ast.For, ast.AsyncFor)):
+            return self._loop(node, self.cost(node.iter), [node.body, node.orelse])
+        if isinstance(node, ast.While):
+            return self._loop(node, self.cost(node.test), [[node.test], node.body, node.orelse])
+        if isinstance(node, (ast.ListComp, ast.SetComp, ast.GeneratorExp, ast.DictComp)):
+            return self._comprehension(node)
+        if isinstance(node, ast.Call):
+            return self._call(node)
+        if isinstance(node, (ast.Return, ast.Raise)) and self.loops:
+            loops, self.loops = self.loops, []  # Runs once, on the way out of the loops
+            try:
+                self.exits = max([self.exits] + [self.cost(child) for child in ast.iter_child_nodes(node)])
+            finally:
+                self.loops = loops
+            return CONSTANT
+        own = CONSTANT
+        if isinstance(node, ast.Subscript) and isinstance(node.slice, ast.Slice) and isinstance(node.ctx, ast.Load):
+            if node.slice.upper is None:
+                own = LINEAR  # Copying the rest of a sequence (items[1:], items[:]); prefixes are usually short
+        return max([own] + [self.cost(child) for child in ast.iter_child_nodes(node)])
+
+
+class ComplexityEstimator:
+    """
+    Static Big-O estimate of every function of a module: loop nesting (loops over constant ranges do not count,
+    halving loops count as log n), costly calls inside loops, calls of other functions of the module and recursion
+    (linear, divide and conquer, branching, with or without memoization).
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.functions = []
+        self.module_functions = {}
+        self.methods = {}  # (class name, method name) -> FunctionInfo
+        self._in_progress = set()
+        self._collect(tree.body, prefix="", class_name=None)
+        module_code = [stmt for stmt in tree.body if not isinstance(stmt, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef))]
+        self.module_code = FunctionInfo("module-level code", ast.Module(body=module_code, type_ignores=[]))
+
+    def _collect(self, body, prefix, class_name):
+        for node in body:
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                info = FunctionInfo(prefix + node.name, node, class_name)
+                self.functions.append(info)
+                if class_name:
+                    self.methods[(class_name, node.name)] = info
+                elif not prefix:
+                    self.module_functions[node.name] = info
+                self._collect(node.body, prefix=f"{prefix}{node.name}.", class_name=None)
+            elif isinstance(node, ast.ClassDef):
+                self._collect(node.body, prefix=f"{prefix}{node.name}.", class_name=node.name)
+            elif isinstance(node, (ast.If, ast.Try, ast.With)):
+                self._collect(getattr(node, "body", []) + getattr(node, "orelse", []), prefix, class_name)
+
+    def resolve(self, call, caller):
+        """The function of this module a call goes to (f() or self.f()), or None."""
+        if isinstance(call.func, ast.Name):
+            nested = next((f for f in self.functions if f.qualname == f"{caller.qualname}.{call.func.id}"), None)
+            return nested or self.module_functions.get(call.func.id)
+        if (isinstance(call.func, ast.Attribute) and isinstance(call.func.value, ast.Name)
+                and call.func.value.id in ("self", "cls") and caller.class_name):
+            return self.methods.get((caller.class_name, call.func.attr))
+        return None
+
+    # --- Recursion -----------------------------------------------------------------------------
+
+    def _self_calls(self, node, function, halving_names):
+        """
+        Recursive calls made by one run of the node: sequential calls add up, branches of an if take the larger,
+        a call inside a loop counts as two (branching).
+
+        Returns:
+            tuple: (calls per run, list of (line, "halving" / "decrement" / "structural"))
+        """
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.Lambda, ast.ClassDef)) and node is not function.node:
+            return 0, []
+        if isinstance(node, ast.If):
+            test, test_sites = self._self_calls(node.test, function, halving_names)
+            body, body_sites = self._block_self_calls(node.body, function, halving_names)
+            orelse, orelse_sites = self._block_self_calls(node.orelse, function, halving_names)
+            return test + max(body, orelse), test_sites + body_sites + orelse_sites
+        if isinstance(node, ast.IfExp):
+            calls = [self._self_calls(child, function, halving_names) for child in (node.test, node.body, node.orelse)]
+            return calls[0][0] + max(calls[1][0], calls[2][0]), calls[0][1] + calls[1][1] + calls[2][1]
+        calls, sites = 0, []
+        if isinstance(node, ast.Call) and self.resolve(node, function) is function:
+            calls, sites = 1, [(node.lineno, self._argument_kind(node, halving_names))]
+        for child in ast.iter_child_nodes(node):
+            child_calls, child_sites = self._self_calls(child, function, halving_names)
+            calls, sites = calls + child_calls, sites + child_sites
+        if isinstance(node, (ast.For, ast.AsyncFor, ast.While, ast.comprehension)) and calls:
+            calls = max(calls, 2)
+        return calls, sites
+
+    def _block_self_calls(self, body, function, halving_names):
+        calls, sites = 0, []
+        for index, stmt in enumerate(body):
+            if isinstance(stmt, ast.If) and not stmt.orelse and stmt.body and isinstance(stmt.body[-1], (ast.Return, ast.Raise)):
+                # if ...: return a; return b -- the rest of the block is the else branch
+                return self._self_calls(ast.If(test=stmt.test, body=stmt.body, orelse=body[index + 1:]), function, halving_names)
+            stmt_calls, stmt_sites = self._self_calls(stmt, function, halving_names)
+            calls, sites = calls + stmt_calls, sites + stmt_sites
+        return calls, sites
+
+    @staticmethod
+    def _argument_kind(call, halving_names):
+        arguments = list(call.args) + [keyword.value for keyword in call.keywords]
+        nodes = [node for argument in arguments for node in ast.walk(argument)]
+        if any(_is_partition(node) or (isinstance(node, ast.Name) and node.id in halving_names) for node in nodes):
+            return "halving"
+        if any(isinstance(node, (ast.BinOp, ast.Slice)) for node in nodes):
+            return "decrement"
+        return "structural"
+
+    @staticmethod
+    def _is_memoized(node):
+        for decorator in node.decorator_list:
+            target = decorator.func if isinstance(decorator, ast.Call) else decorator
+            if _name(target) in MEMOIZING_DECORATORS:
+                return True
+        # A cache checked with `in` and filled by subscript assignment
+        checked = {ast.unparse(comparator) for compare in ast.walk(node) if isinstance(compare, ast.Compare)
+                   and any(isinstance(op, (ast.In, ast.NotIn)) for op in compare.ops) for comparator in compare.comparators}
+        filled = {ast.unparse(target.value) for assign in ast.walk(node) if isinstance(assign, ast.Assign)
+                  for target in assign.targets if isinstance(target, ast.Subscript)}
+        return bool(checked & filled)
+
+    @staticmethod
+    def _halving_names(node):
+        """Names bound to a part of the input (mid = (lo + hi) // 2, left = items[:mid], smaller = [x for ...])."""
+        names = set()
+        assigns = [assign for assign in ast.walk(node) if isinstance(assign, ast.Assign)]
+        for _ in range(2):  # Twice, for names derived from other such names
+            for assign in assigns:
+                if any(_is_partition(child) or (isinstance(child, ast.Name) and child.id in names) for child in ast.walk(assign.value)):
+                    names.update(target.id for target in assign.targets if isinstance(target, ast.Name))
+        return names
+
+    def _recursion(self, function, work):
+        node = function.node
+        halving_names = self._halving_names(node)
+        calls, sites = self._block_self_calls(node.body, function, halving_names)
+        if not calls:
+            return work
+        lines = _lines(line for line, _ in sites)
+        kinds = {kind for _, kind in sites}
+        if kinds == {"halving"}:
+            # Master theorem for T(n) = a·T(n/2) + O(n^d)
+            critical = math.log2(calls) if calls > 1 else 0
+            critical = round(critical, 2)
+            function.notes.append(f"{calls} recursive call{'s' if calls > 1 else ''} on a part of the input ({lines})")
+            if work[0] > critical:
+                return work
+            if work[0] == critical:
+                return (work[0], work[1] + 1)
+            return (critical, 0)
+        if calls > 1 and "decrement" in kinds and not self._is_memoized(node):
+            function.findings.append({
+                "kind": "exponential-recursion", "name": function.qualname, "line": sites[0][0], "severity": "high",
+                "message": f"'{function.qualname}' makes {calls} recursive calls per call on barely smaller inputs "
+                           f"({lines}) without memoization: O(2^n). Consider functools.lru_cache or an iterative version.",
+            })
+            return EXPONENTIAL
+        if self._is_memoized(node):
+            function.notes.append(f"memoized recursion ({lines})")
+        elif kinds == {"structural"}:
+            function.notes.append(f"recursion over the parts of its input ({lines})")
+            loops = [loop for loop in ast.walk(node) if isinstance(loop, (ast.For, ast.AsyncFor, ast.comprehension))]
+            in_loops = {call.lineno for loop in loops for call in ast.walk(loop)
+                        if isinstance(call, ast.Call) and self.resolve(call, function) is function}
+            if all(line in in_loops for line, _ in sites):
+                return max(LINEAR, work)  # A traversal looping over the parts visits each part once
+        else:
+            function.notes.append(f"recursion one step at a time ({lines})")
+        return product(LINEAR, work)
+
+    # --- Estimates -----------------------------------------------------------------------------
+
+    def complexity(self, function):
+        """Estimated complexity of one run of the function, computed once."""
+        if function.complexity is not None:
+            return function.complexity
+        if function.qualname in self._in_progress:
+            return CONSTANT  # Mutual recursion: not estimated
+        self._in_progress.add(function.qualname)
+        try:
+            walk = _Walk(self, function)
+            body = function.node.body
+            work = max([walk.cost(stmt) for stmt in body] + [CONSTANT])
+            work = max(work, walk.exits)
+            if isinstance(function.node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+                work = self._recursion(function, work)
+            function.complexity = work
+        finally:
+            self._in_progress.discard(function.qualname)
+        return function.complexity
+
+    def findings(self):
+        """
+        One summary per function that is not O(1), followed by the findings about its loops, calls and recursion.
+
+        Returns:
+            list: Finding dicts with kind, name, line, severity, complexity and message.
+        """
+        results = []
+        for function in self.functions + [self.module_code]:
+            complexity = self.complexity(function)
+            if complexity > CONSTANT:
+                reasons = list(function.notes)
+                if function.max_depth > 1:
+                    reasons.insert(0, f"loops nested {function.max_depth} deep ({_lines(function.deepest_loops)})")
+                elif function.max_depth == 1:
+                    reasons.insert(0, f"a loop ({_lines(function.deepest_loops)})")
+                node = function.node
+                if isinstance(node, ast.Module):
+                    location = "Module-level code"
+                    line = function.deepest_loops[0] if function.deepest_loops else node.body[0].lineno
+                else:
+                    location, line = f"'{function.qualname}'", node.lineno
+                severity = "high" if complexity == EXPONENTIAL else "medium" if complexity[0] >= 2 else "low"
+                results.append({
+                    "kind": "complexity", "name": function.qualname, "line": line, "severity": severity,
+                    "complexity": format_complexity(complexity),
+                    "message": f"{location}: estimated {format_complexity(complexity)}"
+                               + (f" ({'; '.join(reasons)})." if reasons else "."),
+                })
+            results.extend(function.findings)
+        return results
+
+
+def estimate_complexity(code, tree=None):
+    """
+    Estimates the Big-O complexity of every function of the code.
+
+    Returns:
+        list: Finding dicts (see ComplexityEstimator.findings), sorted by line.
+    """
+    estimator = ComplexityEstimator(tree if tree is not None else ast.parse(code))
+    return sorted(estimator.findings(), key=lambda finding: finding["line"])
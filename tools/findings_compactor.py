@@ -0,0 +1,144 @@
+import os
+import re
+from prompt_accounting import estimate_tokens
+
+# Token budget for the tool output pasted into a report prompt (0 keeps every finding)
+TOOL_OUTPUT_TOKEN_BUDGET = int(os.getenv("TOOL_OUTPUT_TOKEN_BUDGET", "600"))
+
+# Keys whose values are never useful in a prompt (the full Black-formatted file)
+DROPPED_KEYS = {"black_analysis"}
+
+# Keys that name a list of findings rather than where the findings come from
+GENERIC_KEYS = {"issues"}
+
+SEVERITY_RANK = {"high": 0, "medium": 1, "low": 2}
+# Shown for findings without a severity or confidence of their own
+DEFAULT_SEVERITY = "medium"
+
+LINE_PREFIX = re.compile(r"^Line (\d+):\s*")
+# Longest snippet of a style hunk quoted in its finding
+MAX_SNIPPET_CHARS = 60
+
+
+def _snippet(lines):
+    text = lines[0].strip() if lines else ""
+    if not text:
+        return "(blank line)" if lines else "(nothing)"
+    return text if len(text) <= MAX_SNIPPET_CHARS else text[:MAX_SNIPPET_CHARS - 3] + "..."
+
+
+def _severity(item):
+    for key in ("severity", "confidence"):
+        value = str(item.get(key) or "").strip().lower()
+        if value in SEVERITY_RANK:
+            return value
+    return DEFAULT_SEVERITY
+
+
+def _from_dict(item, source):
+    """Turns one finding dict of any of the tools into (source, severity, location, message)."""
+    if "start_line" in item:
+        # Style hunk: quote the first changed line instead of the whole hunk
+        start, end = item["start_line"], item.get("end_line", item["start_line"])
+        location = str(start) if start == end else f"{start}-{end}"
+        message = item.get("message", "")
+        if item.get("original") or item.get("replacement"):
+            message = f"{message} `{_snippet(item.get('original'))}` -> `{_snippet(item.get('replacement'))}`"
+        return source, _severity(item), location, message
+    line = item.get("line", item.get("line_number"))
+    location = str(line) if line else None
+    message = item.get("message") or ", ".join(f"{key}: {value}" for key, value in item.items())
+    if item.get("suggestion"):
+        message = f"{message} Fix: {item['suggestion']}"
+    return source, _severity(item), location, message
+
+
+def _from_text(text, source):
+    match = LINE_PREFIX.match(text)
+    if match:
+        return source, DEFAULT_SEVERITY, match.group(1), text[match.end():]
+    return source, DEFAULT_SEVERITY, None, text
+
+
+def collect_findings(tool_output, source=None):
+    """
+    Flattens the output of any analysis tool into (source, severity, location, message) tuples.
+    Findings in a dict are labelled with their key (e.g. "unused_symbols", "pylint_analysis").
+    """
+    findings = []
+    if isinstance(tool_output, dict):
+        for key, value in tool_output.items():
+            if key in DROPPED_KEYS or value is None or isinstance(value, (int, float)):
+                continue
+            # A generic "issues" list belongs to its parent's source
+            findings.extend(collect_findings(value, source if key in GENERIC_KEYS else key))
+    elif isinstance(tool_output, (list, tuple)):
+        for item in tool_output:
+            if isinstance(item, dict):
+                findings.append(_from_dict(item, source))
+            elif isinstance(item, (list, tuple)):
+                findings.extend(collect_findings(item, source))
+            else:
+                findings.extend(collect_findings(str(item), source))
+    elif tool_output is not None:
+        findings.extend(_from_text(line.strip(), source) for line in str(tool_output).splitlines() if line.strip())
+    return findings
+
+
+def _sort_location(location):
+    return int(location.split("-")[0]) if location and location.split("-")[0].isdigit() else 0
+
+
+def compact_findings(tool_output, token_budget=None):
+    """
+    Compacts tool output before it is pasted into a prompt.
+    - Drops the full Black-formatted code
+    - Deduplicates findings and groups identical messages with all their locations
+    - Ranks the groups by severity, then by number of occurrences
+    - Truncates to the token budget, saying how many findings were left out
+
+    Returns:
+        str: One line per group of findings.
+    """
+    token_budget = TOOL_OUTPUT_TOKEN_BUDGET if token_budget is None else token_budget
+    if isinstance(tool_output, str) and "\n" not in tool_output.strip():
+        return tool_output  # Nothing to compact, e.g. "No syntax issues found."
+
+    groups = {}
+    for source, severity, location, message in collect_findings(tool_output):
+        group = groups.setdefault((source, message), {"severity": severity, "locations": [], "count": 0})
+        if SEVERITY_RANK[severity] < SEVERITY_RANK[group["severity"]]:
+            group["severity"] = severity
+        if location is None or location not in group["locations"]:
+            group["count"] += 1
+        if location is not None and location not in group["locations"]:
+            group["locations"].append(location)
+    if not groups:
+        return "No findings."
+
+    ranked = sorted(
+        groups.items(),
+        key=lambda entry: (SEVERITY_RANK[entry[1]["severity"]], -entry[1]["count"],
+                           _sort_location(entry[1]["locations"][0] if entry[1]["locations"] else None)),
+    )
+
+    lines, used = [], 0
+    for index, ((source, message), group) in enumerate(ranked):
+        line = f"- [{group['severity'].upper()}] "
+        if source:
+            line += f"{source}: "
+        line += message
+        if group["locations"]:
+            locations = sorted(group["locations"], key=_sort_location)
+            line += f" (line{'s' if len(locations) > 1 else ''} {', '.join(locations)})"
+        elif group["count"] > 1:
+            line += f" (x{group['count']})"
+
+        cost = estimate_tokens(line + "\n")
+        if token_budget and lines and used + cost > token_budget:
+            omitted = sum(g["count"] for _, g in ranked[index:])
+            lines.append(f"- ... {omitted} more lower-ranked findings omitted")
+            break
+        lines.append(line)
+        used += cost
+    return "\n".join(lines)
@@ -0,0 +1,402 @@
+import ast
+import gc
+import inspect
+import math
+import os
+import sys
+import time
+import tracemalloc
+from tools.runtime_profiler import (
+    SUBMISSION_FILENAME, CallTooSlow, call_time_limit, consume, fit_complexity, load_submission,
+    run_submission, submission_functions,
+)
+from sandbox import TOOL_MEMORY_LIMIT_MB
+
+# Measure the memory the submitted functions allocate on growing inputs. This executes the submitted code
+# (in a sandbox process), so only enable it for trusted users.
+MEMORY_PROFILE = os.getenv("MEMORY_PROFILE", "false").strip().lower() in ("1", "true", "yes")
+# Input sizes n every function is measured at
+MEMORY_PROFILE_SIZES = [int(size) for size in os.getenv("MEMORY_PROFILE_SIZES", "500,1000,2000,4000,8000").split(",")]
+# Wall-clock limit of the whole measurement, and of a single call (larger sizes are skipped once a call is slower)
+MEMORY_PROFILE_TIMEOUT_SECONDS = float(os.getenv("MEMORY_PROFILE_TIMEOUT_SECONDS", "20"))
+MEMORY_PROFILE_MAX_CALL_SECONDS = float(os.getenv("MEMORY_PROFILE_MAX_CALL_SECONDS", "2"))
+# Larger sizes are skipped once a function's peak would exceed this (extrapolated from the last two sizes), so one
+# function cannot hit the memory limit of the sandbox and lose the measurements of all others
+MEMORY_PROFILE_MAX_PEAK_MB = int(os.getenv("MEMORY_PROFILE_MAX_PEAK_MB", str(TOOL_MEMORY_LIMIT_MB // 4)))
+# Source lines reported per function as the largest allocations
+MEMORY_PROFILE_HOT_LINES = int(os.getenv("MEMORY_PROFILE_HOT_LINES", "3"))
+
+# Fewer measured sizes cannot tell the growth models apart
+MIN_POINTS = 4
+# Peaks below this are noise (a few small objects); they are fitted as this many bytes
+MIN_PEAK_BYTES = 1024
+# While the function runs, the allocations are snapshotted again when it holds this much more than at the last one
+SNAPSHOT_STEP = 1.1
+# Consumers that only iterate their argument once, so a generator expression does the same without the list
+SINGLE_PASS_CONSUMERS = {"sum", "min", "max", "any", "all", "set", "frozenset", "tuple", "dict", "enumerate"}
+# Methods that change their container; a list iterated while they change its source is a needed copy
+MUTATING_METHODS = {"append", "extend", "insert", "remove", "pop", "popitem", "clear", "add", "discard", "update", "setdefault"}
+# Lazy builtins that list() materializes for nothing when the result is only looped over
+LAZY_BUILTINS = {"range", "map", "filter", "zip", "enumerate", "reversed"}
+
+
+def _measure_call(function, make_input, n):
+    """Peak and retained bytes allocated by one call of size n; the input is built before tracing starts."""
+    args = make_input(n)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with call_time_limit(MEMORY_PROFILE_MAX_CALL_SECONDS):
+            start = time.perf_counter()
+            result = consume(function(*args))
+            elapsed = time.perf_counter() - start
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    if elapsed > MEMORY_PROFILE_MAX_CALL_SECONDS:
+        raise CallTooSlow()  # Without timer signals the call runs to the end
+    return peak, current
+
+
+def _predicted_peak(sizes, peaks, n):
+    """The peak of size n extrapolated from the last two measured sizes, assuming at least linear growth."""
+    if len(sizes) < 2:
+        return 0
+    exponent = 1.0
+    if peaks[-2] > 0 and peaks[-1] > peaks[-2]:
+        exponent = max(exponent, math.log(peaks[-1] / peaks[-2]) / math.log(sizes[-1] / sizes[-2]))
+    return peaks[-1] * (n / sizes[-1]) ** exponent
+
+
+def _snapshot_at_peak(function, make_input, n):
+    """
+    Snapshots the allocations of a call of size n at the largest footprint seen while the function runs:
+    checked before each of its lines, at its calls of builtins (whose arguments may be temporary lists) and
+    when it returns or yields. Functions without a code object are snapshotted after the call, which only
+    shows what they return.
+    """
+    target = getattr(inspect.unwrap(function), "__code__", None)
+    taken = {"bytes": 0, "snapshot": None}
+
+    def on_event(frame, event, arg):
+        # Used both as trace function (line events) and as profile function (builtin calls)
+        if frame.f_code is not target:
+            return None
+        if event != "call":
+            current = tracemalloc.get_traced_memory()[0]
+            if taken["snapshot"] is None or current > taken["bytes"] * SNAPSHOT_STEP:
+                taken["bytes"], taken["snapshot"] = current, tracemalloc.take_snapshot()
+        return on_event
+
+    args = make_input(n)
+    gc.collect()
+    tracemalloc.start()
+    try:
+        with call_time_limit(MEMORY_PROFILE_MAX_CALL_SECONDS):
+            if target is not None:
+                sys.settrace(on_event)
+                sys.setprofile(on_event)
+            try:
+                result = consume(function(*args))
+            finally:
+                sys.setprofile(None)
+                sys.settrace(None)
+        if taken["snapshot"] is None:
+            taken["snapshot"] = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    del result
+    return taken["snapshot"]
+
+
+def _hot_lines(snapshot, source_lines):
+    """The submitted lines that allocated the most of a snapshot."""
+    traces = snapshot.filter_traces([tracemalloc.Filter(True, SUBMISSION_FILENAME)])
+    hot = []
+    for statistic in traces.statistics("lineno")[:MEMORY_PROFILE_HOT_LINES]:
+        if statistic.size < MIN_PEAK_BYTES:
+            break  # Sorted by size: the rest is noise too
+        line = statistic.traceback[0].lineno
+        source = source_lines[line - 1].strip() if 0 < line <= len(source_lines) else ""
+        hot.append({"line": line, "bytes": statistic.size, "blocks": statistic.count, "source": source})
+    return hot
+
+
+def measure_memory(code, sizes=None, budget_seconds=None):
+    """
+    Runs in a sandbox process: executes the submitted code and traces the allocations of its top-level functions
+    (see runtime_profiler.measure_runtime for how their inputs are made) with tracemalloc on growing inputs.
+
+    Returns:
+        list: Per function, its peak and retained bytes per size and the growth model fitted to the peaks,
+              with the lines that allocated the most at the largest size, or why it was not measured.
+    """
+    sizes = sorted(sizes or MEMORY_PROFILE_SIZES)
+    deadline = time.monotonic() + (budget_seconds or MEMORY_PROFILE_TIMEOUT_SECONDS)
+    source_lines = code.splitlines()
+    results = []
+    for result, function, make_input in submission_functions(load_submission(code)):
+        results.append(result)
+        result.update(sizes=[], peak_bytes=[], retained_bytes=[])
+        if function is None:
+            continue
+
+        for n in sizes:
+            if time.monotonic() > deadline:
+                result["stopped"] = "the time budget of the measurement ran out"
+                break
+            predicted = _predicted_peak(result["sizes"], result["peak_bytes"], n)
+            if predicted > MEMORY_PROFILE_MAX_PEAK_MB * 1024 * 1024:
+                result["stopped"] = f"n={n} would need about {_format_bytes(predicted)} (limit {MEMORY_PROFILE_MAX_PEAK_MB} MB)"
+                break
+            try:
+                peak, retained = _measure_call(function, make_input, n)
+            except CallTooSlow:
+                result["stopped"] = f"a call took longer than {MEMORY_PROFILE_MAX_CALL_SECONDS:g}s at n={n}"
+                break
+            except MemoryError:
+                result["stopped"] = f"it ran out of memory at n={n}"
+                break
+            except Exception as e:
+                result["stopped"] = f"it raised {type(e).__name__}: {e} at n={n}"
+                break
+            result["sizes"].append(n)
+            result["peak_bytes"].append(peak)
+            result["retained_bytes"].append(retained)
+
+        if result["sizes"] and time.monotonic() < deadline:
+            try:
+                snapshot = _snapshot_at_peak(function, make_input, result["sizes"][-1])
+                result["hot_lines"] = _hot_lines(snapshot, source_lines)
+            except (CallTooSlow, Exception):
+                pass  # The sizes were measured; only the attribution to lines is missing
+        if len(result["sizes"]) >= MIN_POINTS:
+            peaks = [max(peak, MIN_PEAK_BYTES) for peak in result["peak_bytes"]]
+            result["complexity"], _, result["exponent"] = fit_complexity(result["sizes"], peaks)
+    return results
+
+
+def _call_name(node):
+    """The name of a called builtin or method, e.g. "sum" or "readlines"."""
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    return None
+
+
+def _container(node):
+    """The container an iterable is read from, e.g. self.jobs for self.jobs.items(), as a dump to compare by."""
+    while isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute):
+        node = node.func.value
+    return ast.dump(node)
+
+
+def _sources(node):
+    """The containers a list comprehension or list(...) call reads."""
+    if isinstance(node, ast.ListComp):
+        return {_container(generator.iter) for generator in node.generators}
+    if isinstance(node, ast.Call) and node.args:
+        return {_container(argument) for argument in ast.walk(node.args[0]) if isinstance(argument, (ast.Name, ast.Attribute))}
+    return set()
+
+
+def _mutates(statements, sources):
+    """True if the statements change one of the containers (a copy of it is then needed to loop safely)."""
+    for statement in statements:
+        for node in ast.walk(statement):
+            if isinstance(node, (ast.Delete, ast.Assign, ast.AugAssign)):
+                targets = node.targets if isinstance(node, (ast.Delete, ast.Assign)) else [node.target]
+                if any(isinstance(target, ast.Subscript) and ast.dump(target.value) in sources for target in targets):
+                    return True
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute)
+                  and node.func.attr in MUTATING_METHODS and ast.dump(node.func.value) in sources):
+                return True
+    return False
+
+
+def _materialized(node):
+    """Why an expression builds a whole list that is only iterated once, or None."""
+    if isinstance(node, ast.ListComp):
+        return "a list comprehension", "use a generator expression (parentheses instead of brackets)"
+    if isinstance(node, ast.Call) and not node.keywords:
+        name = _call_name(node)
+        if (isinstance(node.func, ast.Name) and name == "list" and len(node.args) == 1
+                and isinstance(node.args[0], ast.Call) and isinstance(node.args[0].func, ast.Name)
+                and node.args[0].func.id in LAZY_BUILTINS):
+            return f"list({node.args[0].func.id}(...))", f"iterate over {node.args[0].func.id}(...) directly"
+        if isinstance(node.func, ast.Attribute) and name == "readlines" and not node.args:
+            return ".readlines()", "iterate over the file object, which reads one line at a time"
+    return None
+
+
+class MaterializedLists(ast.NodeVisitor):
+    """Finds lists built in full only to be iterated once, where a generator would hold one item at a time."""
+
+    def __init__(self):
+        self.findings = []
+        self.function = None
+
+    def _flag(self, node, consumer, materialized):
+        what, suggestion = materialized
+        self.findings.append({
+            "line": node.lineno,
+            "severity": "low",
+            "function": self.function,
+            "message": f"{what} is built in full only to be consumed once by {consumer}.",
+            "suggestion": suggestion,
+        })
+
+    def visit_FunctionDef(self, node):
+        outer, self.function = self.function, self.function or node.name
+        self._single_use_names(node)
+        self.generic_visit(node)
+        self.function = outer
+
+    visit_AsyncFunctionDef = visit_FunctionDef
+
+    def visit_For(self, node):
+        materialized = _materialized(node.iter)
+        if materialized and not _mutates(node.body, _sources(node.iter)):
+            self._flag(node.iter, "a for loop", materialized)
+        self.generic_visit(node)
+
+    def visit_comprehension(self, node):
+        materialized = _materialized(node.iter)
+        if materialized:
+            self._flag(node.iter, "a comprehension", materialized)
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        name = _call_name(node)
+        if isinstance(node.func, ast.Name) and name in SINGLE_PASS_CONSUMERS and len(node.args) == 1 and not node.keywords:
+            if isinstance(node.args[0], ast.ListComp):
+                self._flag(node.args[0], f"{name}()", _materialized(node.args[0]))
+        self.generic_visit(node)
+
+    def _single_use_names(self, function):
+        """Flags local lists assigned a comprehension and only iterated once afterwards, by a loop or a consumer."""
+        assigned, loads = {}, {}
+        for node in ast.walk(function):
+            if isinstance(node, ast.Assign) and len(node.targets) == 1 and isinstance(node.targets[0], ast.Name):
+                name = node.targets[0].id
+                assigned[name] = node if name not in assigned else None  # Rebound names are left alone
+            elif isinstance(node, (ast.AugAssign, ast.AnnAssign)) and isinstance(node.target, ast.Name):
+                assigned[node.target.id] = None
+            elif isinstance(node, ast.Name) and isinstance(node.ctx, ast.Load):
+                loads.setdefault(node.id, []).append(node)
+            elif isinstance(node, (ast.Global, ast.Nonlocal)):
+                for name in node.names:
+                    assigned[name] = None
+
+        consumers = {}
+        for node in ast.walk(function):
+            if isinstance(node, (ast.For, ast.comprehension)) and isinstance(node.iter, ast.Name):
+                consumers[id(node.iter)] = "a for loop" if isinstance(node, ast.For) else "a comprehension"
+            elif (isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in SINGLE_PASS_CONSUMERS
+                  and len(node.args) == 1 and not node.keywords and isinstance(node.args[0], ast.Name)):
+                consumers[id(node.args[0])] = f"{node.func.id}()"
+
+        for name, assignment in assigned.items():
+            if assignment is None or not isinstance(assignment.value, ast.ListComp):
+                continue
+            uses = loads.get(name, [])
+            # A generator would be exhausted after the first pass of a loop, and see changes made to its source
+            if (len(uses) == 1 and id(uses[0]) in consumers and not _in_loop_body(function, uses[0])
+                    and not _mutates(function.body, _sources(assignment.value))):
+                what, suggestion = _materialized(assignment.value)
+                self._flag(assignment.value, consumers[id(uses[0])],
+                           (f"'{name}' ({what})", f"make '{name}' a generator expression"))
+
+
+def _in_loop_body(function, target):
+    """True if a node is inside a loop body."""
+    for node in ast.walk(function):
+        if isinstance(node, (ast.For, ast.While, ast.AsyncFor)):
+            for statement in node.body:
+                if any(child is target for child in ast.walk(statement)):
+                    return True
+    return False
+
+
+def find_materialized_lists(code, tree=None):
+    """
+    Finds lists built in full where a generator would do, e.g. sum([x * x for x in items]).
+
+    Returns:
+        list: Findings with line, severity, message and suggestion, sorted by line.
+    """
+    visitor = MaterializedLists()
+    visitor.visit(tree or ast.parse(code))
+    unique = {(finding["line"], finding["message"]): finding for finding in visitor.findings}
+    return sorted(unique.values(), key=lambda finding: finding["line"])
+
+
+def profile_memory(code, cancel_token=None, sizes=None):
+    """
+    Measures the memory footprint of the functions of the submitted code on growing inputs, in a sandbox process,
+    and finds lists built in full where a generator would do. Does nothing unless MEMORY_PROFILE is enabled.
+
+    Returns:
+        dict: "functions" (see measure_memory, or a limit finding if the sandbox stopped the measurement) and
+              "materialized_lists" (see find_materialized_lists); empty if it is disabled or the code does not parse.
+    """
+    if not MEMORY_PROFILE:
+        return {"functions": [], "materialized_lists": []}
+    try:
+        tree = ast.parse(code)
+    except SyntaxError:
+        return {"functions": [], "materialized_lists": []}
+    functions = run_submission(measure_memory, code, cancel_token=cancel_token, sizes=sizes,
+                               budget_seconds=MEMORY_PROFILE_TIMEOUT_SECONDS)
+    return {"functions": functions, "materialized_lists": find_materialized_lists(code, tree)}
+
+
+def _format_bytes(size):
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    if size >= 1024:
+        return f"{size / 1024:.1f} KB"
+    return f"{size} B"
+
+
+def format_memory_profile(profile):
+    """
+    Renders the memory measurements as Markdown lines for a report prompt.
+
+    Returns:
+        str: One line per function (with its hot lines below it) and per materialized list, or "" if there is nothing.
+    """
+    lines, peaks = [], {}
+    for result in profile["functions"]:
+        if "function" not in result:
+            lines.append(f"- {result.get('message', result)}")
+            continue
+        label = f"`{result['function']}({result.get('inputs', '')})`"
+        if "skipped" in result:
+            lines.append(f"- {label}: not measured, {result['skipped']}.")
+            continue
+        curve = ", ".join(f"n={n}: {_format_bytes(peak)}" for n, peak in zip(result["sizes"], result["peak_bytes"]))
+        if "complexity" in result:
+            line = f"- {label}: peak memory grows {result['complexity']} (growth exponent {result['exponent']:.2f}; {curve})"
+        else:
+            line = f"- {label}: too few sizes measured to estimate its memory growth ({curve or 'none'})"
+        if result["sizes"]:
+            n, peak, retained = result["sizes"][-1], result["peak_bytes"][-1], result["retained_bytes"][-1]
+            peaks[result["function"]] = (n, peak)
+            line += f"; {_format_bytes(retained)} still allocated after the call at n={n}"
+        if "stopped" in result:
+            line += f"; stopped because {result['stopped']}"
+        lines.append(line + ".")
+        for hot in result.get("hot_lines", []):
+            lines.append(f"  - line {hot['line']} allocated {_format_bytes(hot['bytes'])} in {hot['blocks']} blocks "
+                         f"at n={result['sizes'][-1]}: `{hot['source']}`")
+
+    for finding in profile["materialized_lists"]:
+        line = f"- Line {finding['line']}: {finding['message']} Fix: {finding['suggestion']}."
+        if finding["function"] in peaks:
+            n, peak = peaks[finding["function"]]
+            line += f" (`{finding['function']}` peaked at {_format_bytes(peak)} at n={n}.)"
+        lines.append(line)
+    return "\n".join(lines)
@@ -0,0 +1,317 @@
+import ast
+
+# Builtins whose result only depends on their arguments and that go over them: recomputing them in a loop
+# with unchanged arguments is wasted work
+PURE_LINEAR_BUILTINS = {"sorted", "sum", "min", "max", "set", "list", "tuple", "dict", "frozenset", "any", "all"}
+# Methods that change the object they are called on
+MUTATING_METHODS = {"append", "extend", "insert", "pop", "remove", "clear", "sort", "reverse", "add", "discard",
+                    "update", "setdefault", "popitem", "appendleft", "popleft", "extendleft", "rotate"}
+# Calls that build a list
+LIST_BUILDERS = {"list", "sorted"}
+# Attribute chains on these are not worth a local variable
+SKIPPED_LOOKUP_BASES = {"self", "cls"}
+COMPREHENSIONS = (ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp)
+
+
+def _finding(rule, line, severity, message, structure, suggestion):
+    return {"rule": rule, "line": line, "severity": severity, "message": message,
+            "structure": structure, "suggestion": suggestion}
+
+
+def _names(node):
+    return {child.id for child in ast.walk(node) if isinstance(child, ast.Name)}
+
+
+def _base_name(node):
+    """The variable an expression like x, x.attr or x[i] starts from, or None."""
+    while isinstance(node, (ast.Attribute, ast.Subscript)):
+        node = node.value
+    return node.id if isinstance(node, ast.Name) else None
+
+
+def _is_list_expression(node):
+    if isinstance(node, (ast.List, ast.ListComp)):
+        return True
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id in LIST_BUILDERS
+
+
+def _is_string_expression(node):
+    if isinstance(node, ast.JoinedStr) or (isinstance(node, ast.Constant) and isinstance(node.value, str)):
+        return True
+    return isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "str"
+
+
+def _value_kind(node):
+    if _is_list_expression(node):
+        return "list"
+    return "str" if _is_string_expression(node) else "other"
+
+
+def _loop_body(loop):
+    """The code a loop runs on every iteration."""
+    if isinstance(loop, ast.While):
+        return [loop.test] + loop.body
+    if isinstance(loop, COMPREHENSIONS):
+        elements = [loop.key, loop.value] if isinstance(loop, ast.DictComp) else [loop.elt]
+        return elements + [condition for generator in loop.generators for condition in generator.ifs]
+    return loop.body
+
+
+def _annotation_name(annotation):
+    if annotation is None:
+        return None
+    if isinstance(annotation, ast.Subscript):
+        annotation = annotation.value
+    return annotation.id if isinstance(annotation, ast.Name) else getattr(annotation, "attr", None)
+
+
+def _rebound_in(loop):
+    """Names assigned afresh inside a loop: they start over on every iteration instead of growing across them."""
+    return {target.id for node in ast.walk(loop) if isinstance(node, (ast.Assign, ast.AnnAssign))
+            for target in (node.targets if isinstance(node, ast.Assign) else [node.target]) if isinstance(target, ast.Name)}
+
+
+def _changed_in(loop):
+    """Names (re)bound or mutated inside a loop, including its target."""
+    changed = set()
+    for node in ast.walk(loop):
+        if isinstance(node, ast.Name) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            changed.add(node.id)
+        elif isinstance(node, (ast.Subscript, ast.Attribute)) and isinstance(node.ctx, (ast.Store, ast.Del)):
+            changed.add(_base_name(node))
+        elif isinstance(node, ast.AugAssign):
+            changed.add(_base_name(node.target))
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Attribute) and node.func.attr in MUTATING_METHODS:
+            changed.add(_base_name(node.func.value))
+    changed.discard(None)
+    return changed
+
+
+class PerformanceRules(ast.NodeVisitor):
+    """
+    Hot-path anti-patterns of student code, each reported with the data structure or idiom that avoids it.
+    Loops are tracked per function, so a nested function does not inherit the loops around its definition.
+    """
+
+    def __init__(self, tree):
+        self.findings = []
+        self._loops = []  # Enclosing loops of the current function
+        self._kinds = [{}]  # Per scope: name -> "list" / "str" / "other" / "mixed" (what the name is bound to)
+        self._reported = set()
+        self._modules = {alias.asname or alias.name.split(".")[0]
+                         for node in ast.walk(tree) if isinstance(node, ast.Import) for alias in node.names}
+        self._collect_kinds(tree, self._kinds[-1])
+        self.visit(tree)
+
+    # --- Bookkeeping ---------------------------------------------------------------------------
+
+    def _add(self, rule, node, severity, message, structure, suggestion):
+        key = (rule, node.lineno, node.col_offset)
+        if key not in self._reported:
+            self._reported.add(key)
+            self.findings.append(_finding(rule, node.lineno, severity, message, structure, suggestion))
+
+    @staticmethod
+    def _collect_kinds(scope, kinds):
+        """Records which names of a scope always hold lists or strings (by their assignments and annotations)."""
+        def bind(name, kind):
+            kinds[name] = kind if kinds.get(name, kind) == kind else "mixed"
+
+        if isinstance(scope, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            for argument in scope.args.args + scope.args.kwonlyargs + scope.args.posonlyargs:
+                annotation = _annotation_name(argument.annotation)
+                bind(argument.arg, "list" if annotation in ("list", "List") else "str" if annotation == "str" else "other")
+        nodes = list(ast.iter_child_nodes(scope))
+        while nodes:
+            node = nodes.pop()
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Lambda)):
+                continue
+            if isinstance(node, ast.Assign):
+                for target in node.targets:
+                    if isinstance(target, ast.Name):
+                        bind(target.id, _value_kind(node.value))
+                    else:
+                        for name in _names(target):
+                            bind(name, "other")
+            elif isinstance(node, ast.AnnAssign) and isinstance(node.target, ast.Name):
+                annotation = _annotation_name(node.annotation)
+                bind(node.target.id, "list" if annotation in ("list", "List") else "str" if annotation == "str" else "other")
+            elif isinstance(node, (ast.For, ast.AsyncFor, ast.comprehension, ast.withitem, ast.NamedExpr)):
+                target = getattr(node, "target", None) or getattr(node, "optional_vars", None)
+                for name in _names(target) if target is not None else ():
+                    bind(name, "other")
+            nodes.extend(ast.iter_child_nodes(node))
+
+    def _kind(self, node):
+        if _is_list_expression(node):
+            return "list"
+        if isinstance(node, ast.Name):
+            kinds = self._kinds[-1] if node.id in self._kinds[-1] else self._kinds[0]
+            return kinds.get(node.id)
+        return None
+
+    def _visit_function(self, node):
+        kinds = {}
+        self._collect_kinds(node, kinds)
+        outer_loops, self._loops = self._loops, []
+        self._kinds.append(kinds)
+        try:
+            self.generic_visit(node)
+        finally:
+            self._kinds.pop()
+            self._loops = outer_loops
+
+    visit_FunctionDef = _visit_function
+    visit_AsyncFunctionDef = _visit_function
+
+    def _visit_loop(self, node):
+        self._loops.append(node)
+        try:
+            self.generic_visit(node)
+        finally:
+            self._loops.pop()
+        self._check_invariants(node)
+        self._check_lookups(node)
+
+    visit_For = _visit_loop
+    visit_AsyncFor = _visit_loop
+    visit_While = _visit_loop
+    visit_ListComp = _visit_loop
+    visit_SetComp = _visit_loop
+    visit_DictComp = _visit_loop
+    visit_GeneratorExp = _visit_loop
+
+    def _in_loop_body(self, node):
+        """True if the node runs on every iteration of the innermost loop (not only in its header)."""
+        if not self._loops:
+            return False
+        return any(node is child for statement in _loop_body(self._loops[-1]) for child in ast.walk(statement))
+
+    # --- Rules ---------------------------------------------------------------------------------
+
+    def visit_Compare(self, node):
+        if self._in_loop_body(node):
+            for op, container in zip(node.ops, node.comparators):
+                if isinstance(op, (ast.In, ast.NotIn)) and self._kind(container) == "list":
+                    name = ast.unparse(container)
+                    if isinstance(container, ast.Name) and container.id in _changed_in(self._loops[-1]):
+                        fix = f"Make `{name}` a set (add() instead of append()), so each lookup is O(1)."
+                    else:
+                        fix = f"Build a set from `{name}` once before the loop and test membership against it (O(1) per lookup)."
+                    self._add("membership-in-list", node, "medium",
+                              f"`{ast.unparse(node)}` searches the list `{name}` on every iteration of the loop at line {self._loops[-1].lineno} (O(n) per lookup).",
+                              "set", fix)
+        self.generic_visit(node)
+
+    def visit_AugAssign(self, node):
+        if (self._loops and isinstance(node.op, ast.Add) and isinstance(node.target, ast.Name)
+                and (self._kind(node.target) == "str" or _is_string_expression(node.value))
+                and node.target.id not in _rebound_in(self._loops[-1])):
+            name = node.target.id
+            self._add("string-concatenation-in-loop", node, "medium",
+                      f"`{name} += ...` builds a string piece by piece in the loop at line {self._loops[-1].lineno}, copying it every time (O(n²) overall).",
+                      "str.join", "Append the pieces to a list and `''.join(...)` them once after the loop.")
+        self.generic_visit(node)
+
+    def visit_Call(self, node):
+        func = node.func
+        if isinstance(func, ast.Attribute):
+            first_is_zero = bool(node.args) and isinstance(node.args[0], ast.Constant) and node.args[0].value == 0
+            owner = ast.unparse(func.value)
+            if (func.attr in ("pop", "insert") and first_is_zero and (func.attr == "insert" or len(node.args) == 1)
+                    and self._loops and _base_name(func.value) not in _rebound_in(self._loops[-1])):
+                operation = "popleft()" if func.attr == "pop" else "appendleft(...)"
+                self._add("list-as-queue", node, "medium",
+                          f"`{ast.unparse(node)}` shifts every element of `{owner}` on every iteration of the loop at line {self._loops[-1].lineno} (O(n) each).",
+                          "deque", f"Use a `collections.deque` for `{owner}` and its `{operation}` (O(1)).")
+            elif func.attr in ("index", "count") and self._in_loop_body(node) and self._kind(func.value) == "list":
+                structure = "dict" if func.attr == "index" else "Counter"
+                fix = (f"Build a dict from value to position of `{owner}` once before the loop." if func.attr == "index"
+                       else f"Count the values of `{owner}` once with `collections.Counter` before the loop.")
+                self._add(f"list-{func.attr}-in-loop", node, "medium",
+                          f"`{ast.unparse(node)}` scans the list `{owner}` on every iteration of the loop at line {self._loops[-1].lineno} (O(n²) overall).",
+                          structure, fix)
+        self.generic_visit(node)
+
+    def visit_Subscript(self, node):
+        value = node.value
+        if isinstance(value, ast.Call) and isinstance(value.func, ast.Name) and value.func.id == "sorted" and value.args:
+            reverse = any(keyword.arg == "reverse" and isinstance(keyword.value, ast.Constant) and keyword.value.value
+                          for keyword in value.keywords)
+            key = [keyword for keyword in value.keywords if keyword.arg == "key"]
+            key_argument = f", key={ast.unparse(key[0].value)}" if key else ""
+            items = ast.unparse(value.args[0])
+            index = node.slice
+            if isinstance(index, (ast.Constant, ast.UnaryOp)) and ast.unparse(index) in ("0", "-1"):
+                smallest = (ast.unparse(index) == "0") != reverse
+                function = "min" if smallest else "max"
+                self._add("sorted-for-min-max", node, "medium",
+                          f"`{ast.unparse(node)}` sorts all of `{items}` (O(n log n)) to take one element.",
+                          f"{function}()", f"Use `{function}({items}{key_argument})` (O(n)).")
+            elif isinstance(index, ast.Slice) and index.step is None and (index.lower is None) != (index.upper is None):
+                smallest = (index.lower is None) != reverse
+                function = "nsmallest" if smallest else "nlargest"
+                count = ast.unparse(index.upper if index.lower is None else index.lower).lstrip("-")
+                self._add("sorted-for-top-k", node, "low",
+                          f"`{ast.unparse(node)}` sorts all of `{items}` to take {count} elements.",
+                          "heapq", f"Use `heapq.{function}({count}, {items}{key_argument})` (O(n log k)).")
+        self.generic_visit(node)
+
+    def _check_invariants(self, loop):
+        """Calls that go over data the loop never changes, recomputed on every iteration."""
+        changed = _changed_in(loop)
+        # Calls on the way out of the loop (or in functions defined in it) do not run on every iteration
+        skipped = {id(child) for node in ast.walk(loop) if isinstance(node, (ast.Return, ast.Raise, ast.FunctionDef, ast.Lambda))
+                   for child in ast.walk(node)}
+        for statement in _loop_body(loop):
+            for node in ast.walk(statement):
+                if id(node) in skipped or not (isinstance(node, ast.Call) and isinstance(node.func, ast.Name)):
+                    continue
+                # Only plain variables: attributes and items may be changed by any call in the loop
+                if any(not isinstance(argument, (ast.Name, ast.Constant)) for argument in node.args) or not node.args:
+                    continue
+                if node.func.id == "len" and not (_names(node) & changed):
+                    self._add("repeated-len", node, "low",
+                              f"`{ast.unparse(node)}` is recomputed on every iteration of the loop at line {loop.lineno}, but `{ast.unparse(node.args[0])}` does not change in it.",
+                              "local variable", f"Store `{ast.unparse(node)}` in a variable before the loop.")
+                elif node.func.id in PURE_LINEAR_BUILTINS and not (_names(node) & changed):
+                    self._add("loop-invariant-computation", node, "medium",
+                              f"`{ast.unparse(node)}` goes over data the loop at line {loop.lineno} never changes, on every iteration.",
+                              "local variable", f"Compute `{ast.unparse(node)}` once before the loop.")
+
+    def _check_lookups(self, loop):
+        """Dotted lookups (module functions, nested attributes) repeated in the innermost loop of a nest."""
+        body = _loop_body(loop)
+        if not self._loops or any(isinstance(node, (ast.For, ast.AsyncFor, ast.While) + COMPREHENSIONS) for statement in body for node in ast.walk(statement)):
+            return
+        changed = _changed_in(loop)
+        lookups = {}
+        for statement in body:
+            for node in ast.walk(statement):
+                if not (isinstance(node, ast.Attribute) and isinstance(node.ctx, ast.Load)):
+                    continue
+                base = _base_name(node)
+                chained = isinstance(node.value, ast.Attribute) and base not in SKIPPED_LOOKUP_BASES
+                module_function = isinstance(node.value, ast.Name) and base in self._modules
+                if (chained or module_function) and base not in changed:
+                    lookups.setdefault(ast.unparse(node), node)
+        for text, node in lookups.items():
+            self._add("repeated-attribute-lookup", node, "low",
+                      f"`{text}` is looked up again on every iteration of the inner loop at line {loop.lineno}.",
+                      "local variable", f"Bind `{text}` to a local variable before the loop.")
+
+
+def find_performance_antipatterns(code, tree=None):
+    """
+    Runs the performance rule pack: list membership, index and count in loops, string concatenation in loops,
+    lists used as queues, sorting for a minimum, maximum or top k, and work repeated in loops.
+
+    Returns:
+        list: Findings sorted by line, each with rule, line, severity, message, structure (the data structure or
+              idiom to use) and suggestion. Empty if the code does not parse.
+    """
+    try:
+        rules = PerformanceRules(tree if tree is not None else ast.parse(code))
+    except SyntaxError:
+        return []
+    return sorted(rules.findings, key=lambda finding: finding["line"])
@@ -0,0 +1,388 @@
+import ast
+import collections.abc
+import gc
+import inspect
+import math
+import os
+import random
+import signal
+import string
+import sys
+import threading
+import time
+import types
+import typing
+from contextlib import contextmanager
+import numpy as np
+from sandbox import SandboxPool, TOOL_MEMORY_LIMIT_MB
+
+# Time the submitted functions on growing inputs. This executes the submitted code (in a sandbox process),
+# so only enable it for trusted users.
+RUNTIME_PROFILE = os.getenv("RUNTIME_PROFILE", "false").strip().lower() in ("1", "true", "yes")
+# Input sizes n every function is timed at
+RUNTIME_PROFILE_SIZES = [int(size) for size in os.getenv("RUNTIME_PROFILE_SIZES", "16,32,64,128,256,512,1024,2048,4096").split(",")]
+# Wall-clock limit of the whole measurement, and of a single call (larger sizes are skipped once a call is slower)
+RUNTIME_PROFILE_TIMEOUT_SECONDS = float(os.getenv("RUNTIME_PROFILE_TIMEOUT_SECONDS", "20"))
+RUNTIME_PROFILE_MAX_CALL_SECONDS = float(os.getenv("RUNTIME_PROFILE_MAX_CALL_SECONDS", "0.5"))
+
+# Calls per size are repeated until they took this long together (or this size took MAX_SIZE_SECONDS
+# including the generation of the inputs); the fastest call is kept
+MIN_MEASURE_SECONDS = 0.02
+MAX_SIZE_SECONDS = 0.1
+MAX_CALLS_PER_SIZE = 1000
+# Fewer measured sizes cannot tell the growth models apart
+MIN_POINTS = 4
+# A simpler model is preferred while its relative fit error is at most this much worse than the best one
+FIT_TOLERANCE = 0.05
+# Submitted code may define input_for_<function>(n) returning the arguments of one call of size n
+GENERATOR_PREFIX = "input_for_"
+# File name of the submitted code in tracebacks (and tracemalloc traces) of the sandbox process
+SUBMISSION_FILENAME = "<submitted code>"
+
+COMPLEXITY_MODELS = {
+    "O(1)": None,
+    "O(log n)": np.log2,
+    "O(n)": lambda n: n,
+    "O(n log n)": lambda n: n * np.log2(n),
+    "O(n²)": lambda n: n ** 2,
+}
+
+
+class CallTooSlow(BaseException):
+    """Raised from the timer signal; not an Exception, so the submitted code cannot catch it by accident."""
+
+
+def _raise_too_slow(signum, frame):
+    raise CallTooSlow()
+
+
+@contextmanager
+def call_time_limit(seconds=None):
+    """Raises CallTooSlow in the block once it ran longer than seconds (where timer signals are available)."""
+    seconds = RUNTIME_PROFILE_MAX_CALL_SECONDS if seconds is None else seconds
+    if hasattr(signal, "setitimer"):
+        signal.setitimer(signal.ITIMER_REAL, seconds)
+    try:
+        yield
+    finally:
+        if hasattr(signal, "setitimer"):
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+def _next_prime(n):
+    """The smallest prime >= n. Used for int arguments, so even or composite sizes do not hit shortcuts (e.g. in is_prime)."""
+    candidate = max(n, 2)
+    while any(candidate % divisor == 0 for divisor in range(2, math.isqrt(candidate) + 1)):
+        candidate += 1
+    return candidate
+
+
+def _scalar(hint, rng, n):
+    """A single element of a generated container."""
+    if hint is int:
+        return rng.randrange(max(n, 1))
+    if hint is float:
+        return rng.random() * n
+    if hint is bool:
+        return rng.random() < 0.5
+    if hint is str:
+        return "".join(rng.choices(string.ascii_lowercase, k=8))
+    # Nested containers hold about sqrt(n) elements, so the whole input stays of size about n
+    return _value(hint, rng, math.isqrt(n) or 1)
+
+
+def _value(hint, rng, n):
+    """
+    Generates an argument of size n from its type hint.
+
+    Raises:
+        TypeError: If no input can be generated for the hint.
+    """
+    origin, args = typing.get_origin(hint), typing.get_args(hint)
+    if origin in (typing.Union, types.UnionType):
+        return _value(next(arg for arg in args if arg is not type(None)), rng, n)
+    if hint is int:
+        return _next_prime(n)
+    if hint is float:
+        return float(n)
+    if hint is str:
+        return "".join(rng.choices(string.ascii_lowercase, k=n))
+    if hint is bytes:
+        return rng.randbytes(n)
+    container = origin or hint
+    element = args[0] if args else int
+    if container in (list, collections.abc.Sequence, collections.abc.MutableSequence,
+                     collections.abc.Iterable, collections.abc.Collection):
+        return [_scalar(element, rng, n) for _ in range(n)]
+    if container is tuple:
+        if args and args[-1] is not Ellipsis:
+            return tuple(_scalar(arg, rng, n) for arg in args)
+        return tuple(_scalar(element, rng, n) for _ in range(n))
+    if container in (set, frozenset):
+        values = rng.sample(range(4 * n), n) if element is int else [_scalar(element, rng, n) for _ in range(n)]
+        return container(values)
+    if container in (dict, collections.abc.Mapping, collections.abc.MutableMapping):
+        key, value = args if len(args) == 2 else (int, int)
+        keys = [f"k{index}" for index in range(n)] if key is str else rng.sample(range(4 * n), n)
+        return {k: _scalar(value, rng, n) for k in keys}
+    raise TypeError(f"no input can be generated for the type hint {getattr(hint, '__name__', hint)}")
+
+
+def _hint_name(hint):
+    if isinstance(hint, type) and not typing.get_args(hint):
+        return hint.__name__
+    return str(hint).replace("typing.", "")
+
+
+def input_maker(function, namespace, rng):
+    """
+    Returns a function of n that generates (args, description) for one call, from the user's
+    input_for_<name>(n) generator or the type hints of the required parameters.
+
+    Raises:
+        TypeError: If a required parameter has no usable type hint.
+    """
+    generator = namespace.get(GENERATOR_PREFIX + function.__name__)
+    if callable(generator):
+        def make(n):
+            args = generator(n)
+            return args if isinstance(args, tuple) else (args,)
+        return make, f"{GENERATOR_PREFIX}{function.__name__}(n)"
+
+    try:
+        hints = typing.get_type_hints(function, globalns=namespace)
+    except Exception:
+        hints = {}
+    required = [
+        parameter for parameter in inspect.signature(function).parameters.values()
+        if parameter.default is inspect.Parameter.empty
+        and parameter.kind in (inspect.Parameter.POSITIONAL_ONLY, inspect.Parameter.POSITIONAL_OR_KEYWORD)
+    ]
+    if not required:
+        raise TypeError("it has no required parameters to scale")
+    for parameter in required:
+        if parameter.name not in hints:
+            raise TypeError(f"parameter '{parameter.name}' has no type hint (add one or define {GENERATOR_PREFIX}{function.__name__}(n))")
+        _value(hints[parameter.name], rng, 2)  # Fails early on unsupported hints
+
+    def make(n):
+        return tuple(_value(hints[parameter.name], rng, n) for parameter in required)
+    signature = ", ".join(f"{parameter.name}: {_hint_name(hints[parameter.name])}" for parameter in required)
+    return make, signature
+
+
+def consume(result):
+    """Runs a generator function's body by iterating its result; other results are returned as they are."""
+    if inspect.isgenerator(result):
+        for _ in result:
+            pass
+    return result
+
+
+def _time_call(function, make_input, n, deadline):
+    """The fastest of repeated calls of size n, in seconds. Each call gets a fresh input (it may be changed in place)."""
+    fastest, spent, calls = math.inf, 0.0, 0
+    size_deadline = min(time.monotonic() + MAX_SIZE_SECONDS, deadline)
+    while spent < MIN_MEASURE_SECONDS and calls < MAX_CALLS_PER_SIZE and (calls == 0 or time.monotonic() < size_deadline):
+        args = make_input(n)
+        gc.disable()  # Collections triggered by earlier allocations would land in random calls, like in timeit
+        try:
+            with call_time_limit():
+                start = time.perf_counter()
+                consume(function(*args))
+                elapsed = time.perf_counter() - start
+        finally:
+            gc.enable()
+        if elapsed > RUNTIME_PROFILE_MAX_CALL_SECONDS:
+            raise CallTooSlow()  # Without timer signals the call runs to the end
+        fastest, spent, calls = min(fastest, elapsed), spent + elapsed, calls + 1
+    return fastest
+
+
+def fit_complexity(sizes, seconds):
+    """
+    Fits the timings against the complexity models with least squares on the relative error
+    (so the fast small sizes weigh as much as the slow large ones): seconds ≈ a + b·f(n), b ≥ 0.
+
+    Returns:
+        tuple: (best model name, {model name: RMS relative error}, log-log growth exponent)
+    """
+    n, t = np.asarray(sizes, dtype=float), np.asarray(seconds, dtype=float)
+    errors = {}
+    for name, model in COMPLEXITY_MODELS.items():
+        columns = np.ones((len(n), 1)) if model is None else np.column_stack([np.ones_like(n), model(n)])
+        coefficients, *_ = np.linalg.lstsq(columns / t[:, None], np.ones_like(t), rcond=None)
+        if len(coefficients) > 1 and coefficients[1] < 0:
+            continue  # Shrinking with n: not this model
+        predicted = columns @ coefficients
+        errors[name] = float(np.sqrt(np.mean(((predicted - t) / t) ** 2)))
+    best_error = min(errors.values())
+    # Models are ordered from simplest to most complex
+    best = next(name for name, error in errors.items() if error <= best_error + FIT_TOLERANCE)
+    exponent = float(np.polyfit(np.log(n), np.log(t), 1)[0])
+    return best, errors, exponent
+
+
+def load_submission(code):
+    """
+    Runs in a sandbox process: executes the submitted code as a module and gets the process ready to measure it.
+
+    Returns:
+        tuple: (namespace of the code, names of its top-level functions other than input generators)
+    """
+    sys.stdin = open(os.devnull)  # input() must not read the sandbox's request pipe
+    if hasattr(signal, "setitimer") and threading.current_thread() is threading.main_thread():
+        signal.signal(signal.SIGALRM, _raise_too_slow)
+    tree = ast.parse(code)
+    names = [
+        node.name for node in tree.body
+        if isinstance(node, ast.FunctionDef) and not node.name.startswith(GENERATOR_PREFIX)
+    ]
+    namespace = {"__name__": "__runtime_profile__"}  # Not "__main__", so scripts do not run their main block
+    exec(compile(tree, SUBMISSION_FILENAME, "exec"), namespace)
+    return namespace, names
+
+
+def submission_functions(submission):
+    """
+    Yields (result, function, make_input) for every function of a loaded submission. result is the dict to
+    record the measurements in; for a function that cannot be measured it holds the reason ("skipped") and
+    function and make_input are None.
+    """
+    namespace, names = submission
+    for name in names:
+        function = namespace.get(name)
+        result = {"function": name}
+        if not callable(function):
+            result["skipped"] = "it is redefined by the code"
+            yield result, None, None
+            continue
+        try:
+            make_input, result["inputs"] = input_maker(function, namespace, random.Random(0))
+        except TypeError as e:
+            result["skipped"] = str(e)
+            yield result, None, None
+            continue
+        yield result, function, make_input
+
+
+def measure_runtime(code, sizes=None, budget_seconds=None):
+    """
+    Runs in a sandbox process: executes the code, then times each top-level function on inputs
+    of growing size n and fits the timings against the complexity models.
+
+    Returns:
+        list: One dict per function with the measured growth curve and the best-fitting model,
+              or the reason it was not measured.
+    """
+    sizes = sorted(sizes or RUNTIME_PROFILE_SIZES)
+    deadline = time.monotonic() + (budget_seconds or RUNTIME_PROFILE_TIMEOUT_SECONDS)
+    results = []
+    for result, function, make_input in submission_functions(load_submission(code)):
+        results.append(result)
+        result.update(sizes=[], seconds=[])
+        if function is None:
+            continue
+
+        for n in sizes:
+            if time.monotonic() >= deadline:
+                result["stopped"] = "the time budget of the measurement ran out"
+                break
+            try:
+                seconds = _time_call(function, make_input, n, deadline)
+            except CallTooSlow:
+                result["stopped"] = f"a call took longer than {RUNTIME_PROFILE_MAX_CALL_SECONDS:g}s at n={n}"
+                break
+            except Exception as e:
+                result["stopped"] = f"it raised {type(e).__name__} at n={n}: {e}"
+                break
+            if seconds != math.inf:
+                result["sizes"].append(n)
+                result["seconds"].append(seconds)
+
+        if len(result["sizes"]) >= MIN_POINTS:
+            result["complexity"], result["fit_errors"], result["exponent"] = fit_complexity(result["sizes"], result["seconds"])
+    return results
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _get_pool():
+    # Separate from the tool sandbox: every measurement gets a fresh process, because the submitted code
+    # runs in it and may leave anything behind
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = SandboxPool(size=2, timeout=RUNTIME_PROFILE_TIMEOUT_SECONDS + 5,
+                                memory_limit_mb=TOOL_MEMORY_LIMIT_MB, max_tasks=1)
+        return _pool
+
+
+def run_submission(function, code, cancel_token=None, **kwargs):
+    """
+    Runs function(code, **kwargs) in a fresh sandbox process (the function executes the submitted code).
+
+    Returns:
+        The result of the function, a limit finding if the sandbox stopped it, or an error finding
+        if the code could not be run.
+    """
+    try:
+        return _get_pool().call(function, code, cancel_token=cancel_token, **kwargs)
+    except RuntimeError as e:
+        return [{"status": "error", "message": f"The code could not be run: {e}"}]
+
+
+def profile_runtime(code, cancel_token=None, sizes=None):
+    """
+    Times the functions of the submitted code on growing inputs, in a sandbox process.
+    Does nothing unless RUNTIME_PROFILE is enabled.
+
+    Returns:
+        list: Per-function results (see measure_runtime), a limit finding if the sandbox stopped
+              the measurement, or [] if it is disabled or the code does not parse.
+    """
+    if not RUNTIME_PROFILE:
+        return []
+    try:
+        ast.parse(code)
+    except SyntaxError:
+        return []
+    return run_submission(measure_runtime, code, cancel_token=cancel_token, sizes=sizes,
+                          budget_seconds=RUNTIME_PROFILE_TIMEOUT_SECONDS)
+
+
+def _format_seconds(seconds):
+    if seconds >= 1:
+        return f"{seconds:.2f}s"
+    if seconds >= 1e-3:
+        return f"{seconds * 1e3:.2f}ms"
+    return f"{seconds * 1e6:.1f}µs"
+
+
+def format_runtime_profile(results):
+    """
+    Renders the runtime measurements as Markdown lines for a report prompt.
+
+    Returns:
+        str: One line per function, or "" if nothing was measured.
+    """
+    lines = []
+    for result in results:
+        if "function" not in result:
+            lines.append(f"- {result.get('message', result)}")
+            continue
+        label = f"`{result['function']}({result.get('inputs', '')})`"
+        if "skipped" in result:
+            lines.append(f"- {label}: not measured, {result['skipped']}.")
+            continue
+        curve = ", ".join(f"n={n}: {_format_seconds(seconds)}" for n, seconds in zip(result["sizes"], result["seconds"]))
+        if "complexity" in result:
+            line = f"- {label}: measured {result['complexity']} (growth exponent {result['exponent']:.2f}; {curve})"
+        else:
+            line = f"- {label}: too few sizes measured to estimate its complexity ({curve or 'none'})"
+        if "stopped" in result:
+            line += f"; stopped because {result['stopped']}"
+        lines.append(line + ".")
+    return "\n".join(lines)
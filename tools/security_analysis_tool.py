@@ -1,4 +1,6 @@
 import io
+import os
+import tempfile
 from bandit.core import config, manager, test_set
 from langchain.agents import Tool
 
@@ -17,6 +19,7 @@ def analyze_code_security(code: str):
         list: Detected security issues.
     """
     results = []
+    temp_filename = None
     
     try:
         # Initialize Bandit configuration
@@ -28,9 +31,9 @@ def analyze_code_security(code: str):
         # Load test set
         bandit_mgr.b_ts = test_set.BanditTestSet(config=bandit_conf)
 
-        # Create a temporary file to hold the code
-        temp_filename = "temp_code.py"
-        with open(temp_filename, "w") as temp_file:
+        # Create a temporary file to hold the code (unique, so several files can be scanned in parallel)
+        fd, temp_filename = tempfile.mkstemp(suffix=".py")
+        with os.fdopen(fd, "w") as temp_file:
             temp_file.write(code)
 
         bandit_mgr.discover_files([temp_filename])
@@ -49,6 +52,9 @@ def analyze_code_security(code: str):
     
     except Exception as e:
         return [f"Error during security analysis: {str(e)}"]
+    finally:
+        if temp_filename and os.path.exists(temp_filename):
+            os.remove(temp_filename)
     
     return results if results else ["No security issues detected."]
 
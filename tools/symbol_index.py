@@ -0,0 +1,422 @@
+import ast
+from collections import defaultdict
+
+# Statements after which the rest of a block can never run
+TERMINATORS = (ast.Return, ast.Raise, ast.Continue, ast.Break)
+
+# Decorators that do not register a function anywhere, so an unused decorated function is still dead
+PLAIN_DECORATORS = {"staticmethod", "classmethod", "property"}
+
+
+class Scope:
+    """A module, class or function scope with its bindings and the names loaded inside it."""
+
+    def __init__(self, kind, name, parent=None):
+        self.kind = kind
+        self.name = name
+        self.parent = parent
+        self.bindings = defaultdict(list)  # name -> list of binding dicts
+        self.loads = set()
+        self.declared_global = set()
+        self.declared_nonlocal = set()
+        self.uses_locals = False
+
+    def resolve(self, name):
+        """Finds the scope a name loaded in this scope binds to (class scopes are skipped for nested scopes)."""
+        scope, first = self, True
+        while scope is not None:
+            if name in scope.declared_global:
+                scope = self.module
+                return scope if name in scope.bindings else None
+            if name in scope.declared_nonlocal:
+                scope = scope.enclosing_function()
+                while scope is not None and name not in scope.bindings:
+                    scope = scope.enclosing_function()
+                return scope
+            if (first or scope.kind != "class") and name in scope.bindings:
+                return scope
+            scope, first = scope.parent, False
+        return None
+
+    def enclosing_function(self):
+        """The nearest function scope around this one (the scope a nonlocal name binds to), or None."""
+        scope = self.parent
+        while scope is not None and scope.kind != "function":
+            scope = scope.parent
+        return scope
+
+    @property
+    def module(self):
+        scope = self
+        while scope.parent is not None:
+            scope = scope.parent
+        return scope
+
+
+def _is_script_statement(stmt):
+    """True for module-level statements that run the module as a program: a main guard or a bare call."""
+    if isinstance(stmt, ast.If) and isinstance(stmt.test, ast.Compare):
+        names = [stmt.test.left] + stmt.test.comparators
+        return any(isinstance(node, ast.Name) and node.id == "__name__" for node in names)
+    return isinstance(stmt, ast.Expr) and isinstance(stmt.value, ast.Call)
+
+
+class SymbolIndex(ast.NodeVisitor):
+    """
+    Scope and def-use index of a module, built in one pass over the AST.
+    Used to report unused imports, unused variables, unreachable code and dead functions.
+    """
+
+    def __init__(self, tree):
+        self.tree = tree
+        self.module_scope = Scope("module", "<module>")
+        self.scopes = [self.module_scope]
+        self.attribute_names = set()
+        self.exported = set()
+        # Scripts run their module-level code; other modules are imported, so their public names are their API
+        self.is_script = False
+        self.unreachable = []
+        self._scope = self.module_scope
+        self._pending_loads = []
+        self.visit(tree)
+        self._resolve_loads()
+
+    # --- Building -----------------------------------------------------------------------
+
+    def _bind(self, name, kind, node, **extra):
+        scope = self._scope
+        if name in scope.declared_global:
+            scope = scope.module
+        elif name in scope.declared_nonlocal:
+            scope = scope.enclosing_function() or scope
+        scope.bindings[name].append({"kind": kind, "line": node.lineno, "node": node, **extra})
+
+    def _bind_target(self, target, kind):
+        """Binds the names in an assignment target (loop variables, unpacking, with ... as)."""
+        if isinstance(target, ast.Name):
+            self._bind(target.id, kind, target)
+        elif isinstance(target, (ast.Tuple, ast.List)):
+            for elt in target.elts:
+                self._bind_target(elt, kind)
+        elif isinstance(target, ast.Starred):
+            self._bind_target(target.value, kind)
+        else:  # Attributes and subscripts read their base
+            self.visit(target)
+
+    def _load(self, name):
+        self._pending_loads.append((self._scope, name))
+
+    def _visit_annotation(self, annotation):
+        """Visits an annotation, including the names in string annotations (forward references like "List[int]")."""
+        self.visit(annotation)
+        for node in ast.walk(annotation):
+            if isinstance(node, ast.Constant) and isinstance(node.value, str):
+                try:
+                    self._visit_annotation(ast.parse(node.value.strip(), mode="eval").body)
+                except SyntaxError:
+                    pass  # Not an annotation, e.g. Literal["a b"]
+
+    def _enter(self, kind, name):
+        scope = Scope(kind, name, self._scope)
+        self.scopes.append(scope)
+        self._scope = scope
+        return scope
+
+    def _check_block(self, body):
+        for index, stmt in enumerate(body[:-1]):
+            if isinstance(stmt, TERMINATORS):
+                self.unreachable.append(body[index + 1])
+                break
+
+    def generic_visit(self, node):
+        for field in ("body", "orelse", "finalbody"):
+            block = getattr(node, field, None)
+            if isinstance(block, list) and block and isinstance(block[0], ast.stmt):
+                self._check_block(block)
+        super().generic_visit(node)
+
+    def visit_Module(self, node):
+        self._check_block(node.body)
+        for stmt in node.body:
+            if _is_script_statement(stmt):
+                self.is_script = True
+            # __all__ = ["name", ...] exports names from the module
+            if isinstance(stmt, ast.Assign) and any(isinstance(t, ast.Name) and t.id == "__all__" for t in stmt.targets):
+                if isinstance(stmt.value, (ast.List, ast.Tuple)):
+                    self.exported.update(elt.value for elt in stmt.value.elts
+                                         if isinstance(elt, ast.Constant) and isinstance(elt.value, str))
+        super().generic_visit(node)
+
+    def visit_Import(self, node):
+        for alias in node.names:
+            name = alias.asname or alias.name.split(".")[0]
+            self._bind(name, "import", node, target=alias.name + (f" as {alias.asname}" if alias.asname else ""))
+
+    def visit_ImportFrom(self, node):
+        if node.module == "__future__":
+            return
+        for alias in node.names:
+            if alias.name != "*":
+                target = "." * node.level + (f"{node.module}." if node.module else "") + alias.name
+                self._bind(alias.asname or alias.name, "import", node,
+                           target=target + (f" as {alias.asname}" if alias.asname else ""))
+
+    def _visit_function(self, node):
+        for decorator in node.decorator_list:
+            self.visit(decorator)
+        self.visit(node.args)
+        if node.returns:
+            self._visit_annotation(node.returns)
+        self._bind(node.name, "function", node, decorated=self._is_registered(node))
+        outer = self._scope
+        self._enter("function", node.name)
+        for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs + [node.args.vararg, node.args.kwarg]:
+            if arg is not None:
+                self._bind(arg.arg, "argument", arg)
+        self._check_block(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._scope = outer
+
+    visit_FunctionDef = visit_AsyncFunctionDef = _visit_function
+
+    def visit_Lambda(self, node):
+        self.visit(node.args)
+        outer = self._scope
+        self._enter("function", "<lambda>")
+        for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs + [node.args.vararg, node.args.kwarg]:
+            if arg is not None:
+                self._bind(arg.arg, "argument", arg)
+        self.visit(node.body)
+        self._scope = outer
+
+    def visit_arguments(self, node):
+        # Defaults and annotations are evaluated in the enclosing scope
+        for default in node.defaults + [d for d in node.kw_defaults if d is not None]:
+            self.visit(default)
+        for arg in node.posonlyargs + node.args + node.kwonlyargs + [node.vararg, node.kwarg]:
+            if arg is not None and arg.annotation is not None:
+                self._visit_annotation(arg.annotation)
+
+    def visit_ClassDef(self, node):
+        for expr in node.decorator_list + node.bases + [kw.value for kw in node.keywords]:
+            self.visit(expr)
+        self._bind(node.name, "class", node, decorated=self._is_registered(node))
+        outer = self._scope
+        self._enter("class", node.name)
+        self._check_block(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
+        self._scope = outer
+
+    def _visit_comprehension(self, node):
+        outer = self._scope
+        self._enter("comprehension", "<comprehension>")
+        for generator in node.generators:
+            self.visit(generator.iter)
+            self._bind_target(generator.target, "target")
+            for condition in generator.ifs:
+                self.visit(condition)
+        for field in ("elt", "key", "value"):
+            if getattr(node, field, None) is not None:
+                self.visit(getattr(node, field))
+        self._scope = outer
+
+    visit_ListComp = visit_SetComp = visit_GeneratorExp = visit_DictComp = _visit_comprehension
+
+    def visit_Assign(self, node):
+        self.visit(node.value)
+        for target in node.targets:
+            # Names bound by tuple unpacking are often intentionally unused
+            self._bind_target(target, "target" if isinstance(target, (ast.Tuple, ast.List)) else "variable")
+
+    def visit_AnnAssign(self, node):
+        self._visit_annotation(node.annotation)
+        if node.value is not None:
+            self.visit(node.value)
+        self._bind_target(node.target, "variable")
+
+    def _visit_loop(self, node):
+        self.visit(node.iter)
+        self._bind_target(node.target, "target")
+        self._check_block(node.body)
+        self._check_block(node.orelse)
+        for stmt in node.body + node.orelse:
+            self.visit(stmt)
+
+    visit_For = visit_AsyncFor = _visit_loop
+
+    def _visit_with(self, node):
+        for item in node.items:
+            self.visit(item.context_expr)
+            if item.optional_vars is not None:
+                self._bind_target(item.optional_vars, "target")
+        self._check_block(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    visit_With = visit_AsyncWith = _visit_with
+
+    def visit_Global(self, node):
+        self._scope.declared_global.update(node.names)
+
+    def visit_Nonlocal(self, node):
+        self._scope.declared_nonlocal.update(node.names)
+
+    def visit_Name(self, node):
+        if isinstance(node.ctx, ast.Store):
+            self._bind(node.id, "variable", node)
+        else:  # Load and Del
+            self._load(node.id)
+            if node.id == "locals":
+                self._scope.uses_locals = True
+
+    def visit_Attribute(self, node):
+        self.attribute_names.add(node.attr)
+        self.visit(node.value)
+
+    def visit_AugAssign(self, node):
+        # x += 1 reads x before rebinding it
+        if isinstance(node.target, ast.Name):
+            self._load(node.target.id)
+        self.generic_visit(node)
+
+    def visit_ExceptHandler(self, node):
+        if node.type is not None:
+            self.visit(node.type)
+        if node.name:
+            self._bind(node.name, "exception", node)
+        self._check_block(node.body)
+        for stmt in node.body:
+            self.visit(stmt)
+
+    def _is_registered(self, node):
+        """True if a decorator might register the definition somewhere (e.g. @app.route)."""
+        for decorator in node.decorator_list:
+            if not (isinstance(decorator, ast.Name) and decorator.id in PLAIN_DECORATORS):
+                return True
+        return False
+
+    def _resolve_loads(self):
+        for scope, name in self._pending_loads:
+            owner = scope.resolve(name)
+            if owner is not None:
+                owner.loads.add(name)
+            elif scope.kind == "class":
+                scope.loads.add(name)
+
+    # --- Findings -----------------------------------------------------------------------
+
+    def _is_used(self, scope, name):
+        return name in scope.loads or scope.uses_locals
+
+    def unused_imports(self):
+        findings = []
+        for scope in self.scopes:
+            for name, bindings in scope.bindings.items():
+                for binding in bindings:
+                    if binding["kind"] != "import" or self._is_used(scope, name) or name in self.exported:
+                        continue
+                    findings.append({
+                        "kind": "unused-import",
+                        "name": binding["target"],
+                        "line": binding["line"],
+                        "confidence": "high",
+                        "message": f"'{binding['target']}' imported but unused.",
+                    })
+        return findings
+
+    def unused_variables(self):
+        findings = []
+        for scope in self.scopes:
+            if scope.kind != "function":
+                continue
+            for name, bindings in scope.bindings.items():
+                if self._is_used(scope, name) or name.startswith("_") or name in scope.declared_global:
+                    continue
+                for binding in bindings:
+                    if binding["kind"] == "variable":
+                        confidence = "high"
+                    elif binding["kind"] == "exception":
+                        confidence = "medium"
+                    else:
+                        continue
+                    findings.append({
+                        "kind": "unused-variable",
+                        "name": name,
+                        "line": binding["line"],
+                        "confidence": confidence,
+                        "message": f"Local variable '{name}' in '{scope.name}' is assigned to but never used.",
+                    })
+        return findings
+
+    def unreachable_code(self):
+        return [{
+            "kind": "unreachable-code",
+            "name": type(stmt).__name__,
+            "line": stmt.lineno,
+            "confidence": "high",
+            "message": "Unreachable code after return/raise/continue/break.",
+        } for stmt in self.unreachable]
+
+    def dead_functions(self, external_uses=()):
+        """Reports module-level functions/classes and methods that are never referenced."""
+        findings = []
+        referenced = self.attribute_names | self.exported | set(external_uses)
+        for scope in self.scopes:
+            if scope.kind not in ("module", "class"):
+                continue
+            for name, bindings in scope.bindings.items():
+                for binding in bindings:
+                    if binding["kind"] not in ("function", "class") or binding.get("decorated"):
+                        continue
+                    if name.startswith("__") and name.endswith("__"):
+                        continue
+                    if scope.kind == "module":
+                        if self._is_used(scope, name) or name in referenced:
+                            continue
+                        # Public names of an imported module are its API, unless __all__ leaves them out
+                        if not name.startswith("_") and not self.is_script and not self.exported:
+                            continue
+                        confidence = "medium" if name.startswith("_") else "low"
+                    else:
+                        if name in referenced or name in scope.loads:
+                            continue
+                        confidence = "low"
+                    kind = "function" if binding["kind"] == "function" else "class"
+                    findings.append({
+                        "kind": "dead-function",
+                        "name": name,
+                        "line": binding["line"],
+                        "confidence": confidence,
+                        "message": f"Unused {kind} '{name}'.",
+                    })
+        return findings
+
+
+def find_unused_symbols(code, external_uses=(), tree=None):
+    """
+    Builds a single SymbolIndex for the code and reports deduplicated
+    unused-import, unused-variable, unreachable-code and dead-function findings.
+
+    Args:
+        external_uses: Names of this module that other modules use (e.g. in project mode), functions and classes
+                       at module level or methods called through instances.
+
+    Returns:
+        list: Findings sorted by line, each with kind, name, line, confidence and message.
+    """
+    try:
+        index = SymbolIndex(tree if tree is not None else ast.parse(code))
+    except SyntaxError as e:
+        return [{"kind": "syntax-error", "name": "", "line": e.lineno or 0, "confidence": "high",
+                 "message": f"Syntax Error in provided code: {e.msg}"}]
+
+    findings, seen = [], set()
+    for finding in (index.unused_imports() + index.unused_variables()
+                    + index.unreachable_code() + index.dead_functions(external_uses)):
+        key = (finding["kind"], finding["name"], finding["line"])
+        if key not in seen:
+            seen.add(key)
+            findings.append(finding)
+    return sorted(findings, key=lambda finding: finding["line"])
@@ -0,0 +1,184 @@
+import argparse
+import inspect
+import os
+import socket
+import threading
+import uuid
+from functools import lru_cache
+import config  # Loads .env before broker and the other modules read their settings
+from broker import get_broker
+from cancellation import CancellationToken, OperationCancelled
+from profiling import profiled, profiled_tool
+import metrics
+
+# Must stay well below the broker's visibility timeout, or tasks of live workers get handed out again
+HEARTBEAT_INTERVAL = float(os.getenv("WORKER_HEARTBEAT_INTERVAL", "10"))
+# Seconds an idle worker waits before asking the broker for work again
+POLL_INTERVAL = float(os.getenv("WORKER_POLL_INTERVAL", "0.5"))
+
+
+@lru_cache(maxsize=1)
+def _agents():
+    from pipeline import build_agents
+    return {agent.name: agent for agent in build_agents()}
+
+
+def run_tool_task(payload, progress, cancel_token):
+    """Runs one analysis tool: payload {"tool": tool name, "code": code, "kwargs": optional keyword arguments}."""
+    from pipeline import TOOLS
+    tool = profiled_tool(TOOLS[payload["tool"]])
+    progress("tool")
+    kwargs = payload.get("kwargs") or {}
+    if "cancel_token" in inspect.signature(tool.func).parameters:
+        return tool.func(payload["code"], cancel_token=cancel_token, **kwargs)
+    return tool.func(payload["code"], **kwargs)
+
+
+def run_agent_task(payload, progress, cancel_token):
+    """
+    Runs a whole agent: payload {"agent": agent name, "code": code, "profile": optional bool}.
+    Stages are reported to the broker; profiles are written to this worker's PROFILE_DIR.
+    """
+    agent = _agents()[payload["agent"]]
+    with profiled(agent.name, payload["code"], enabled=payload.get("profile")), \
+            metrics.track(metrics.AGENT_RUNS, metrics.AGENT_LATENCY, agent=agent.name):
+        report, is_valid = agent.run(payload["code"], progress=progress, cancel_token=cancel_token)
+    return [report, is_valid]
+
+
+def run_llm_task(payload, progress, cancel_token):
+    """Sends one prompt to the model backend: payload {"prompt": prompt}. Shared by identical requests."""
+    from gradio_llm import request_completion
+    return request_completion(payload["prompt"], cancel_token)
+
+
+TASK_HANDLERS = {
+    "tool": run_tool_task,
+    "agent": run_agent_task,
+    "llm": run_llm_task,
+}
+
+
+class Worker:
+    """Takes tasks from a broker and runs them on a number of threads, sending heartbeats while it is alive."""
+
+    def __init__(self, broker, worker_id=None, concurrency=1, handlers=None):
+        self.broker = broker
+        self.id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.handlers = handlers or TASK_HANDLERS
+        self._running = {}  # task id -> CancellationToken
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        """Starts the heartbeat thread and the worker threads."""
+        self.broker.heartbeat(self.id, info=self._info())
+        self._threads = [threading.Thread(target=self._heartbeat_loop, name=f"{self.id}-heartbeat", daemon=True)]
+        self._threads += [
+            threading.Thread(target=self._work_loop, name=f"{self.id}-{index}", daemon=True)
+            for index in range(self.concurrency)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self, wait=True):
+        """Stops taking new tasks. Running tasks are finished first if wait is set."""
+        self._stop.set()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+    def run_forever(self):
+        self.start()
+        try:
+            while not self._stop.wait(1.0):
+                pass
+        except KeyboardInterrupt:
+            print(f"Worker {self.id} shutting down...")
+            self.stop()
+
+    def _info(self):
+        with self._lock:
+            running = len(self._running)
+        return {"host": socket.gethostname(), "pid": os.getpid(), "concurrency": self.concurrency, "running": running}
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(HEARTBEAT_INTERVAL):
+            with self._lock:
+                running = dict(self._running)
+            try:
+                self.broker.heartbeat(self.id, task_ids=list(running), info=self._info())
+                # Abort the tasks the app cancelled meanwhile
+                for task_id, cancel_token in running.items():
+                    task = self.broker.get_task(task_id)
+                    if task is None or task["status"] == "cancelled":
+                        cancel_token.cancel()
+            except Exception as e:
+                print(f"Worker {self.id} heartbeat failed: {e}")
+
+    def _work_loop(self):
+        while not self._stop.is_set():
+            try:
+                task = self.broker.reserve(self.id)
+            except Exception as e:
+                print(f"Worker {self.id} could not reserve a task: {e}")
+                task = None
+            if task is None:
+                self._stop.wait(POLL_INTERVAL)
+                continue
+            self.process(task)
+
+    def process(self, task):
+        """Runs one reserved task and stores its result (or error) in the broker."""
+        cancel_token = CancellationToken()
+        with self._lock:
+            self._running[task["id"]] = cancel_token
+
+        def progress(stage):
+            cancel_token.raise_if_cancelled()
+            self.broker.update_stage(task["id"], stage)
+
+        try:
+            handler = self.handlers.get(task["kind"])
+            if handler is None:
+                self.broker.fail(task["id"], f"Unknown task kind '{task['kind']}'.")
+                return
+            result = handler(task["payload"], progress, cancel_token)
+            self.broker.complete(task["id"], result)
+        except OperationCancelled:
+            pass  # The task is already marked as cancelled in the broker
+        except Exception as e:
+            # Unexpected errors may be transient (e.g. a lost connection), so the task gets another attempt
+            self.broker.fail(task["id"], str(e), retry=True)
+        finally:
+            with self._lock:
+                self._running.pop(task["id"], None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Runs LLM Code Tutor analysis tasks from a broker.")
+    parser.add_argument("--broker", default=None, help="Broker URL (defaults to ANALYSIS_BROKER_URL).")
+    parser.add_argument("--concurrency", type=int, default=int(os.getenv("WORKER_CONCURRENCY", "4")),
+                        help="Number of tasks run at the same time.")
+    parser.add_argument("--id", default=None, help="Worker id (defaults to host-pid-random).")
+    parser.add_argument("--metrics-port", type=int, default=metrics.METRICS_PORT,
+                        help="Port of the /metrics endpoint (defaults to METRICS_PORT, 0 disables it).")
+    args = parser.parse_args()
+
+    # Workers send their own LLM requests directly; waiting for broker tasks from inside a task could deadlock
+    os.environ["LLM_SINGLE_FLIGHT"] = "local"
+
+    broker = get_broker(args.broker)
+    if broker is None:
+        parser.error("No broker configured. Pass --broker or set ANALYSIS_BROKER_URL.")
+    worker = Worker(broker, worker_id=args.id, concurrency=args.concurrency)
+    metrics.ANALYSIS_JOBS.add_function(lambda: {("running",): len(worker._running)})
+    metrics.start_metrics_server(args.metrics_port)
+    print(f"Worker {worker.id} started with {args.concurrency} threads.")
+    worker.run_forever()
+
+
+if __name__ == "__main__":
+    main()